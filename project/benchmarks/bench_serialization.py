@@ -0,0 +1,77 @@
+"""
+响应序列化基准测试
+对比每个接口 旧路径（服务层json.dumps → 路由json.loads → jsonify）与
+新路径（服务层返回字典 → 一次序列化；缓存命中时直接复用响应体）的CPU耗时
+
+    cd project
+    python -m benchmarks.bench_serialization            # 默认每个接口重复200次
+    python -m benchmarks.bench_serialization 1000
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+
+import services.data_service as ds
+from utils.response import json_response, dumps, serializer_name
+
+# (接口, 服务函数, 参数)
+ENDPOINTS = [
+    ('/api/national/overview', ds.get_national_overview, ()),
+    ('/api/national/city-prices', ds.get_city_prices, ('广东',)),
+    ('/api/national/provinces', ds.get_province_list, ()),
+    ('/api/national/ranking', ds.get_city_ranking, ('price', 50)),
+    ('/api/national/trend', ds.get_price_trend, ('北京',)),
+    ('/api/national/clustering', ds.get_city_clustering, ()),
+    ('/api/national/heatmap', ds.get_district_change_heatmap, ()),
+    ('/api/national/district-ranking', ds.get_district_price_ranking, (200,)),
+    ('/api/beijing/overview', ds.get_beijing_overview, ()),
+    ('/api/beijing/district-ranking', ds.get_district_ranking, ()),
+    ('/api/beijing/analysis/layout', ds.analysis_layout, ()),
+    ('/api/beijing/chart/scatter', ds.get_scatter_data, (None, 5000)),
+    ('/api/beijing/chart/boxplot', ds.get_boxplot_data, ('',)),
+    ('/api/beijing/houses', ds.query_houses_list, (None, None, None, None, None, None, 1, 100)),
+]
+
+
+def _cpu_ms(func, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - start) * 1000 / repeat
+
+
+def run(repeat: int = 200):
+    app = Flask(__name__)
+    print(f"序列化实现: {serializer_name()}，每个接口重复 {repeat} 次（单位: ms CPU/请求）")
+    print(f"{'接口':<36}{'大小KB':>8}{'旧路径':>10}{'新路径':>10}{'缓存命中':>10}{'节省':>8}")
+
+    with app.app_context():
+        for path, service, args in ENDPOINTS:
+            payload = service.payload(*args)
+            data = payload.data
+            body = payload.body
+
+            def old_path():
+                text = json.dumps(data, ensure_ascii=False)
+                jsonify(json.loads(text)).get_data()
+
+            def new_path():
+                json_response(dumps(data)).get_data()
+
+            def cached_path():
+                json_response(body).get_data()
+
+            old_ms = _cpu_ms(old_path, repeat)
+            new_ms = _cpu_ms(new_path, repeat)
+            cached_ms = _cpu_ms(cached_path, repeat)
+            saved = (1 - cached_ms / old_ms) * 100 if old_ms else 0.0
+            print(f"{path:<36}{len(body) / 1024:>8.1f}{old_ms:>10.3f}{new_ms:>10.3f}{cached_ms:>10.3f}{saved:>7.1f}%")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
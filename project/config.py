@@ -39,6 +39,52 @@ SPARK_IMAGE_API_HOST = os.getenv('SPARK_IMAGE_API_HOST', 'http://spark-api.cn-hu
 DB_TYPE = os.getenv('DB_TYPE', 'sqlite')
 DB_PATH = os.getenv('DB_PATH', 'project/house_data.sqlite')
 
+# 数据库连接池配置
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '65536'))
+# 启动时自动执行数据库结构迁移（索引等）
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'True').lower() == 'true'
+
+# SQL追踪与慢查询日志配置（默认关闭，排查性能问题时开启）
+SQL_TRACE_ENABLED = os.getenv('SQL_TRACE_ENABLED', 'False').lower() == 'true'
+SQL_SLOW_MS = float(os.getenv('SQL_SLOW_MS', '100'))
+SQL_SLOW_LOG = os.getenv('SQL_SLOW_LOG', 'logs/slow_queries.log')
+SQL_SLOW_LOG_MAX_BYTES = int(os.getenv('SQL_SLOW_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+SQL_SLOW_LOG_BACKUPS = int(os.getenv('SQL_SLOW_LOG_BACKUPS', '3'))
+
+# 北京房源内存快照（列表筛选、特征分析在内存中计算）
+HOUSE_SNAPSHOT_ENABLED = os.getenv('HOUSE_SNAPSHOT_ENABLED', 'True').lower() == 'true'
+
+# 北京房源汇总表（迁移v7，触发器增量维护）：概览、区域排名与特征分析直接读取汇总
+HOUSE_SUMMARY_ENABLED = os.getenv('HOUSE_SUMMARY_ENABLED', 'True').lower() == 'true'
+
+# 数据服务响应缓存（数据版本变化时自动失效）
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '600'))
+# 不缓存的服务函数，逗号分隔（如 query_houses_list,get_scatter_data）
+RESPONSE_CACHE_DISABLED = [name.strip() for name in os.getenv('RESPONSE_CACHE_DISABLED', '').split(',') if name.strip()]
+
+# 分析接口的HTTP条件请求（ETag/304）与浏览器缓存时间（秒）
+HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'True').lower() == 'true'
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '60'))
+
+# 区域统计缓存（对话咨询、AI报告、统计接口共用）及后台预热
+AREA_STATS_CACHE_ENABLED = os.getenv('AREA_STATS_CACHE_ENABLED', 'True').lower() == 'true'
+AREA_STATS_CACHE_MAX_ENTRIES = int(os.getenv('AREA_STATS_CACHE_MAX_ENTRIES', '256'))
+AREA_STATS_CACHE_TTL = float(os.getenv('AREA_STATS_CACHE_TTL', '3600'))
+# 预热线程检查数据版本的间隔（秒），0表示不预热
+AREA_STATS_WARM_INTERVAL = float(os.getenv('AREA_STATS_WARM_INTERVAL', '60'))
+# 除各行政区外额外预热的热门商圈数量（按房源数）
+AREA_STATS_WARM_BUSINESS_AREAS = int(os.getenv('AREA_STATS_WARM_BUSINESS_AREAS', '20'))
+
+# 地点联想（/api/beijing/locations/suggest）：商圈拼音映射文件（爬虫fetch_areas.py生成的areas.json），不存在时只支持行政区拼音
+LOCATION_PINYIN_FILE = os.getenv('LOCATION_PINYIN_FILE', str(project_root / 'renhao_spider' / 'areas.json'))
+
 # 验证必需配置
 def validate_config():
     """验证必需的配置是否已设置"""
@@ -81,5 +127,45 @@ CONFIG = {
     'database': {
         'type': DB_TYPE,
         'path': DB_PATH,
+        'pool_size': DB_POOL_SIZE,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'busy_timeout_ms': DB_BUSY_TIMEOUT_MS,
+        'journal_mode': DB_JOURNAL_MODE,
+        'mmap_size': DB_MMAP_SIZE,
+        'cache_size_kb': DB_CACHE_SIZE_KB,
+        'auto_migrate': DB_AUTO_MIGRATE,
+    },
+    'sql_trace': {
+        'enabled': SQL_TRACE_ENABLED,
+        'slow_ms': SQL_SLOW_MS,
+        'slow_log': SQL_SLOW_LOG,
+        'log_max_bytes': SQL_SLOW_LOG_MAX_BYTES,
+        'log_backups': SQL_SLOW_LOG_BACKUPS,
+    },
+    'snapshot': {
+        'enabled': HOUSE_SNAPSHOT_ENABLED,
+    },
+    'house_summary': {
+        'enabled': HOUSE_SUMMARY_ENABLED,
+    },
+    'response_cache': {
+        'enabled': RESPONSE_CACHE_ENABLED,
+        'max_entries': RESPONSE_CACHE_MAX_ENTRIES,
+        'ttl': RESPONSE_CACHE_TTL,
+        'disabled': RESPONSE_CACHE_DISABLED,
+    },
+    'http_cache': {
+        'enabled': HTTP_CACHE_ENABLED,
+        'max_age': HTTP_CACHE_MAX_AGE,
+    },
+    'area_stats_cache': {
+        'enabled': AREA_STATS_CACHE_ENABLED,
+        'max_entries': AREA_STATS_CACHE_MAX_ENTRIES,
+        'ttl': AREA_STATS_CACHE_TTL,
+        'warm_interval': AREA_STATS_WARM_INTERVAL,
+        'warm_business_areas': AREA_STATS_WARM_BUSINESS_AREAS,
+    },
+    'location_suggest': {
+        'pinyin_file': LOCATION_PINYIN_FILE,
     }
 }
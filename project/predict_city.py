@@ -10,6 +10,7 @@ import sys
 # 添加父目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.database import get_db_connection
+from services.name_resolver import city_condition, load_name_resolver
 
 # ==================== 历史数据查询接口 ====================
 
@@ -51,16 +52,28 @@ def get_historical_prices(
         where_clauses: List[str] = []
         params: List = []
 
-        where_clauses.append("province_name LIKE ?")
-        params.append(f"%{province.strip()}%")
+        resolver = load_name_resolver()
+        if resolver is not None:
+            # trend为城市级数据：省份/城市/区县先解析为城市，再按trend中存储的城市名等值查询
+            cities = resolver.resolve_cities(
+                province.strip(),
+                city.strip() if city and city.strip() else None,
+                district.strip() if district and district.strip() else None
+            )
+            condition, condition_params = city_condition(resolver, "city_name", "trend", cities)
+            where_clauses.append(condition)
+            params.extend(condition_params)
+        else:
+            where_clauses.append("province_name LIKE ?")
+            params.append(f"%{province.strip()}%")
 
-        if city and city.strip():
-            where_clauses.append("city_name LIKE ?")
-            params.append(f"%{city.strip()}%")
+            if city and city.strip():
+                where_clauses.append("city_name LIKE ?")
+                params.append(f"%{city.strip()}%")
 
-        if district and district.strip():
-            where_clauses.append("district_name LIKE ?")
-            params.append(f"%{district.strip()}%")
+            if district and district.strip():
+                where_clauses.append("district_name LIKE ?")
+                params.append(f"%{district.strip()}%")
 
         if start_date:
             where_clauses.append("record_date >= ?")
@@ -275,7 +288,8 @@ class HousePriceForecast:
             dates.append(future_date.strftime('%Y-%m'))
         return dates
 
-    def parse_date_to_year_month(self, date_str: str) -> tuple:
+    @staticmethod
+    def parse_date_to_year_month(date_str: str) -> tuple:
         """解析日期字符串为年和月"""
         try:
             if '-' in date_str:
@@ -338,6 +352,303 @@ class HousePriceForecast:
             raise Exception(f"分析失败: {str(e)}")
 
 
+# ==================== 批量预测引擎 ====================
+
+class BatchHousePriceForecast:
+    """
+    HousePriceForecast的批量版本：多条序列（城市或区县）按长度右侧补NaN组成矩阵后一次拟合，
+    每条序列的结果与对该序列单独调用HousePriceForecast一致（浮点误差范围内）。
+    - 线性回归：同一长度的序列时间轴相同，按行计算与scipy.stats.linregress相同的闭式解
+    - 多项式回归：同一长度的序列一次np.polyfit（多列y的批量最小二乘）
+    - 指数平滑、移动平均：沿时间轴逐期对全部序列做向量运算
+    """
+
+    def __init__(self, histories: List[List[Dict]]):
+        """
+        :param histories: 每条序列为 [{"date": "2024-01", "price": 15000}, ...]，已按日期升序排列，至少3条记录
+        """
+        if not histories:
+            raise ValueError("历史数据不能为空")
+        self.lengths = np.array([len(history) for history in histories], dtype=np.int64)
+        if self.lengths.min() < 3:
+            raise ValueError("每条序列至少需要3条历史记录")
+
+        self.prices = np.full((len(histories), int(self.lengths.max())), np.nan)
+        for row, history in enumerate(histories):
+            self.prices[row, :len(history)] = [record['price'] for record in history]
+        # 各序列的最后日期大多相同，每个不同的日期字符串只解析一次
+        last_dates = [history[-1]['date'] for history in histories]
+        parsed = {date_str: pd.to_datetime(date_str) for date_str in set(last_dates)}
+        self.last_dates = [parsed[date_str] for date_str in last_dates]
+        # 长度 -> 该长度的序列下标
+        self.groups = {int(n): np.flatnonzero(self.lengths == n) for n in np.unique(self.lengths)}
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def _tail(self, offset: np.ndarray) -> np.ndarray:
+        """各序列倒数第offset个值（offset可逐行不同）"""
+        return self.prices[np.arange(len(self)), self.lengths - offset]
+
+    def linear_regression(self, forecast_periods: int = 6) -> Dict[str, np.ndarray]:
+        """线性回归预测（各项为按序列排列的数组，predictions等为 [序列数, 预测期数]）"""
+        result = {name: np.empty(len(self)) for name in ('slope', 'intercept', 'r_squared', 'margin')}
+        result['predictions'] = np.empty((len(self), forecast_periods))
+        for n, rows in self.groups.items():
+            X = np.arange(n, dtype=np.float64)
+            y = self.prices[rows, :n]
+            # 与linregress一致：ssxm/ssxym/ssym为np.cov(x, y, bias=1)的各项，
+            # 每条序列组成 [2, n] 的中心化矩阵后批量相乘，运算顺序与np.cov相同
+            centered = np.empty((len(rows), 2, n))
+            centered[:, 0] = X - X.mean()
+            centered[:, 1] = y - y.mean(axis=1, keepdims=True)
+            cov = (centered @ centered.transpose(0, 2, 1)) * (1.0 / n)
+            ssxm, ssxym, ssym = cov[:, 0, 0], cov[:, 0, 1], cov[:, 1, 1]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                r = np.clip(ssxym / np.sqrt(ssxm * ssym), -1.0, 1.0)
+            # 价格全部相同时同linregress：协方差为0时r为NaN，否则为0
+            r = np.where(ssym == 0.0, np.where(ssxym == 0, np.nan, 0.0), r)
+            slope = ssxym / ssxm
+            intercept = y.mean(axis=1) - slope * X.mean()
+
+            future_indices = np.arange(n, n + forecast_periods)
+            predictions = slope[:, None] * future_indices + intercept[:, None]
+            residuals = y - (slope[:, None] * X + intercept[:, None])
+            predict_error = np.sqrt(np.sum(residuals ** 2, axis=1) / (n - 2))
+
+            result['slope'][rows] = slope
+            result['intercept'][rows] = intercept
+            result['r_squared'][rows] = r ** 2
+            result['margin'][rows] = 1.96 * predict_error
+            result['predictions'][rows] = predictions
+        return result
+
+    def polynomial_regression(self, degree: int = 2, forecast_periods: int = 6) -> Dict[str, np.ndarray]:
+        """多项式回归（coefficients为 [序列数, degree+1]，高次在前）"""
+        coefficients = np.empty((len(self), degree + 1))
+        r_squared = np.empty(len(self))
+        predictions = np.empty((len(self), forecast_periods))
+        for n, rows in self.groups.items():
+            X = np.arange(n)
+            y = self.prices[rows, :n]
+            coeffs = np.polyfit(X, y.T, degree).T
+
+            y_pred = np.zeros_like(y)
+            future_indices = np.arange(n, n + forecast_periods)
+            future = np.zeros((len(rows), forecast_periods))
+            for column in range(degree + 1):
+                # 与np.poly1d求值相同的Horner法
+                y_pred = y_pred * X + coeffs[:, column:column + 1]
+                future = future * future_indices + coeffs[:, column:column + 1]
+            ss_res = np.sum((y - y_pred) ** 2, axis=1)
+            ss_tot = np.sum((y - y.mean(axis=1, keepdims=True)) ** 2, axis=1)
+
+            coefficients[rows] = coeffs
+            with np.errstate(invalid='ignore', divide='ignore'):
+                # 价格全部相同时ss_tot为0，结果与单独拟合相同（inf/NaN）
+                r_squared[rows] = 1 - (ss_res / ss_tot)
+            predictions[rows] = future
+        return {"coefficients": coefficients, "r_squared": r_squared, "predictions": predictions}
+
+    def exponential_smoothing(self, alpha: float = 0.3, forecast_periods: int = 6) -> Dict[str, np.ndarray]:
+        """指数平滑（逐期递推，已结束的序列保持最后的平滑值）"""
+        smoothed = self.prices[:, 0].copy()
+        for i in range(1, self.prices.shape[1]):
+            active = self.lengths > i
+            smoothed[active] = alpha * self.prices[active, i] + (1 - alpha) * smoothed[active]
+
+        span = np.minimum(3, self.lengths)
+        recent_trend = (self._tail(1) - self._tail(span)) / span
+        steps = np.arange(1, forecast_periods + 1)
+        return {
+            "last_smoothed_value": smoothed,
+            "recent_trend": recent_trend,
+            "predictions": smoothed[:, None] + recent_trend[:, None] * steps,
+        }
+
+    def moving_average(self, window: int = 3, forecast_periods: int = 6) -> Dict[str, np.ndarray]:
+        """移动平均（序列短于window时该序列取全部记录）"""
+        windows = np.minimum(window, self.lengths)
+        base_prediction = np.empty(len(self))
+        for size in np.unique(windows):
+            rows = np.flatnonzero(windows == size)
+            positions = self.lengths[rows, None] - size + np.arange(size)
+            base_prediction[rows] = np.mean(self.prices[rows[:, None], positions], axis=1)
+        trend = (self._tail(1) - self._tail(windows)) / windows
+        steps = np.arange(1, forecast_periods + 1)
+        return {
+            "window_size": windows,
+            "base_prediction": base_prediction,
+            "trend": trend,
+            "predictions": base_prediction[:, None] + trend[:, None] * steps,
+        }
+
+    def generate_forecast_dates(self, forecast_periods: int = 6) -> List[List[str]]:
+        """各序列的预测日期（同HousePriceForecast：最后日期起每期30天），相同最后日期只计算一次"""
+        cache = {}
+        dates = []
+        for last_date in self.last_dates:
+            if last_date not in cache:
+                cache[last_date] = [(last_date + timedelta(days=30 * i)).strftime('%Y-%m')
+                                    for i in range(1, forecast_periods + 1)]
+            dates.append(cache[last_date])
+        return dates
+
+    def comprehensive_analysis(self, forecast_periods: int = 6) -> List[Dict]:
+        """各序列的综合分析，结构与HousePriceForecast.comprehensive_analysis相同"""
+        degree, alpha = 2, 0.3
+        linear = self.linear_regression(forecast_periods)
+        poly = self.polynomial_regression(degree, forecast_periods)
+        exp = self.exponential_smoothing(alpha, forecast_periods)
+        ma = self.moving_average(3, forecast_periods)
+        ensemble = (0.25 * linear['predictions'] + 0.25 * poly['predictions']
+                    + 0.25 * exp['predictions'] + 0.25 * ma['predictions'])
+        forecast_dates = self.generate_forecast_dates(forecast_periods)
+        current_prices = self._tail(1)
+        historical_avgs = np.nansum(self.prices, axis=1) / self.lengths
+
+        analyses = []
+        for row in range(len(self)):
+            slope, intercept = float(linear['slope'][row]), float(linear['intercept'][row])
+            predictions = linear['predictions'][row]
+            margin = linear['margin'][row]
+            coeffs = poly['coefficients'][row]
+            window = int(ma['window_size'][row])
+            ma_trend = float(ma['trend'][row])
+            methods_results = {
+                "linear": {
+                    "method": "线性回归",
+                    "formula": f"y = {slope:.2f}x + {intercept:.2f}",
+                    "r_squared": float(linear['r_squared'][row]),
+                    "slope": slope,
+                    "intercept": intercept,
+                    "predictions": predictions.tolist(),
+                    "confidence_lower": (predictions - margin).tolist(),
+                    "confidence_upper": (predictions + margin).tolist(),
+                    "trend": "上升" if slope > 0 else "下降",
+                    "monthly_change": slope
+                },
+                "polynomial": {
+                    "method": f"{degree}次多项式回归",
+                    "formula": " + ".join([f"{coeffs[i]:.4f}x^{degree - i}" for i in range(degree + 1)]),
+                    "r_squared": float(poly['r_squared'][row]),
+                    "coefficients": coeffs.tolist(),
+                    "predictions": poly['predictions'][row].tolist()
+                },
+                "exponential": {
+                    "method": "指数平滑",
+                    "alpha": alpha,
+                    "formula": f"基于alpha={alpha}的指数平滑",
+                    "last_smoothed_value": float(exp['last_smoothed_value'][row]),
+                    "recent_trend": float(exp['recent_trend'][row]),
+                    "predictions": exp['predictions'][row].tolist(),
+                    "trend_adjustment": float(exp['recent_trend'][row])
+                },
+                "moving_average": {
+                    "method": f"{window}期移动平均",
+                    "window_size": window,
+                    "formula": f"最近{window}期移动平均，趋势调整:{ma_trend:.4f}",
+                    "base_prediction": float(ma['base_prediction'][row]),
+                    "predictions": ma['predictions'][row].tolist(),
+                    "trend": ma_trend
+                },
+                "ensemble": {
+                    "method": "集成预测",
+                    "formula": "四种方法等权重集成",
+                    "weights": {"linear": 0.25, "polynomial": 0.25, "exponential": 0.25, "moving_average": 0.25},
+                    "predictions": ensemble[row].tolist()
+                }
+            }
+
+            current_price = float(current_prices[row])
+            methods_details = {
+                method_name: {k: v for k, v in method_res.items() if k != 'predictions'}
+                for method_name, method_res in methods_results.items() if method_name != 'ensemble'
+            }
+            avg_change = (ensemble[row, -1] - current_price) / current_price * 100
+
+            analyses.append({
+                "current_price": current_price,
+                "historical_avg": float(historical_avgs[row]),
+                "forecast_dates": forecast_dates[row],
+                "forecast_results": methods_results,
+                "methods_details": methods_details,
+                "summary": {
+                    "trend": "上涨" if avg_change > 2 else "下跌" if avg_change < -2 else "持平",
+                    "change_percent": round(float(avg_change), 2),
+                    "confidence": "中等",
+                    "linear_r_squared": round(methods_results["linear"]["r_squared"], 4),
+                    "polynomial_r_squared": round(methods_results["polynomial"]["r_squared"], 4),
+                    "linear_slope": round(slope, 2),
+                    "exponential_alpha": round(alpha, 2),
+                    "ma_window": window
+                }
+            })
+        return analyses
+
+
+def load_historical_series(cities: List[str], province: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    一次查询读取多个城市的历史月度均价，记录格式同get_historical_prices
+    城市名经名称解析后按trend中存储的名称等值查询（province为限定条件）；无法唯一解析的城市不在结果中
+    """
+    resolver = load_name_resolver()
+    stored = {}
+    for city_name in cities:
+        if resolver is not None:
+            names = resolver.stored_names(resolver.resolve_cities(province, city_name), "trend")
+        else:
+            names = [city_name]
+        if names:
+            stored[city_name] = names
+    if not stored:
+        return {}
+
+    names = list(dict.fromkeys(name for city_names in stored.values() for name in city_names))
+    connection = get_db_connection()
+    if not connection:
+        raise Exception("数据库连接失败")
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            SELECT city_name, year, month, month_avg_price
+            FROM trend
+            WHERE city_name IN ({', '.join('?' * len(names))})
+            ORDER BY year ASC, month ASC
+        """, names)
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+
+    by_name: Dict[str, List[tuple]] = {}
+    for row in rows:
+        by_name.setdefault(row[0], []).append(tuple(row[1:]))
+
+    series = {}
+    for city_name, city_names in stored.items():
+        city_rows = [row for name in city_names for row in by_name.get(name, [])]
+        if len(city_names) > 1:
+            city_rows.sort(key=lambda row: (row[0], row[1]))
+        records = []
+        for year, month, price in city_rows:
+            try:
+                date_str = f"{int(year)}-{int(month):02d}"
+            except Exception:
+                date_str = f"{year}-{month}"
+            records.append({
+                "year": year,
+                "month": month,
+                "date": date_str,
+                "city": city_name,
+                "avg_price": int(price) if price is not None else 0,
+                "price": int(price) if price is not None else 0
+            })
+        if records:
+            series[city_name] = records
+    return series
+
+
 # ==================== 预测接口 ====================
 
 def predict_city_prices(
@@ -429,41 +740,40 @@ def simplified_batch_predict_and_export(cities: List[str], province_override: Op
     all_pred_rows = []  # 只保留指定字段
     summaries = []
 
+    # 一次查询读取全部城市的历史数据，再对全部序列批量拟合
+    histories = load_historical_series(cities, province_override)
+    forecast_cities = []
     for city_name in cities:
+        print(f"Processing city: {city_name}")
+        records = histories.get(city_name)
+        if not records:
+            print(f"Warning: failed to fetch historical for {city_name}: 未找到历史数据")
+            continue
+        for r in records:
+            all_hist_rows.append({
+                'city': city_name,
+                'year': r.get('year'),
+                'month': r.get('month'),
+                'date': r.get('date'),
+                'price': r.get('price') if 'price' in r else r.get('avg_price')
+            })
+        if len(records) < 3:
+            print(f"Warning: prediction failed for {city_name}: 历史数据不足，至少需要3条记录才能进行预测")
+            continue
+        forecast_cities.append(city_name)
+
+    analyses = []
+    if forecast_cities:
+        forecaster = BatchHousePriceForecast(
+            [[{"date": r['date'], "price": r['price']} for r in histories[city_name]] for city_name in forecast_cities]
+        )
+        analyses = forecaster.comprehensive_analysis(forecast_periods)
+
+    for city_name, analysis in zip(forecast_cities, analyses):
         try:
-            print(f"Processing city: {city_name}")
-            province = province_override or city_name
-
-            # 获取源历史数据
-            hist_json = get_historical_prices(province=province, city=city_name)
-            hist_resp = json.loads(hist_json)
-            if hist_resp.get('code') != 200:
-                print(f"Warning: failed to fetch historical for {city_name}: {hist_resp}")
-                continue
-
-            records = hist_resp['data'].get('records', [])
-            for r in records:
-                all_hist_rows.append({
-                    'city': city_name,
-                    'year': r.get('year'),
-                    'month': r.get('month'),
-                    'date': r.get('date'),
-                    'price': r.get('price') if 'price' in r else r.get('avg_price')
-                })
-
-            # 执行预测
-            pred_json = predict_city_prices(province=province, city=city_name, forecast_periods=forecast_periods)
-            pred_resp = json.loads(pred_json)
-            if pred_resp.get('code') != 200:
-                print(f"Warning: prediction failed for {city_name}: {pred_resp}")
-                continue
-
-            analysis = pred_resp['data'].get('analysis', {})
+            records = histories[city_name]
             forecast_dates = analysis.get('forecast_dates', [])
 
-            # 获取预测器实例以解析日期
-            forecaster = HousePriceForecast([{"date": r['date'], "price": r['price']} for r in records])
-
             # 记录所有方法的预测结果 - 仅保留指定字段
             methods_results = analysis.get('forecast_results', {})
             for method_name, method_res in methods_results.items():
@@ -472,7 +782,7 @@ def simplified_batch_predict_and_export(cities: List[str], province_override: Op
                     pred_val = preds[idx] if idx < len(preds) else None
 
                     # 解析日期为年和月
-                    year, month = forecaster.parse_date_to_year_month(date_str)
+                    year, month = HousePriceForecast.parse_date_to_year_month(date_str)
 
                     # 只添加指定的字段
                     all_pred_rows.append({
@@ -484,7 +794,6 @@ def simplified_batch_predict_and_export(cities: List[str], province_override: Op
                         'predicted_price': int(round(pred_val)) if pred_val is not None else None,
                         'method_formula': method_res.get('formula', '')
                     })
-
             # 收集summary信息
             current_price = analysis.get('current_price')
             summary_obj = analysis.get('summary', {}) or {}
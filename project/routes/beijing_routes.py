@@ -1,177 +1,112 @@
 """
 北京数据相关路由
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 import services.data_service as ds
-import json
+from utils.response import json_response
+from utils.http_cache import register_conditional_get
 
 beijing_bp = Blueprint('beijing', __name__, url_prefix='/api/beijing')
 
+# 只读数据接口：按数据版本生成ETag，数据未变化时返回304
+register_conditional_get(beijing_bp, ('beijing_house_info',))
+
 
 @beijing_bp.route('/overview', methods=['GET'])
 def beijing_overview():
     """获取北京房产概览信息"""
-    result = ds.get_beijing_overview()
-    return jsonify(json.loads(result))
+    payload = ds.get_beijing_overview.payload()
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/district-ranking', methods=['GET'])
 def district_ranking():
     """获取北京行政区单价排名"""
-    result = ds.get_district_ranking()
-    return jsonify(json.loads(result))
+    payload = ds.get_district_ranking.payload()
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/district-prices', methods=['GET'])
 def district_prices():
     """获取北京所有行政区的平均单价及记录数"""
-    result = ds.get_district_prices()
-    return jsonify(json.loads(result))
+    payload = ds.get_district_prices.payload()
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/analysis/floor', methods=['GET'])
 def analysis_floor():
     """北京房产楼层特征分析"""
-    result = ds.analysis_floor()
-    return jsonify(json.loads(result))
+    payload = ds.analysis_floor.payload()
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/analysis/layout', methods=['GET'])
 def analysis_layout():
     """北京房产户型特征分析"""
-    result = ds.analysis_layout()
-    return jsonify(json.loads(result))
+    payload = ds.analysis_layout.payload()
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/analysis/orientation', methods=['GET'])
 def analysis_orientation():
     """北京房产朝向特征分析"""
-    result = ds.analysis_orientation()
-    return jsonify(json.loads(result))
+    payload = ds.analysis_orientation.payload()
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/analysis/elevator', methods=['GET'])
 def analysis_elevator():
     """北京房产电梯特征分析"""
-    result = ds.analysis_elevator()
-    return jsonify(json.loads(result))
+    payload = ds.analysis_elevator.payload()
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/chart/scatter', methods=['GET'])
 def get_scatter_data():
-    """获取北京房产面积-价格散点图数据"""
+    """获取北京房产面积-价格散点图数据（mode=raw/sample/grid/hexbin，bins为分箱数）"""
     district = request.args.get('district')
     limit = request.args.get('limit', 1000, type=int)
-    result = ds.get_scatter_data(district, limit)
-    return jsonify(json.loads(result))
+    mode = request.args.get('mode', 'raw')
+    bins = request.args.get('bins', 40, type=int)
+    payload = ds.get_scatter_data.payload(district, limit, mode=mode, bins=bins)
+    return json_response(payload.body)
 
 
 @beijing_bp.route('/chart/boxplot', methods=['GET'])
 def get_boxplot_data():
-    """获取北京指定区域的单价箱线图数据"""
+    """获取北京指定区域的单价箱线图数据（outliers=1 时附带离群点）"""
     district = request.args.get('district', '')
-    result = ds.get_boxplot_data(district)
-    return jsonify(json.loads(result))
-
-@beijing_bp.route('/houses', methods=['GET'])
-def query_houses_list():
-    """北京数据模块 - 房源列表查询"""
-    # 提取所有筛选参数
+    outliers = request.args.get('outliers', '').lower() in ('1', 'true')
+    payload = ds.get_boxplot_data.payload(district, outliers=outliers)
+    return json_response(payload.body)
+
+@beijing_bp.route('/dashboard', methods=['GET'])
+def beijing_dashboard():
+    """北京页面看板：一次返回多个组件的数据（widgets=overview,floor,... 选择组件，默认全部）"""
+    widgets = request.args.get('widgets', '')
     district = request.args.get('district')
-    layout = request.args.get('layout')
-    min_price = request.args.get('min_price', type=int)
-    max_price = request.args.get('max_price', type=int)
-    min_area = request.args.get('min_area', type=int)
-    max_area = request.args.get('max_area', type=int)
-    page = request.args.get('page', 1, type=int)
-    page_size = request.args.get('page_size', 20, type=int)
-
-    result = ds.query_houses_list(
+    limit = request.args.get('limit', 1000, type=int)
+    mode = request.args.get('mode', 'raw')
+    outliers = request.args.get('outliers', '').lower() in ('1', 'true')
+    payload = ds.get_beijing_dashboard(
+        widgets=[name.strip() for name in widgets.split(',')],
         district=district,
-        layout=layout,
-        min_price=min_price,
-        max_price=max_price,
-        min_area=min_area,
-        max_area=max_area,
-        page=page,
-        page_size=page_size
+        scatter_limit=limit,
+        scatter_mode=mode,
+        outliers=outliers
     )
-    return jsonify(json.loads(result))
-"""
-北京数据相关路由
-"""
-from flask import Blueprint, request, jsonify
-import services.data_service as ds
-import json
-
-beijing_bp = Blueprint('beijing', __name__, url_prefix='/api/beijing')
+    return json_response(payload.body)
 
 
-@beijing_bp.route('/overview', methods=['GET'])
-def beijing_overview():
-    """获取北京房产概览信息"""
-    result = ds.get_beijing_overview()
-    return jsonify(json.loads(result))
+@beijing_bp.route('/locations/suggest', methods=['GET'])
+def suggest_locations():
+    """地点联想：输入区域/商圈/小区名称或拼音，返回按匹配程度和房源数排序的候选"""
+    keyword = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    payload = ds.suggest_locations(keyword, limit)
+    return json_response(payload.body)
 
 
-@beijing_bp.route('/district-ranking', methods=['GET'])
-def district_ranking():
-    """获取北京行政区单价排名"""
-    result = ds.get_district_ranking()
-    return jsonify(json.loads(result))
-
-
-@beijing_bp.route('/district-prices', methods=['GET'])
-def district_prices():
-    """获取北京所有行政区的平均单价及记录数"""
-    result = ds.get_district_prices()
-    return jsonify(json.loads(result))
-
-
-@beijing_bp.route('/analysis/floor', methods=['GET'])
-def analysis_floor():
-    """北京房产楼层特征分析"""
-    result = ds.analysis_floor()
-    return jsonify(json.loads(result))
-
-
-@beijing_bp.route('/analysis/layout', methods=['GET'])
-def analysis_layout():
-    """北京房产户型特征分析"""
-    result = ds.analysis_layout()
-    return jsonify(json.loads(result))
-
-
-@beijing_bp.route('/analysis/orientation', methods=['GET'])
-def analysis_orientation():
-    """北京房产朝向特征分析"""
-    result = ds.analysis_orientation()
-    return jsonify(json.loads(result))
-
-
-@beijing_bp.route('/analysis/elevator', methods=['GET'])
-def analysis_elevator():
-    """北京房产电梯特征分析"""
-    result = ds.analysis_elevator()
-    return jsonify(json.loads(result))
-
-
-@beijing_bp.route('/chart/scatter', methods=['GET'])
-def get_scatter_data():
-    """获取北京房产面积-价格散点图数据"""
-    district = request.args.get('district')
-    limit = request.args.get('limit', 1000, type=int)
-    result = ds.get_scatter_data(district, limit)
-    return jsonify(json.loads(result))
-
-
-@beijing_bp.route('/chart/boxplot', methods=['GET'])
-def get_boxplot_data():
-    """获取北京指定区域的单价箱线图数据"""
-    district = request.args.get('district', '')
-    result = ds.get_boxplot_data(district)
-    return jsonify(json.loads(result))
-
 @beijing_bp.route('/houses', methods=['GET'])
 def query_houses_list():
     """北京数据模块 - 房源列表查询"""
@@ -184,8 +119,12 @@ def query_houses_list():
     max_area = request.args.get('max_area', type=int)
     page = request.args.get('page', 1, type=int)
     page_size = request.args.get('page_size', 20, type=int)
+    # 排序与游标分页：sort=total_price/price_per_sqm/area，cursor为上一页返回的next_cursor
+    sort = request.args.get('sort', 'house_id')
+    order = request.args.get('order', 'asc').lower()
+    cursor = request.args.get('cursor')
 
-    result = ds.query_houses_list(
+    payload = ds.query_houses_list.payload(
         district=district,
         layout=layout,
         min_price=min_price,
@@ -193,6 +132,23 @@ def query_houses_list():
         min_area=min_area,
         max_area=max_area,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        sort=sort,
+        order=order,
+        cursor=cursor
+    )
+    return json_response(payload.body)
+
+
+@beijing_bp.route('/houses/facets', methods=['GET'])
+def get_house_facets():
+    """北京数据模块 - 房源筛选分面计数（参数同房源列表查询）"""
+    payload = ds.get_house_facets.payload(
+        district=request.args.get('district'),
+        layout=request.args.get('layout'),
+        min_price=request.args.get('min_price', type=int),
+        max_price=request.args.get('max_price', type=int),
+        min_area=request.args.get('min_area', type=int),
+        max_area=request.args.get('max_area', type=int)
     )
-    return jsonify(json.loads(result))
+    return json_response(payload.body)
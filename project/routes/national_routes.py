@@ -1,18 +1,22 @@
 """
 全国数据相关路由
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 import services.data_service as ds
-import json
+from utils.response import json_response
+from utils.http_cache import register_conditional_get
 
 national_bp = Blueprint('national', __name__, url_prefix='/api/national')
 
+# 只读数据接口：按数据版本生成ETag，数据未变化时返回304
+register_conditional_get(national_bp, ('current_price', 'trend', 'predict1'))
+
 
 @national_bp.route('/overview', methods=['GET'])
 def national_overview():
     """获取全国房价概览"""
-    result = ds.get_national_overview()
-    return jsonify(json.loads(result))
+    payload = ds.get_national_overview.payload()
+    return json_response(payload.body)
 
 
 @national_bp.route('/city-prices', methods=['GET'])
@@ -21,15 +25,15 @@ def city_prices():
     province = request.args.get('province', '')
     min_price = request.args.get('min_price', type=int)
     max_price = request.args.get('max_price', type=int)
-    result = ds.get_city_prices(province, min_price, max_price)
-    return jsonify(json.loads(result))
+    payload = ds.get_city_prices.payload(province, min_price, max_price)
+    return json_response(payload.body)
 
 
 @national_bp.route('/provinces', methods=['GET'])
 def province_list():
     """获取所有省份列表"""
-    result = ds.get_province_list()
-    return jsonify(json.loads(result))
+    payload = ds.get_province_list.payload()
+    return json_response(payload.body)
 
 
 @national_bp.route('/ranking', methods=['GET'])
@@ -38,48 +42,53 @@ def city_ranking():
     rank_type = request.args.get('type', 'price')
     limit = request.args.get('limit', 10, type=int)
     order = request.args.get('order', 'desc')
-    result = ds.get_city_ranking(rank_type, limit, order)
-    return jsonify(json.loads(result))
+    payload = ds.get_city_ranking.payload(rank_type, limit, order)
+    return json_response(payload.body)
 
 
 @national_bp.route('/search', methods=['GET'])
 def search_city():
     """城市搜索"""
     keyword = request.args.get('keyword', '')
-    result = ds.search_city(keyword)
-    return jsonify(json.loads(result))
+    payload = ds.search_city.payload(keyword)
+    return json_response(payload.body)
 
 
 @national_bp.route('/trend', methods=['GET'])
 def price_trend():
-    """获取城市价格趋势"""
+    """获取城市价格趋势（cities=北京,上海 时返回多城市对比，period=month/quarter/year）"""
     city = request.args.get('city', '')
     year = request.args.get('year', type=int)
-    result = ds.get_price_trend(city, year)
-    return jsonify(json.loads(result))
+    cities = request.args.get('cities', '')
+    if cities:
+        period = request.args.get('period', 'month')
+        payload = ds.compare_price_trends.payload(tuple(cities.split(',')), year, period)
+    else:
+        payload = ds.get_price_trend.payload(city, year)
+    return json_response(payload.body)
 
 
 @national_bp.route('/clustering', methods=['GET'])
 def city_clustering():
     """方案C：城市分级气泡图数据"""
-    result = ds.get_city_clustering()
-    return jsonify(json.loads(result))
+    payload = ds.get_city_clustering.payload()
+    return json_response(payload.body)
 
 
 @national_bp.route('/heatmap', methods=['GET'])
 def district_change_heatmap():
     """方案C：区县涨跌比热力图"""
     city = request.args.get('city', '')
-    result = ds.get_district_change_heatmap(city)
-    return jsonify(json.loads(result))
+    payload = ds.get_district_change_heatmap.payload(city)
+    return json_response(payload.body)
 
 
 @national_bp.route('/listing-ranking', methods=['GET'])
 def listing_top_ranking():
     """方案C：挂牌量TOP排行"""
     limit = request.args.get('limit', 20, type=int)
-    result = ds.get_listing_top_ranking(limit)
-    return jsonify(json.loads(result))
+    payload = ds.get_listing_top_ranking.payload(limit)
+    return json_response(payload.body)
 
 
 @national_bp.route('/district-ranking', methods=['GET'])
@@ -87,16 +96,16 @@ def district_price_ranking():
     """方案D：区县价格排行"""
     limit = request.args.get('limit', 50, type=int)
     city = request.args.get('city', '')
-    result = ds.get_district_price_ranking(limit, city)
-    return jsonify(json.loads(result))
+    payload = ds.get_district_price_ranking.payload(limit, city)
+    return json_response(payload.body)
 
 
 @national_bp.route('/city-districts', methods=['GET'])
 def city_districts_comparison():
     """方案D：同城区县对比"""
     city = request.args.get('city', '')
-    result = ds.get_city_districts_comparison(city)
-    return jsonify(json.loads(result))
+    payload = ds.get_city_districts_comparison.payload(city)
+    return json_response(payload.body)
 
 
 @national_bp.route('/district-change-ranking', methods=['GET'])
@@ -104,5 +113,5 @@ def district_change_ranking():
     """方案D：区县涨跌榜"""
     limit = request.args.get('limit', 30, type=int)
     order = request.args.get('order', 'desc')
-    result = ds.get_district_change_ranking(limit, order)
-    return jsonify(json.loads(result))
+    payload = ds.get_district_change_ranking.payload(limit, order)
+    return json_response(payload.body)
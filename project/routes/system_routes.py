@@ -1,6 +1,13 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from utils import get_db_connection
+from utils.database import get_pool_stats, get_data_version
+from utils.sql_trace import tracer
+from services.house_snapshot import get_snapshot_stats
+from services.cache import response_cache
+from services.area_stats import get_area_stats_cache_stats
+from services.national_rankings import get_national_rankings_stats
+from services.trend_store import get_trend_store_stats
 
 system_bp = Blueprint('system', __name__, url_prefix='/api/system')
 
@@ -77,6 +84,39 @@ def get_data_update_time():
         }), 500
 
 
+@system_bp.route('/db-stats', methods=['GET'])
+def get_db_stats():
+    """
+    获取数据库运行统计（连接池 + 数据版本 + 房源快照 + 全国排行 + 时间序列 + 响应缓存 + 区域统计缓存 + SQL耗时排行）
+    GET /api/system/db-stats?top=20&order_by=total_ms
+    order_by: total_ms / avg_ms / max_ms / count / rows / slow_count
+    """
+    try:
+        top = max(1, min(request.args.get('top', 20, type=int), 200))
+        order_by = request.args.get('order_by', 'total_ms')
+
+        return jsonify({
+            "code": 200,
+            "data": {
+                "pool": get_pool_stats(),
+                "data_version": get_data_version(),
+                "snapshot": get_snapshot_stats(),
+                "national_rankings": get_national_rankings_stats(),
+                "trend_store": get_trend_store_stats(),
+                "response_cache": response_cache.stats(),
+                "area_stats_cache": get_area_stats_cache_stats(),
+                "trace": tracer.summary(),
+                "top_statements": tracer.top(top, order_by)
+            },
+            "message": "获取成功"
+        })
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"获取数据库统计失败: {str(e)}"
+        }), 500
+
+
 @system_bp.route('/feedback', methods=['POST'])
 def submit_feedback():
     """
@@ -13,6 +13,13 @@ from config import CONFIG, validate_config
 
 # 导入工具函数
 from utils import init_db_pool, close_db_pool
+from utils.migrations import run_migrations
+from services.house_snapshot import init_house_snapshot
+from services.area_stats import init_area_stats_warmer
+from services.location_suggest import init_location_suggest
+from services.national_rankings import init_national_rankings
+from services.name_resolver import init_name_resolver
+from services.trend_store import init_trend_store
 
 # 导入所有路由蓝图
 from routes.report_routes import reports_bp
@@ -34,8 +41,30 @@ app.config['DEBUG'] = CONFIG['flask']['debug']
 # 验证配置
 validate_config()
 
-# 初始化数据库连接池（应用启动时执行一次）
-init_db_pool()
+# 初始化数据库连接池（应用启动时执行一次，并绑定请求结束时的连接归还）
+init_db_pool(app)
+
+# 执行数据库结构迁移（创建索引等，已执行的版本会跳过）
+if CONFIG['database']['auto_migrate']:
+    run_migrations()
+
+# 预加载北京房源内存快照
+init_house_snapshot()
+
+# 构建地点联想索引（区域、商圈、小区及拼音）
+init_location_suggest()
+
+# 刷新全国城市汇总表并构建城市/区县排行
+init_national_rankings()
+
+# 构建全国省份/城市/区县名称解析索引
+init_name_resolver()
+
+# 加载城市房价时间序列（趋势、预测及季度/年度汇总）
+init_trend_store()
+
+# 后台预热热门区域的统计（对话咨询、报告生成直接命中缓存）
+init_area_stats_warmer()
 
 # 注册应用关闭时的清理函数
 atexit.register(close_db_pool)
@@ -9,7 +9,7 @@ from pathlib import Path
 from typing import Dict, List, Optional
 
 from LLM.spark_client import call_spark_api
-from tools.house_query import get_area_statistics, query_houses_by_requirements, count_matched_houses
+from tools.house_query import get_area_statistics, match_houses
 from services.message_parser import extract_district_from_message
 
 
@@ -311,11 +311,8 @@ class AIService:
     def process_recommendation(self, requirements: Dict) -> Dict:
         """处理推荐请求 - 返回全部符合条件的房源"""
         try:
-            # 1. 查询符合条件的全部房源（不限制数量）
-            matched_houses = query_houses_by_requirements(requirements, limit=1000)
-
-            # 2. 统计总匹配数
-            total_matched = count_matched_houses(requirements)
+            # 1. 查询符合条件的房源（最多1000条），同一次筛选得到总匹配数
+            matched_houses, total_matched = match_houses(requirements, limit=1000)
 
             if len(matched_houses) == 0:
                 return {
@@ -325,7 +322,7 @@ class AIService:
                     'message': '未找到符合条件的房源，建议调整筛选条件'
                 }
 
-            # 3. 构建推荐结果（返回全部）
+            # 2. 构建推荐结果（返回全部）
             recommendations = []
             for house in matched_houses:
                 match_score = self._calculate_simple_match_score(house, requirements)
@@ -0,0 +1,195 @@
+"""
+区域统计缓存
+get_area_statistics 的结果按 (区域, 城市, 数据版本) 缓存，对话咨询、AI报告、统计接口共用：
+- LRU + TTL，条目数有上限；依赖表数据版本变化时立即失效
+- 后台线程在数据版本变化（或条目即将过期）时预先计算北京各行政区和热门商圈的统计，
+  热门区域的请求直接命中缓存，不再访问SQLite
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from config import CONFIG
+from services.cache import ResponseCache
+from services.house_snapshot import get_house_snapshot
+from utils.database import get_db_connection, get_data_version
+
+# 区域统计依赖的数据表（北京房源 + 全国区县数据）
+AREA_STATS_TABLES = ('beijing_house_info', 'current_price')
+# 条目剩余寿命低于该比例时由预热线程提前刷新
+_REFRESH_RATIO = 0.8
+
+area_stats_cache = ResponseCache(
+    max_entries=CONFIG['area_stats_cache']['max_entries'],
+    default_ttl=CONFIG['area_stats_cache']['ttl'],
+)
+
+
+def is_cacheable_statistics(result) -> bool:
+    """统计成功或确认没有数据时可以缓存；数据库连接失败、查询异常不缓存"""
+    if not isinstance(result, dict):
+        return False
+    error = result.get('error')
+    return not error or error.startswith('未找到')
+
+
+def _cache_key(area_name: str, city: Optional[str]) -> tuple:
+    return ('get_area_statistics', area_name, city)
+
+
+def get_cached_area_statistics(area_name: str, city: Optional[str],
+                               compute: Callable[[str, Optional[str]], Dict]) -> Dict:
+    """
+    读取区域统计缓存，未命中时调用compute计算并写入
+    返回的字典为缓存共享对象，调用方只读，不要修改
+    """
+    if not CONFIG['area_stats_cache']['enabled'] or not area_name:
+        return compute(area_name, city)
+    version = get_data_version(*AREA_STATS_TABLES)
+    return area_stats_cache.get_or_compute(
+        _cache_key(area_name, city), version, lambda: compute(area_name, city),
+        cacheable=is_cacheable_statistics
+    )
+
+
+def popular_areas(business_areas: int) -> List[str]:
+    """需要预热的区域：全部行政区（按房源数降序）+ 房源数最多的若干商圈"""
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        def top(column: str, limit: Optional[int]) -> List[str]:
+            groups = [group for group in snapshot.group_by(column) if group['key']]
+            groups.sort(key=lambda group: -group['count'])
+            return [group['key'] for group in (groups[:limit] if limit is not None else groups)]
+        return top('region', None) + top('business_area', business_areas)
+
+    connection = get_db_connection()
+    if not connection:
+        return []
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT region FROM beijing_house_info
+            WHERE region IS NOT NULL AND region != ''
+            GROUP BY region ORDER BY COUNT(*) DESC
+        """)
+        areas = [row['region'] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT business_area FROM beijing_house_info
+            WHERE business_area IS NOT NULL AND business_area != ''
+            GROUP BY business_area ORDER BY COUNT(*) DESC LIMIT ?
+        """, (business_areas,))
+        areas += [row['business_area'] for row in cursor.fetchall()]
+        cursor.close()
+        return areas
+    finally:
+        connection.close()
+
+
+class AreaStatsWarmer:
+    """区域统计预热线程"""
+
+    def __init__(self, interval: float, business_areas: int):
+        self.interval = interval
+        self.business_areas = business_areas
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._version: Optional[str] = None
+        self._warmed_at = 0.0
+        self._stats = {
+            'runs': 0,
+            'areas': 0,
+            'failures': 0,
+            'last_run_at': None,
+            'last_duration_ms': None,
+            'last_version': None,
+        }
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='area-stats-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _due(self, version: Optional[str]) -> bool:
+        """数据版本变化，或上次预热的条目即将过期"""
+        if version != self._version:
+            return True
+        return time.monotonic() - self._warmed_at > area_stats_cache.default_ttl * _REFRESH_RATIO
+
+    def _run(self):
+        while True:
+            try:
+                version = get_data_version(*AREA_STATS_TABLES)
+                if version is not None and self._due(version):
+                    self.warm(version)
+            except Exception as e:
+                print(f"[WARNING] 区域统计预热失败: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def warm(self, version: Optional[str] = None):
+        """计算热门区域的统计并写入缓存"""
+        # 延迟导入：tools.house_query 依赖本模块
+        from tools.house_query import compute_area_statistics
+
+        version = version or get_data_version(*AREA_STATS_TABLES)
+        started = time.perf_counter()
+        areas = popular_areas(self.business_areas)
+        failures = 0
+        for area in areas:
+            if self._stop.is_set():
+                break
+            result = compute_area_statistics(area)
+            if is_cacheable_statistics(result):
+                area_stats_cache.put(_cache_key(area, None), version, result)
+            else:
+                failures += 1
+
+        self._version = version
+        self._warmed_at = time.monotonic()
+        self._stats.update({
+            'runs': self._stats['runs'] + 1,
+            'areas': len(areas),
+            'failures': self._stats['failures'] + failures,
+            'last_run_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'last_duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'last_version': version,
+        })
+        print(f"[INFO] 区域统计预热完成: {len(areas)} 个区域，耗时 {self._stats['last_duration_ms']}ms")
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats.update({
+            'running': self._thread is not None and self._thread.is_alive(),
+            'interval': self.interval,
+            'business_areas': self.business_areas,
+        })
+        return stats
+
+
+area_stats_warmer = AreaStatsWarmer(
+    interval=CONFIG['area_stats_cache']['warm_interval'],
+    business_areas=CONFIG['area_stats_cache']['warm_business_areas'],
+)
+
+
+def init_area_stats_warmer():
+    """服务启动时开启区域统计预热线程"""
+    if not CONFIG['area_stats_cache']['enabled'] or area_stats_warmer.interval <= 0:
+        print("[INFO] 区域统计预热已关闭")
+        return
+    area_stats_warmer.start()
+
+
+def get_area_stats_cache_stats() -> Dict:
+    """区域统计缓存与预热状态（供系统监控接口使用）"""
+    stats = area_stats_cache.stats()
+    stats['enabled'] = CONFIG['area_stats_cache']['enabled']
+    stats.pop('disabled_functions', None)
+    stats['warmer'] = area_stats_warmer.stats()
+    return stats
@@ -0,0 +1,279 @@
+"""
+数据服务响应缓存
+- LRU + TTL，键为 函数名 + 规范化后的参数
+- 以依赖表的数据版本（utils.database.get_data_version）判断失效，数据变化后立即重新计算
+- 单飞（single-flight）：同一个键同时只有一个线程计算，其余线程等待并共享结果
+- 只缓存成功结果（code为200），失败结果每次重新计算
+- service_api：服务函数返回字典，缓存中同时保存序列化好的响应体，路由直接输出
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence
+
+from config import CONFIG
+from utils.database import get_data_version
+from utils.response import dumps
+
+# 跟随者等待计算结果的最长时间（秒），超时后自行计算
+_FLIGHT_WAIT_SECONDS = 30
+
+
+def is_success(result) -> bool:
+    """判断服务函数返回值是否为成功结果（字典或ServicePayload，code为200）"""
+    if isinstance(result, ServicePayload):
+        return result.ok
+    if isinstance(result, dict):
+        return result.get('code') == 200
+    return False
+
+
+class ServicePayload:
+    """
+    服务函数的返回结果
+    data为原始字典（调用方只读，不要修改），body/text为按需序列化并随缓存复用的结果
+    """
+
+    __slots__ = ('data', '_body', '_text')
+
+    def __init__(self, data: Dict):
+        self.data = data
+        self._body = None
+        self._text = None
+
+    @property
+    def ok(self) -> bool:
+        return isinstance(self.data, dict) and self.data.get('code') == 200
+
+    @property
+    def body(self) -> bytes:
+        """响应体（UTF-8 JSON）"""
+        if self._body is None:
+            self._body = dumps(self.data)
+        return self._body
+
+    @classmethod
+    def combine(cls, parts: Dict[str, 'ServicePayload']) -> 'ServicePayload':
+        """
+        把多个服务结果合并为 {"code":200,"data":{名称: 各自的完整响应}}
+        响应体直接拼接各部分已序列化（并已缓存）的body，不再重复序列化
+        """
+        combined = cls({"code": 200, "data": {name: part.data for name, part in parts.items()}})
+        members = b','.join(dumps(name) + b':' + part.body for name, part in parts.items())
+        combined._body = b'{"code":200,"data":{' + members + b'}}'
+        return combined
+
+    @property
+    def text(self) -> str:
+        """兼容旧接口的JSON字符串（与原 json.dumps(..., ensure_ascii=False) 格式一致）"""
+        if self._text is None:
+            self._text = json.dumps(self.data, ensure_ascii=False)
+        return self._text
+
+
+class _Flight:
+    """正在进行中的一次计算"""
+
+    __slots__ = ('event', 'result', 'ok')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.ok = False
+
+
+class ResponseCache:
+    """带数据版本校验与单飞的LRU + TTL缓存"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._flights: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+        self._disabled = set(CONFIG['response_cache']['disabled'])
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'uncacheable': 0,
+        }
+        self._function_stats: Dict[str, Dict[str, int]] = {}
+
+    # ---------- 开关 ----------
+
+    def is_enabled(self, name: str) -> bool:
+        return CONFIG['response_cache']['enabled'] and name not in self._disabled
+
+    def disable(self, name: str):
+        """关闭某个函数的缓存，并清除其已缓存的结果"""
+        with self._lock:
+            self._disabled.add(name)
+            for key in [key for key in self._entries if key[0] == name]:
+                del self._entries[key]
+
+    def enable(self, name: str):
+        with self._lock:
+            self._disabled.discard(name)
+
+    # ---------- 读写 ----------
+
+    def _count(self, name: str, field: str):
+        self._stats[field] += 1
+        per_function = self._function_stats.setdefault(name, {'hits': 0, 'misses': 0})
+        if field in per_function:
+            per_function[field] += 1
+
+    def get_or_compute(self, key: tuple, version: Optional[str], compute: Callable,
+                       ttl: Optional[float] = None, cacheable: Callable = is_success):
+        """
+        读取缓存，未命中时计算并写入
+        :param key: 缓存键，key[0]为函数名
+        :param version: 依赖数据的版本号，与缓存条目不一致即视为失效
+        :param compute: 无参计算函数
+        :param ttl: 过期时间（秒），None使用默认值
+        :param cacheable: 判断结果是否可以缓存
+        """
+        name = key[0]
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires_at, value = entry
+                if entry_version == version and expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._count(name, 'hits')
+                    return value
+                del self._entries[key]
+                self._stats['invalidations' if entry_version != version else 'expirations'] += 1
+
+            self._count(name, 'misses')
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            if flight.event.wait(_FLIGHT_WAIT_SECONDS) and flight.ok:
+                return flight.result
+            # 领头线程失败或超时，自行计算
+            return compute()
+
+        try:
+            value = compute()
+            flight.result = value
+            flight.ok = True
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                if flight.ok:
+                    if cacheable(value):
+                        self._entries[key] = (version, now + (self.default_ttl if ttl is None else ttl), value)
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+                            self._stats['evictions'] += 1
+                    else:
+                        self._stats['uncacheable'] += 1
+            flight.event.set()
+        return value
+
+    def put(self, key: tuple, version: Optional[str], value, ttl: Optional[float] = None):
+        """直接写入（如后台预热），覆盖已有条目"""
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + (self.default_ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'enabled': CONFIG['response_cache']['enabled'],
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'default_ttl': self.default_ttl,
+                'in_flight': len(self._flights),
+                'disabled_functions': sorted(self._disabled),
+                'functions': {name: dict(counts) for name, counts in self._function_stats.items()},
+            })
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# 全局缓存实例
+response_cache = ResponseCache(
+    max_entries=CONFIG['response_cache']['max_entries'],
+    default_ttl=CONFIG['response_cache']['ttl'],
+)
+
+
+def _make_key(name: str, signature: inspect.Signature, args, kwargs) -> Optional[tuple]:
+    """按函数签名绑定参数并补全默认值，生成缓存键；参数不可哈希时返回None"""
+    try:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (name,) + tuple(bound.arguments.items())
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
+
+def service_api(tables: Sequence[str], ttl: Optional[float] = None, enabled: bool = True):
+    """
+    服务函数装饰器：被装饰函数返回字典，结果（含序列化好的响应体）缓存在response_cache中
+
+    参数按函数签名绑定并补全默认值后作为键，因此位置参数与关键字参数的调用方式共用缓存；
+    未开启缓存或参数不可哈希时直接调用。被装饰函数的 __wrapped__ 为原始函数，可用于绕过缓存。
+
+    - func(...)          兼容旧接口，返回JSON字符串
+    - func.native(...)   返回字典（只读）
+    - func.payload(...)  返回ServicePayload，路由以 payload.body 直接输出响应
+
+    Args:
+        tables: 结果依赖的数据表，任一表数据变化时缓存失效
+        ttl: 过期时间（秒），默认使用配置RESPONSE_CACHE_TTL
+        enabled: False表示该函数不缓存
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = func.__name__
+        if not enabled:
+            response_cache.disable(name)
+
+        def payload(*args, **kwargs) -> ServicePayload:
+            key = _make_key(name, signature, args, kwargs) if response_cache.is_enabled(name) else None
+            if key is None:
+                return ServicePayload(func(*args, **kwargs))
+            version = get_data_version(*tables)
+            return response_cache.get_or_compute(
+                key, version, lambda: ServicePayload(func(*args, **kwargs)), ttl
+            )
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> str:
+            return payload(*args, **kwargs).text
+
+        wrapper.native = lambda *args, **kwargs: payload(*args, **kwargs).data
+        wrapper.payload = payload
+        wrapper.cache_tables = tuple(tables)
+        return wrapper
+
+    return decorator
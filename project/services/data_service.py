@@ -3,10 +3,29 @@
 提供房产数据的查询和分析服务
 使用数据库连接池提升性能
 """
+import base64
 import json
+import numpy as np
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
-from utils import get_db_connection  # 使用连接池
+from config import CONFIG
+from utils import get_db_connection, get_data_version  # 使用连接池
+from services.house_snapshot import get_house_snapshot, grouped_quantiles, sql_round
+from services.house_facets import BitmapIndex
+from services.cache import service_api, ServicePayload, response_cache
+from services.location_index import location_condition
+from services.downsample import grid_bins, hex_bins, stratified_sample
+from services.location_suggest import SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT, get_location_index
+from services.national_rankings import CITY_RANK_METRICS, get_national_rankings
+from services.name_resolver import city_condition, load_name_resolver
+from services.trend_store import TREND_PERIODS, load_trend_store
+from utils.house_columns import FLOOR_LEVELS, has_typed_house_columns, layout_rooms
+from utils.house_summary import load_house_summary
+
+# 各类接口依赖的数据表（用于缓存失效判断）
+NATIONAL_TABLES = ('current_price',)
+TREND_TABLES = ('trend', 'predict1')
+BEIJING_TABLES = ('beijing_house_info',)
 
 
 def user_login(username: str, password: str) -> str:
@@ -76,18 +95,56 @@ def user_login(username: str, password: str) -> str:
         }, ensure_ascii=False)
 
 
-def get_national_overview() -> str:
+def _load_national_rankings():
+    """
+    全国城市汇总与排行（city_summary + 预排序数组，按current_price数据版本缓存）
+    构建失败时返回None，调用方改用全表查询
+    """
+    try:
+        return get_national_rankings()
+    except Exception as e:
+        print(f"全国排行构建失败: {e}")
+        return None
+
+
+def _national_overview_from_rankings(rankings) -> Dict:
+    priced = [city['city_avg_price'] for city in rankings.cities if city['city_avg_price'] is not None]
+    highest = rankings.top_cities('price', 1)
+    lowest = rankings.top_cities('price', 1, descending=False, positive=True)
+    highest_city = highest[0] if highest else {'city_name': '未知', 'city_avg_price': 0}
+    lowest_city = lowest[0] if lowest else {'city_name': '未知', 'city_avg_price': 0}
+    return {
+        "national_avg_price": int(sql_round(sum(priced) / len(priced), 0)) if priced else 0,
+        "highest_city": {
+            "name": highest_city['city_name'],
+            "price": int(highest_city['city_avg_price'])
+        },
+        "lowest_city": {
+            "name": lowest_city['city_name'],
+            "price": int(lowest_city['city_avg_price'])
+        },
+        "total_listings": int(sum(city['listing_count'] or 0 for city in rankings.cities)),
+        "total_cities": len(rankings.cities)
+    }
+
+
+@service_api(NATIONAL_TABLES)
+def get_national_overview() -> Dict:
     """
     实现GET /api/national/overview
-    获取全国房价概览（使用current_price表）- 优化为单次查询
+    获取全国房价概览（使用current_price表）- 优先读取城市汇总，不可用时单次查询
     """
+    rankings = _load_national_rankings()
+    if rankings is not None:
+        return {"code": 200, "data": _national_overview_from_rankings(rankings)}
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -140,18 +197,19 @@ def get_national_overview() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"全国概览查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
-def get_city_prices(province: str, min_price: Optional[int] = None, max_price: Optional[int] = None) -> str:
+@service_api(NATIONAL_TABLES)
+def get_city_prices(province: str, min_price: Optional[int] = None, max_price: Optional[int] = None) -> Dict:
     """
     实现GET /api/national/city-prices
     获取城市房价及区县数据（使用current_price表）
@@ -161,11 +219,11 @@ def get_city_prices(province: str, min_price: Optional[int] = None, max_price: O
     """
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -258,31 +316,32 @@ def get_city_prices(province: str, min_price: Optional[int] = None, max_price: O
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"❌ [DEBUG] 城市房价查询失败: {e}")
         import traceback
         traceback.print_exc()
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
-def get_province_list() -> str:
+@service_api(NATIONAL_TABLES)
+def get_province_list() -> Dict:
     """
     实现GET /api/national/provinces
     获取所有省份列表（使用current_price表）
     """
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -304,18 +363,19 @@ def get_province_list() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"省份列表查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
-def get_city_ranking(rank_type: str, limit: int = 10, order: str = "desc") -> str:
+@service_api(NATIONAL_TABLES)
+def get_city_ranking(rank_type: str, limit: int = 10, order: str = "desc") -> Dict:
     """
     实现GET /api/national/ranking
     获取城市排行榜（使用current_price表）
@@ -326,11 +386,11 @@ def get_city_ranking(rank_type: str, limit: int = 10, order: str = "desc") -> st
     # 验证参数
     valid_types = ["price", "change", "rent_ratio"]
     if rank_type not in valid_types:
-        return json.dumps({
+        return {
             "code": 400,
             "data": {},
             "message": f"rank_type必须是{valid_types}中的一种"
-        }, ensure_ascii=False)
+        }
 
     valid_orders = ["desc", "asc"]
     if order not in valid_orders:
@@ -338,13 +398,28 @@ def get_city_ranking(rank_type: str, limit: int = 10, order: str = "desc") -> st
 
     limit = max(1, min(limit, 50))  # 限制返回数量1-50之间
 
+    rankings = _load_national_rankings()
+    if rankings is not None:
+        # 城市汇总中的预排序数组：涨跌比为城市下所有区县的平均值，房价/租售比只取正值
+        cities = rankings.top_cities(rank_type, limit, descending=order == "desc",
+                                     positive=rank_type != "change")
+        ranking = []
+        for idx, item in enumerate(cities, 1):
+            value = item[CITY_RANK_METRICS[rank_type]]
+            ranking.append({
+                "rank": idx,
+                "city_name": item['city_name'],
+                "value": int(value) if rank_type != "change" else sql_round(value, 1)
+            })
+        return {"code": 200, "data": {"type": rank_type, "ranking": ranking}}
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -404,37 +479,53 @@ def get_city_ranking(rank_type: str, limit: int = 10, order: str = "desc") -> st
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"城市排行榜查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
-def search_city(keyword: str) -> str:
+@service_api(NATIONAL_TABLES)
+def search_city(keyword: str) -> Dict:
     """
     实现GET /api/national/search
     城市搜索（使用current_price表）
     :param keyword: 搜索关键词（必填）
     """
     if not keyword or not keyword.strip():
-        return json.dumps({
+        return {
             "code": 400,
             "data": {},
             "message": "keyword参数为必填项"
-        }, ensure_ascii=False)
+        }
+
+    resolver = load_name_resolver()
+    if resolver is not None:
+        # 名称解析索引：城市/省份名称包含关键词，或拼音以关键词开头
+        return {
+            "code": 200,
+            "data": {"results": [
+                {
+                    "city_name": city_name,
+                    "province_name": province_name,
+                    "city_avg_price": int(avg_price) if avg_price is not None else 0
+                }
+                for city_name, province_name, avg_price in resolver.search_cities(keyword, 20)
+            ]}
+        }
 
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -474,33 +565,82 @@ def search_city(keyword: str) -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"城市搜索失败: {e}")
         import traceback
         traceback.print_exc()
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
+
+
+# 多城市趋势对比最多的城市数
+TREND_COMPARE_MAX_CITIES = 10
+
 
+def _trend_store_names(store, city: str) -> Tuple[Optional[str], Optional[str]]:
+    """城市名 -> (trend中的城市名, predict1中的城市名)，无法唯一解析时为None"""
+    resolver = load_name_resolver()
+    if resolver is None:
+        name = store.find_city(city)
+        return name, (name if name in store.predicts else None)
+    cities = resolver.resolve_cities(city=city)
+    trend_names = [name for name in resolver.stored_names(cities, 'trend') if store.has_city(name)]
+    predict_names = resolver.stored_names(cities, 'predict1')
+    return (trend_names[0] if trend_names else None), (predict_names[0] if predict_names else None)
 
-def get_price_trend(city: str, year: Optional[int] = None) -> str:
+
+def _trends_from_store(store, city: str, year: Optional[int], period: str = 'month') -> List[Dict]:
+    """
+    从时间序列存储取趋势（city为空时为全国平均），年份规则与SQL查询一致：
+    2017~2025年只返回该年，其他年份返回全部；2026年按月查询城市时追加预测数据
+    """
+    year_filter = year if year and 2017 <= year <= 2025 else None
+    trend_name, predict_name = _trend_store_names(store, city) if city else (None, None)
+    if city and trend_name is None:
+        series = []
+    else:
+        series = store.series(trend_name, year_filter, period)
+    trends = [dict(item, avg_price=int(item['avg_price']), predict='exist') for item in series]
+    if year == 2026 and city and period == 'month' and predict_name is not None:
+        trends.extend({
+            "year": predict_year,
+            "month": predict_month,
+            "avg_price": int(price),
+            "predict": method
+        } for predict_year, predict_month, price, method in store.predictions(predict_name))
+    return trends
+
+
+@service_api(TREND_TABLES)
+def get_price_trend(city: str, year: Optional[int] = None) -> Dict:
     """
     实现GET /api/national/trend
     获取城市价格趋势（使用trend表）
     :param city: 城市名（可选，为空时返回全国平均趋势）
     :param year: 年份（可选，默认返回2023-2025年数据）
     """
+    store = load_trend_store()
+    if store is not None:
+        return {
+            "code": 200,
+            "data": {
+                "city_name": city.strip(),
+                "trends": _trends_from_store(store, city.strip(), year)
+            }
+        }
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -512,16 +652,28 @@ def get_price_trend(city: str, year: Optional[int] = None) -> str:
         else:
             year_condition = ""
 
+        # 城市名称条件：名称解析可用时按trend/predict1中存储的名称等值查询，
+        # 无法唯一解析（不存在或如"州"匹配多个城市）时不返回数据；解析不可用时退回LIKE
+        resolver = load_name_resolver()
+        city_cities = resolver.resolve_cities(city=city.strip()) if resolver is not None and city and city.strip() else []
+
+        def name_condition(column: str, table: str) -> Tuple[str, list]:
+            if resolver is None:
+                return f"{column} LIKE ?", [f"%{city.strip()}%"]
+            return city_condition(resolver, column, table, city_cities)
+
+        params = []
         # 根据是否有city参数决定查询方式
         if city and city.strip():
             # 查询指定城市
+            condition, params = name_condition('city_name', 'trend')
             query = f"""
             SELECT
                 year,
                 month,
                 month_avg_price as avg_price
             FROM trend
-            WHERE city_name LIKE '%{city.strip()}%'
+            WHERE {condition}
             {year_condition}
             ORDER BY year ASC, month ASC
             """
@@ -537,12 +689,13 @@ def get_price_trend(city: str, year: Optional[int] = None) -> str:
             GROUP BY year, month
             ORDER BY year ASC, month ASC
             """
-        cursor.execute(query)
+        cursor.execute(query, params)
         trends = cursor.fetchall()
 
         # 预测数据查询（仅2026年时查询）
         predicts = []
         if year == 2026 and city and city.strip():
+            condition, p_params = name_condition('city', 'predict1')
             p_query = f"""
             SELECT
                 year,
@@ -550,10 +703,10 @@ def get_price_trend(city: str, year: Optional[int] = None) -> str:
                 predicted_price as avg_price,
                 method
             FROM predict1
-            WHERE city LIKE '%{city.strip()}%'
+            WHERE {condition}
             ORDER BY year ASC, month ASC
             """
-            cursor.execute(p_query)
+            cursor.execute(p_query, p_params)
             predicts = cursor.fetchall()
 
         # 格式化结果
@@ -585,24 +738,161 @@ def get_price_trend(city: str, year: Optional[int] = None) -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"价格趋势查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
-def get_beijing_overview() -> str:
+@service_api(TREND_TABLES)
+def compare_price_trends(cities: Tuple[str, ...], year: Optional[int] = None, period: str = 'month') -> Dict:
+    """
+    实现GET /api/national/trend?cities=北京,上海,广州
+    多城市价格趋势对比（一次返回各城市及全国平均的序列，年份规则同get_price_trend）
+    :param cities: 城市名列表
+    :param year: 年份（可选）
+    :param period: 汇总粒度 month/quarter/year（默认month，季度/年度为各月均价的平均）
+    """
+    names = list(dict.fromkeys(name.strip() for name in cities if name and name.strip()))
+    if not names:
+        return {
+            "code": 400,
+            "data": {},
+            "message": "cities参数为必填项"
+        }
+    if len(names) > TREND_COMPARE_MAX_CITIES:
+        return {
+            "code": 400,
+            "data": {},
+            "message": f"最多同时对比{TREND_COMPARE_MAX_CITIES}个城市"
+        }
+    if period not in TREND_PERIODS:
+        return {
+            "code": 400,
+            "data": {},
+            "message": f"period必须是{list(TREND_PERIODS)}中的一种"
+        }
+
+    store = load_trend_store()
+    if store is None:
+        return {
+            "code": 500,
+            "data": {},
+            "message": "时间序列加载失败"
+        }
+    return {
+        "code": 200,
+        "data": {
+            "period": period,
+            "national": _trends_from_store(store, '', year, period),
+            "cities": [
+                {"city_name": name, "trends": _trends_from_store(store, name, year, period)}
+                for name in names
+            ]
+        }
+    }
+
+
+def _load_house_summary() -> Optional[Dict[str, List[Dict]]]:
+    """
+    读取房源汇总表（迁移v7，由触发器增量维护），汇总行的字段与快照分组结果一致
+    未启用、汇总表不存在或读取失败时返回None，调用方改用快照或全表查询
+    """
+    if not CONFIG['house_summary']['enabled']:
+        return None
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        summary = load_house_summary(cursor)
+        cursor.close()
+        return summary
+    except Exception as e:
+        print(f"读取房源汇总表失败: {e}")
+        return None
+    finally:
+        connection.close()
+
+
+def _summary_region_groups(summary: Dict[str, List[Dict]]) -> List[Dict]:
+    """汇总表中的区域分组（排除空区域，按区域名排序，同快照）"""
+    return sorted((group for group in summary.get('region', []) if group['key'] != ''),
+                  key=lambda group: group['key'])
+
+
+def _region_price_groups(snapshot) -> List[Dict]:
+    """按区域分组的记录数与平均单价（排除空区域），概览/排名/地图共用同一次分组结果"""
+    def compute():
+        groups = snapshot.group_by('region', values=('price_per_sqm',))
+        return [group for group in groups if group['key'] != '']
+    return snapshot.memo('region_price_groups', compute)
+
+
+def _format_beijing_overview(total_listings: int, avg_price: Optional[float],
+                             avg_total_price: Optional[float], region_groups: List[Dict]) -> Dict:
+    avg_price = sql_round(avg_price, 0)
+    avg_total_price = sql_round(avg_total_price, 0)
+    hot = sorted(region_groups, key=lambda group: -group['count'])[:3]
+    return {
+        "avg_price": int(avg_price) if avg_price else 0,
+        "avg_total_price": int(avg_total_price) if avg_total_price else 0,
+        "total_listings": total_listings,
+        "hot_districts": [group['key'] for group in hot]
+    }
+
+
+def _beijing_overview_from_snapshot(snapshot) -> Dict:
+    """基于内存快照计算北京概览"""
+    price = snapshot.stats('price_per_sqm')
+    total_price = snapshot.stats('total_price')
+    return _format_beijing_overview(price['rows'], price['avg'], total_price['avg'], _region_price_groups(snapshot))
+
+
+def _beijing_overview_from_summary(summary: Dict[str, List[Dict]]) -> Dict:
+    """基于汇总表计算北京概览（'all'维度为全部房源）"""
+    overall = summary.get('all') or [{'count': 0, 'avg_price_per_sqm': None, 'avg_total_price': None}]
+    return _format_beijing_overview(overall[0]['count'], overall[0]['avg_price_per_sqm'],
+                                    overall[0]['avg_total_price'], _summary_region_groups(summary))
+
+
+def _district_price_list(region_groups: List[Dict]) -> List[Dict]:
+    """区域均价列表（按区域名排序）"""
+    districts = []
+    for group in region_groups:
+        avg_price = sql_round(group['avg_price_per_sqm'], 0)
+        districts.append({
+            "name": group['key'],
+            "avg_price": int(avg_price) if avg_price else 0,
+            "count": group['count']
+        })
+    return districts
+
+
+@service_api(BEIJING_TABLES)
+def get_beijing_overview() -> Dict:
     """
     实现GET /api/beijing/overview
     返回北京房产概览信息
     """
+    summary = _load_house_summary()
+    if summary is not None:
+        return {"code": 200, "data": _beijing_overview_from_summary(summary)}
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return {"code": 200, "data": _beijing_overview_from_snapshot(snapshot)}
+        except Exception as e:
+            print(f"概览快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"})
+        return {"code": 500, "msg": "数据库连接失败"}
 
     try:
         cursor = connection.cursor()
@@ -642,21 +932,40 @@ def get_beijing_overview() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"概览查询失败: {e}")
-        return json.dumps({"code": 500, "msg": f"查询失败: {str(e)}"})
+        return {"code": 500, "msg": f"查询失败: {str(e)}"}
 
 
-def get_district_ranking() -> str:
+@service_api(BEIJING_TABLES)
+def get_district_ranking() -> Dict:
     """
     实现GET /api/beijing/district-ranking
     返回行政区单价排名（全部）
     """
+    def ranking_of(region_groups: List[Dict]) -> List[Dict]:
+        districts = sorted(_district_price_list(region_groups), key=lambda item: -item['avg_price'])
+        return [
+            {"rank": idx, "district": item['name'], "avg_price": item['avg_price'], "count": item['count']}
+            for idx, item in enumerate(districts, 1)
+        ]
+
+    summary = _load_house_summary()
+    if summary is not None:
+        return {"code": 200, "data": {"ranking": ranking_of(_summary_region_groups(summary))}}
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return {"code": 200, "data": {"ranking": ranking_of(_region_price_groups(snapshot))}}
+        except Exception as e:
+            print(f"区域排名快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"})
+        return {"code": 500, "msg": "数据库连接失败"}
 
     try:
         cursor = connection.cursor()
@@ -689,21 +998,33 @@ def get_district_ranking() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"区域排名查询失败: {e}")
-        return json.dumps({"code": 500, "msg": f"查询失败: {str(e)}"})
+        return {"code": 500, "msg": f"查询失败: {str(e)}"}
 
 
-def get_district_prices() -> str:
+@service_api(BEIJING_TABLES)
+def get_district_prices() -> Dict:
     """
     实现GET /api/beijing/district-prices
     返回所有行政区的平均单价及记录数（地图用）
     """
+    summary = _load_house_summary()
+    if summary is not None:
+        return {"code": 200, "data": {"districts": _district_price_list(_summary_region_groups(summary))}}
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return {"code": 200, "data": {"districts": _district_price_list(_region_price_groups(snapshot))}}
+        except Exception as e:
+            print(f"区域房价快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"})
+        return {"code": 500, "msg": "数据库连接失败"}
 
     try:
         cursor = connection.cursor()
@@ -733,21 +1054,89 @@ def get_district_prices() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"区域房价查询失败: {e}")
-        return json.dumps({"code": 500, "msg": f"查询失败: {str(e)}"})
-
-
-def analysis_floor() -> str:
+        return {"code": 500, "msg": f"查询失败: {str(e)}"}
+
+
+# 楼层分类（与SQL中CASE的顺序一致，与派生字段floor_level_category的取值一一对应）
+FLOOR_CATEGORIES = ['低楼层(1-6)', '中楼层(7-15)', '高楼层(16+)', '未知楼层']
+_FLOOR_CATEGORY_LABELS = dict(zip(FLOOR_LEVELS, FLOOR_CATEGORIES))
+
+
+def _has_typed_snapshot(snapshot) -> bool:
+    """快照是否加载了派生字段（迁移v6）"""
+    return snapshot.has_column('rooms') and snapshot.has_column('floor_level_category')
+
+
+def _floor_analysis_from_snapshot(snapshot) -> List[Dict]:
+    """基于内存快照计算楼层分析"""
+    if _has_typed_snapshot(snapshot):
+        has_floor = snapshot.not_null('floor_level_category')
+        key = snapshot.derive('floor_level_category', _FLOOR_CATEGORY_LABELS.get)
+    else:
+        floor = snapshot.numeric['floor']
+        has_floor = snapshot.not_null('floor')
+        codes = np.select(
+            [(floor >= 1) & (floor <= 6), (floor >= 7) & (floor <= 15), floor >= 16],
+            [0, 1, 2],
+            default=3
+        ).astype(np.int32)
+        key = (codes, FLOOR_CATEGORIES)
+    total = snapshot.count(has_floor)
+    if total == 0:
+        return []
+    return _format_floor_analysis(snapshot.group_by(key, mask=has_floor, values=('price_per_sqm',)), total)
+
+
+def _floor_analysis_from_summary(summary: Dict[str, List[Dict]]) -> List[Dict]:
+    """基于汇总表计算楼层分析（汇总中的楼层取值为FLOOR_LEVELS）"""
+    groups = [dict(group, key=_FLOOR_CATEGORY_LABELS[group['key']]) for group in summary.get('floor', [])]
+    return _format_floor_analysis(groups, sum(group['count'] for group in groups))
+
+
+def _format_floor_analysis(groups: List[Dict], total: int) -> List[Dict]:
+    groups = sorted(groups, key=lambda item: FLOOR_CATEGORIES.index(item['key']))
+    floor_analysis = []
+    for group in groups:
+        avg_price = sql_round(group['avg_price_per_sqm'], 0)
+        floor_analysis.append({
+            "category": group['key'],
+            "avg_price": int(avg_price) if avg_price else 0,
+            "count": group['count'],
+            "percentage": round((group['count'] / total) * 100, 1)
+        })
+    return floor_analysis
+
+
+@service_api(BEIJING_TABLES)
+def analysis_floor() -> Dict:
     """
     实现GET /api/beijing/analysis/floor
     楼层特征分析（低/中/高楼层分类）
     """
+    summary = _load_house_summary()
+    if summary is not None:
+        return {
+            "code": 200,
+            "data": {"floor_analysis": _floor_analysis_from_summary(summary)}
+        }
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return {
+                "code": 200,
+                "data": {"floor_analysis": _floor_analysis_from_snapshot(snapshot)}
+            }
+        except Exception as e:
+            print(f"楼层分析快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"})
+        return {"code": 500, "msg": "数据库连接失败"}
 
     try:
         cursor = connection.cursor()
@@ -756,10 +1145,42 @@ def analysis_floor() -> str:
         cursor.execute("SELECT COUNT(*) as total FROM beijing_house_info WHERE floor IS NOT NULL")
         total = cursor.fetchone()['total']
         if total == 0:
-            return json.dumps({
+            return {
                 "code": 200,
                 "data": {"floor_analysis": []}
-            })
+            }
+
+        if has_typed_house_columns(cursor):
+            # 派生字段floor_level_category上有(floor_level_category, price_per_sqm)覆盖索引，
+            # 文本楼层（高层(共28层)等）按描述归类
+            cursor.execute("""
+                SELECT floor_level_category as level,
+                       ROUND(AVG(price_per_sqm), 0) as avg_price,
+                       COUNT(*) as count
+                FROM beijing_house_info
+                WHERE floor_level_category IS NOT NULL
+                GROUP BY floor_level_category
+            """)
+            results = [
+                {'category': _FLOOR_CATEGORY_LABELS[row['level']],
+                 'avg_price': row['avg_price'], 'count': row['count']}
+                for row in cursor.fetchall()
+            ]
+            results.sort(key=lambda item: FLOOR_CATEGORIES.index(item['category']))
+            floor_analysis = []
+            for item in results:
+                floor_analysis.append({
+                    "category": item['category'],
+                    "avg_price": int(item['avg_price']) if item['avg_price'] else 0,
+                    "count": item['count'],
+                    "percentage": round((item['count'] / total) * 100, 1)
+                })
+            cursor.close()
+            connection.close()
+            return {
+                "code": 200,
+                "data": {"floor_analysis": floor_analysis}
+            }
 
         # 楼层分类查询
         query = """
@@ -803,44 +1224,132 @@ def analysis_floor() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"楼层分析查询失败: {e}")
-        return json.dumps({"code": 500, "msg": f"查询失败: {str(e)}"})
+        return {"code": 500, "msg": f"查询失败: {str(e)}"}
+
+
+def _unify_layout(layout: Optional[str]) -> Optional[str]:
+    """户型归类，与SQL中的CASE一致；NULL不参与统计"""
+    if layout is None:
+        return None
+    for rooms in ('1室', '2室', '3室'):
+        if layout.startswith(rooms):
+            return rooms
+    if layout.startswith(('4室', '5室', '6室')):
+        return '4室+'
+    return '未知'
+
+
+# 按居室数归类（派生字段rooms），结果与_unify_layout一致
+LAYOUT_CATEGORIES = ['1室', '2室', '3室', '4室+', '未知']
+
+
+def _layout_category_key(snapshot) -> Tuple[np.ndarray, List[str]]:
+    """快照各行的户型归类 (编码数组, 类别列表)，layout为NULL的行编码为-1"""
+    if _has_typed_snapshot(snapshot):
+        rooms = snapshot.numeric['rooms']
+        codes = np.select(
+            [rooms == 1, rooms == 2, rooms == 3, (rooms >= 4) & (rooms <= 6)],
+            [0, 1, 2, 3],
+            default=4
+        ).astype(np.int32)
+        codes[~snapshot.not_null('layout')] = -1
+        return codes, LAYOUT_CATEGORIES
+    return snapshot.derive('layout', _unify_layout)
+
+
+def _layout_category_sql(cursor) -> str:
+    """户型归类的SQL表达式（与_layout_category_key一致）"""
+    if has_typed_house_columns(cursor):
+        # 派生字段rooms上有(rooms, total_price, price_per_sqm)覆盖索引，无需逐行匹配户型文本
+        return """CASE
+                    WHEN rooms IN (1, 2, 3) THEN rooms || '室'
+                    WHEN rooms BETWEEN 4 AND 6 THEN '4室+'
+                    ELSE '未知'
+                    END"""
+    return """CASE
+                    WHEN layout LIKE '1室%' THEN '1室'
+                    WHEN layout LIKE '2室%' THEN '2室'
+                    WHEN layout LIKE '3室%' THEN '3室'
+                    WHEN layout LIKE '4室%' OR layout LIKE '5室%' OR layout LIKE '6室%' THEN '4室+'
+                    ELSE '未知'
+                    END"""
+
 
+def _layout_analysis_from_snapshot(snapshot) -> List[Dict]:
+    """基于内存快照计算户型分析"""
+    return _format_layout_analysis(snapshot.group_by(_layout_category_key(snapshot),
+                                                     values=('price_per_sqm', 'total_price')))
 
-def analysis_layout() -> str:
+
+def _format_layout_analysis(groups: List[Dict]) -> List[Dict]:
+    groups = sorted(groups, key=lambda item: -item['count'])
+
+    layout_analysis = []
+    for group in groups:
+        avg_price = sql_round(group['avg_price_per_sqm'], 0)
+        avg_total = sql_round(group['avg_total_price'], 0)
+        layout_analysis.append({
+            "layout": group['key'],
+            "avg_price": int(avg_price) if avg_price else 0,
+            "avg_total": int(avg_total) if avg_total else 0,
+            "count": group['count']
+        })
+    return layout_analysis
+
+
+@service_api(BEIJING_TABLES)
+def analysis_layout() -> Dict:
     """
     北京房产户型特征分析 - 彻底修复重复户型问题，每种户型仅返回一条记录
     采用子查询先转换户型，再外层分组聚合，避免字段歧义
     """
+    summary = _load_house_summary()
+    if summary is not None:
+        return {
+            "code": 200,
+            "data": {
+                "layout_analysis": _format_layout_analysis(summary.get('layout', []))
+            },
+            "message": "户型特征分析查询成功"
+        }
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return {
+                "code": 200,
+                "data": {
+                    "layout_analysis": _layout_analysis_from_snapshot(snapshot)
+                },
+                "message": "户型特征分析查询成功"
+            }
+        except Exception as e:
+            print(f"户型特征分析快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
 
         # 核心修改：子查询先统一户型分类，外层再按统一户型分组聚合
-        query = """
+        query = f"""
                 SELECT unified_layout               as layout, \
                        ROUND(AVG(price_per_sqm), 0) as avg_price, \
                        ROUND(AVG(total_price), 0)   as avg_total, \
                        COUNT(*) as count
                 FROM (
                     SELECT
-                    price_per_sqm, total_price, CASE
-                    WHEN layout LIKE '1室%' THEN '1室'
-                    WHEN layout LIKE '2室%' THEN '2室'
-                    WHEN layout LIKE '3室%' THEN '3室'
-                    WHEN layout LIKE '4室%' OR layout LIKE '5室%' OR layout LIKE '6室%' THEN '4室+'
-                    ELSE '未知'
-                    END as unified_layout
+                    price_per_sqm, total_price, {_layout_category_sql(cursor)} as unified_layout
                     FROM beijing_house_info
                     WHERE layout IS NOT NULL
                     ) as converted_houses
@@ -871,28 +1380,78 @@ def analysis_layout() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"户型特征分析查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"户型特征分析异常: {str(e)}"
-        }, ensure_ascii=False)
+        }
+
 
+def _is_single_orientation(value: str) -> bool:
+    """朝向分析只保留1-2个汉字的朝向（与SQL的过滤条件一致）"""
+    return value != '' and len(value) <= 2 and value not in ('南北', '东西')
 
-def analysis_orientation() -> str:
+
+def _orientation_analysis_from_snapshot(snapshot) -> List[Dict]:
+    """基于内存快照计算朝向分析（过滤条件与SQL一致）"""
+    mask = snapshot.category_mask('orientation', _is_single_orientation)
+    return _format_orientation_analysis(snapshot.group_by('orientation', mask=mask, values=('price_per_sqm',)))
+
+
+def _format_orientation_analysis(groups: List[Dict]) -> List[Dict]:
+    groups = sorted(groups, key=lambda item: -item['count'])
+
+    orientation_analysis = []
+    for group in groups:
+        avg_price = sql_round(group['avg_price_per_sqm'], 0)
+        orientation_analysis.append({
+            "orientation": group['key'],
+            "avg_price": int(avg_price) if avg_price else 0,
+            "count": group['count']
+        })
+    return orientation_analysis
+
+
+@service_api(BEIJING_TABLES)
+def analysis_orientation() -> Dict:
     """
     北京房产朝向特征分析 - 仅保留1-2个汉字的朝向数据，过滤超长朝向
     """
+    summary = _load_house_summary()
+    if summary is not None:
+        groups = [group for group in summary.get('orientation', []) if _is_single_orientation(group['key'])]
+        return {
+            "code": 200,
+            "data": {
+                "orientation_analysis": _format_orientation_analysis(groups)
+            },
+            "message": "朝向特征分析查询成功（仅保留1-2个汉字的朝向）"
+        }
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return {
+                "code": 200,
+                "data": {
+                    "orientation_analysis": _orientation_analysis_from_snapshot(snapshot)
+                },
+                "message": "朝向特征分析查询成功（仅保留1-2个汉字的朝向）"
+            }
+        except Exception as e:
+            print(f"朝向特征分析快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -934,25 +1493,63 @@ def analysis_orientation() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"朝向特征分析查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"朝向特征分析异常: {str(e)}"
-        }, ensure_ascii=False)
+        }
+
+
+def _elevator_analysis_from_snapshot(snapshot) -> List[Dict]:
+    """基于内存快照计算电梯分析（NULL与"未知"合并，同SQL中的IFNULL）"""
+    return _format_elevator_analysis(snapshot.group_by(
+        snapshot.derive('has_elevator', lambda value: '未知' if value is None else value),
+        values=('price_per_sqm',)
+    ))
 
 
-def analysis_elevator() -> str:
+def _format_elevator_analysis(groups: List[Dict]) -> List[Dict]:
+    groups = [dict(group, avg_price=sql_round(group['avg_price_per_sqm'], 0)) for group in groups]
+    # ORDER BY avg_price DESC，NULL排在最后
+    groups.sort(key=lambda item: (item['avg_price'] is None, -(item['avg_price'] or 0)))
+
+    return [{
+        "has_elevator": group['key'] == "有电梯",
+        "avg_price": int(group['avg_price']) if group['avg_price'] else 0,
+        "count": group['count']
+    } for group in groups]
+
+
+@service_api(BEIJING_TABLES)
+def analysis_elevator() -> Dict:
     """
     实现GET /api/beijing/analysis/elevator
     电梯特征分析
     """
+    summary = _load_house_summary()
+    if summary is not None:
+        return {
+            "code": 200,
+            "data": {"elevator_analysis": _format_elevator_analysis(summary.get('elevator', []))}
+        }
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return {
+                "code": 200,
+                "data": {"elevator_analysis": _elevator_analysis_from_snapshot(snapshot)}
+            }
+        except Exception as e:
+            print(f"电梯分析快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"})
+        return {"code": 500, "msg": "数据库连接失败"}
 
     try:
         cursor = connection.cursor()
@@ -987,31 +1584,172 @@ def analysis_elevator() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"电梯分析查询失败: {e}")
-        return json.dumps({"code": 500, "msg": f"查询失败: {str(e)}"})
+        return {"code": 500, "msg": f"查询失败: {str(e)}"}
+
 
+# 散点图模式：raw为随机原始点，其余为服务端降采样（结果规模与表大小无关）
+SCATTER_MODES = ('raw', 'sample', 'grid', 'hexbin')
+# 散点图点预算上限、分箱数上限
+SCATTER_MAX_POINTS = 5000
+SCATTER_MAX_BINS = 200
 
-def get_scatter_data(district: Optional[str] = None, limit: int = 1000) -> str:
+
+def _scatter_columns(district: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[str]]]:
+    """
+    读取散点图所需的列（面积、单价都为数值的行）
+    :return: (面积, 单价, 总价, 区域编码, 区域名称列表)，区域为空的行归入"未知区域"；数据库不可用时返回None
+    """
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        mask = snapshot.not_null('area') & snapshot.not_null('price_per_sqm')
+        if district:
+            mask &= snapshot.contains('region', district)
+        codes, regions = snapshot.categorical['region']
+        codes = codes[mask]
+        area = snapshot.numeric['area'][mask]
+        price = snapshot.numeric['price_per_sqm'][mask]
+        total = snapshot.numeric['total_price'][mask]
+    else:
+        connection = get_db_connection()
+        if not connection:
+            return None
+        cursor = connection.cursor()
+        query = """
+        SELECT area, price_per_sqm,
+               CASE WHEN typeof(total_price) IN ('integer', 'real') THEN total_price END as total_price,
+               region
+        FROM beijing_house_info
+        WHERE typeof(area) IN ('integer', 'real') AND typeof(price_per_sqm) IN ('integer', 'real')
+        """
+        params = []
+        if district:
+            query += " AND region LIKE ?"
+            params.append(f"%{district}%")
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        connection.close()
+
+        positions: Dict[str, int] = {}
+        regions = []
+        codes = np.empty(len(rows), dtype=np.int32)
+        for i, row in enumerate(rows):
+            region = row['region']
+            if region is None:
+                codes[i] = -1
+                continue
+            if region not in positions:
+                positions[region] = len(regions)
+                regions.append(region)
+            codes[i] = positions[region]
+        area = np.array([row['area'] for row in rows], dtype=np.float64)
+        price = np.array([row['price_per_sqm'] for row in rows], dtype=np.float64)
+        total = np.array([row['total_price'] for row in rows], dtype=np.float64)
+
+    # 区域为空（NULL或空字符串）统一归入"未知区域"，作为最后一个分组
+    regions = list(regions) + ["未知区域"]
+    unknown = len(regions) - 1
+    codes = np.where(codes < 0, unknown, codes).astype(np.int32)
+    if "" in regions[:-1]:
+        codes[codes == regions.index("")] = unknown
+    return area, price, total, codes, regions
+
+
+def _scatter_point(area: float, total_price: float, price_per_sqm: float, district: str) -> Dict:
+    """散点格式（与raw模式一致：面积/总价保留一位小数，单价取整）"""
+    return {
+        "area": round(area, 1) if area else 0.0,
+        "total_price": round(total_price, 1) if total_price and not np.isnan(total_price) else 0.0,
+        "price_per_sqm": int(price_per_sqm) if price_per_sqm else 0,
+        "district": district or "未知区域"
+    }
+
+
+def _scatter_downsampled(district: str, mode: str, limit: int, bins: int) -> Optional[Dict]:
+    """降采样模式的散点图数据"""
+    columns = _scatter_columns(district)
+    if columns is None:
+        return None
+    area, price, total, codes, regions = columns
+    data = {"mode": mode, "total": int(len(area))}
+    if len(area) == 0:
+        data.update({"points": []} if mode == 'sample' else {"cells": []})
+        return data
+
+    if mode == 'sample':
+        budget = max(1, min(limit, SCATTER_MAX_POINTS))
+        idx = stratified_sample(codes, len(regions), [price, area], budget, np.random.default_rng())
+        data["budget"] = budget
+        data["points"] = [
+            _scatter_point(float(area[i]), float(total[i]), float(price[i]), regions[codes[i]])
+            for i in idx.tolist()
+        ]
+        return data
+
+    bins = max(1, min(bins, SCATTER_MAX_BINS))
+    binned = (grid_bins if mode == 'grid' else hex_bins)(area, price, bins, extra=total)
+    data.update({
+        "bins": bins,
+        "area_range": [round(value, 1) for value in binned['x_range']],
+        "price_range": [int(value) for value in binned['y_range']],
+        "area_step": round(binned['x_step'], 2),
+        "price_step": round(binned['y_step'], 1),
+        "cells": [
+            {
+                "area": round(cell['x'], 1),
+                "price_per_sqm": int(round(cell['y'])),
+                "count": cell['count'],
+                "avg_total_price": round(cell['mean'], 1) if cell['mean'] is not None else 0.0
+            }
+            for cell in binned['cells']
+        ]
+    })
+    return data
+
+
+@service_api(BEIJING_TABLES)
+def get_scatter_data(district: Optional[str] = None, limit: int = 1000, mode: str = 'raw',
+                     bins: int = 40) -> Dict:
     """
     实现GET /api/beijing/chart/scatter
     获取面积-价格散点图数据
     :param district: 筛选区域（可选）
-    :param limit: 数据点数量（默认1000）
+    :param limit: 数据点数量/点预算（默认1000，最多5000）
+    :param mode: raw 随机原始点；sample 按区域分层抽样并保留离群点；
+                 grid/hexbin 按(面积, 单价)矩形/六边形分箱，返回各格子中心与计数
+    :param bins: grid/hexbin模式下每个方向的格子数（默认40，最多200）
     """
+    district = district.strip() if district else ''
+    if mode not in SCATTER_MODES:
+        return {"code": 400, "msg": f"不支持的模式: {mode}，可选: {', '.join(SCATTER_MODES)}"}
+
+    if mode != 'raw':
+        try:
+            data = _scatter_downsampled(district, mode, limit, bins)
+            if data is None:
+                return {"code": 500, "msg": "数据库连接失败"}
+            return {"code": 200, "data": data}
+        except Exception as e:
+            print(f"散点图降采样失败: {e}")
+            return {"code": 500, "msg": f"查询失败: {str(e)}"}
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"})
+        return {"code": 500, "msg": "数据库连接失败"}
 
     try:
         cursor = connection.cursor()
 
         # 构建查询条件
         where_clause = ""
-        if district and district.strip():
-            where_clause = f"WHERE region LIKE '%{district.strip()}%'"
+        params = []
+        if district:
+            where_clause = "WHERE region LIKE ?"
+            params.append(f"%{district}%")
 
         query = f"""
         SELECT
@@ -1022,9 +1760,9 @@ def get_scatter_data(district: Optional[str] = None, limit: int = 1000) -> str:
         FROM beijing_house_info
         {where_clause}
         ORDER BY RANDOM()
-        LIMIT {min(limit, 5000)}
+        LIMIT {min(limit, SCATTER_MAX_POINTS)}
         """
-        cursor.execute(query)
+        cursor.execute(query, params)
         results = cursor.fetchall()
 
         # 格式化结果（保留一位小数）
@@ -1044,149 +1782,125 @@ def get_scatter_data(district: Optional[str] = None, limit: int = 1000) -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"散点图数据查询失败: {e}")
-        return json.dumps({"code": 500, "msg": f"查询失败: {str(e)}"})
-
-
-def get_boxplot_data(district: str) -> str:
+        return {"code": 500, "msg": f"查询失败: {str(e)}"}
+
+
+# 箱线图离群点每个区域最多返回的数量（两端各一半）
+BOXPLOT_OUTLIER_LIMIT = 200
+
+
+def _boxplot_entry(name: str, result: Dict, group: int, outliers: bool) -> Dict:
+    """由分组分位数结果构造一个区域的箱线图数据"""
+    count = int(result['counts'][group])
+    minimum, q1, median, q3, maximum = result['quantiles'][group].tolist()
+
+    def format_val(val):
+        return int(sql_round(val, 0)) if val is not None else 0
+
+    entry = {
+        "district": name,
+        "min": format_val(minimum),
+        "q1": format_val(q1),
+        "median": format_val(median),
+        "q3": format_val(q3),
+        "max": format_val(maximum),
+        "count": count
+    }
+    if outliers:
+        # Tukey规则：超出 [Q1-1.5IQR, Q3+1.5IQR] 的为离群点，须线取范围内的最值
+        start = int(result['starts'][group])
+        values = result['sorted'][start:start + count]
+        iqr = q3 - q1
+        low = int(np.searchsorted(values, q1 - 1.5 * iqr, side='left'))
+        high = int(np.searchsorted(values, q3 + 1.5 * iqr, side='right'))
+        half = BOXPLOT_OUTLIER_LIMIT // 2
+        entry["lower_whisker"] = format_val(values[low])
+        entry["upper_whisker"] = format_val(values[high - 1])
+        entry["outlier_count"] = low + (count - high)
+        entry["outliers"] = [format_val(v) for v in values[:low][:half].tolist() + values[high:][-half:].tolist()]
+    return entry
+
+
+def _boxplot_from_snapshot(snapshot, district: str, outliers: bool) -> List[Dict]:
+    """基于内存快照计算箱线图：全部区域的分位数按数据版本缓存，单区域直接取用"""
+    by_region = snapshot.memo('boxplot:region', lambda: snapshot.quantiles('region', 'price_per_sqm'))
+    if not district:
+        groups = sorted(np.flatnonzero(by_region['counts']).tolist(), key=lambda g: by_region['categories'][g])
+        return [_boxplot_entry(by_region['categories'][g], by_region, g, outliers) for g in groups]
+
+    # 与 region LIKE '%district%' 一致：可能匹配多个区域，合并计算
+    codes = snapshot.matching_categories('region', district)
+    if len(codes) == 1:
+        group = int(codes[0])
+        return [_boxplot_entry(district, by_region, group, outliers)] if by_region['counts'][group] else []
+    result = snapshot.quantiles(None, 'price_per_sqm', mask=snapshot.codes_mask('region', codes))
+    return [_boxplot_entry(district, result, 0, outliers)] if result['counts'][0] else []
+
+
+def _boxplot_from_database(cursor, district: str, outliers: bool) -> List[Dict]:
+    """快照不可用时：一次查询取出单价，再按区域分组计算精确分位数"""
+    if district:
+        cursor.execute(
+            "SELECT region, price_per_sqm FROM beijing_house_info "
+            "WHERE price_per_sqm IS NOT NULL AND region LIKE ?",
+            (f"%{district}%",)
+        )
+    else:
+        cursor.execute(
+            "SELECT region, price_per_sqm FROM beijing_house_info "
+            "WHERE price_per_sqm IS NOT NULL AND region IS NOT NULL"
+        )
+    rows = cursor.fetchall()
+
+    positions: Dict[str, int] = {}
+    categories: List[str] = []
+    codes = np.empty(len(rows), dtype=np.int32)
+    values = np.empty(len(rows), dtype=np.float64)
+    for i, (region, price) in enumerate(rows):
+        name = district or region
+        if name not in positions:
+            positions[name] = len(categories)
+            categories.append(name)
+        codes[i] = positions[name]
+        values[i] = price if isinstance(price, (int, float)) else np.nan
+
+    result = grouped_quantiles(codes, values, len(categories))
+    groups = sorted(np.flatnonzero(result['counts']).tolist(), key=lambda g: categories[g])
+    return [_boxplot_entry(categories[g], result, g, outliers) for g in groups]
+
+
+@service_api(BEIJING_TABLES)
+def get_boxplot_data(district: str, outliers: bool = False) -> Dict:
     """
     实现GET /api/beijing/chart/boxplot
-    获取指定区域的单价箱线图数据（5个统计量）- 彻底解决only_full_group_by问题
-    改用子查询手动计算四分位数，避免PERCENTILE函数的语法兼容问题
-    :param district: 筛选区域（可选，如果为空则查询所有区域）
+    获取区域单价箱线图数据：精确的最小值/Q1/中位数/Q3/最大值（线性插值，与numpy.quantile一致）
+    :param district: 筛选区域（可选，如果为空则返回所有区域）
+    :param outliers: 是否按1.5倍IQR返回须线范围和离群点列表
     """
-    if not district or not district.strip():
-        # 查询所有区域的数据
-        # 这里使用一个简单的查询，获取每个区域的统计信息
-        connection = get_db_connection()
-        if not connection:
-            return json.dumps({"code": 500, "msg": "数据库连接失败"}, ensure_ascii=False)
-        
+    district = district.strip() if district else ''
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
         try:
-            cursor = connection.cursor()
-            
-            # 简化查询：直接使用原始列名，不使用别名price
-            query_all_districts = """
-            SELECT 
-                region as district,
-                MIN(price_per_sqm) as min,
-                AVG(price_per_sqm) as median,
-                MAX(price_per_sqm) as max
-            FROM beijing_house_info 
-            WHERE price_per_sqm IS NOT NULL
-            GROUP BY region
-            HAVING COUNT(*) > 0
-            ORDER BY region
-            """
-            
-            cursor.execute(query_all_districts)
-            stats_list = cursor.fetchall()
-            
-            if not stats_list:
-                return json.dumps({
-                    "code": 200,
-                    "msg": "成功",
-                    "data": {"boxplot": []}
-                }, ensure_ascii=False)
-            
-            # 格式化结果
-            boxplot = []
-            for stats in stats_list:
-                def format_val(val):
-                    return int(val) if val is not None else 0
-                
-                # 简化计算：使用平均值作为中位数，计算粗略的四分位数
-                min_val = format_val(stats['min'])
-                max_val = format_val(stats['max'])
-                median_val = format_val(stats['median'])
-                
-                # 估算四分位数
-                q1 = format_val(min_val + (median_val - min_val) * 0.25)
-                q3 = format_val(median_val + (max_val - median_val) * 0.25)
-                
-                boxplot.append({
-                    "district": stats['district'],
-                    "min": min_val,
-                    "q1": q1,
-                    "median": median_val,
-                    "q3": q3,
-                    "max": max_val
-                })
-            
-            response = {
+            return {
                 "code": 200,
                 "msg": "成功",
-                "data": {"boxplot": boxplot}
+                "data": {"boxplot": _boxplot_from_snapshot(snapshot, district, outliers)}
             }
-            
-            cursor.close()
-            connection.close()
-            return json.dumps(response, ensure_ascii=False)
-            
         except Exception as e:
-            error_msg = f"箱线图查询失败: {str(e)}"
-            print(error_msg)
-            return json.dumps({
-                "code": 500,
-                "msg": error_msg
-            }, ensure_ascii=False)
-    
-    # 原有代码（指定区域的查询）
+            print(f"箱线图快照计算失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"}, ensure_ascii=False)
+        return {"code": 500, "msg": "数据库连接失败"}
 
     try:
         cursor = connection.cursor()
-        
-        # 修正原始查询中的列名问题
-        query = f"""
-        SELECT
-            MIN(price) as min,
-            MAX(CASE WHEN rn = q1_pos THEN price END) as q1,
-            MAX(CASE WHEN rn = median_pos THEN price END) as median,
-            MAX(CASE WHEN rn = q3_pos THEN price END) as q3,
-            MAX(price) as max
-        FROM (
-            SELECT 
-                price_per_sqm as price,
-                @row_num := @row_num + 1 as rn,
-                (SELECT COUNT(*) FROM beijing_house_info WHERE region LIKE '%{district.strip()}%' AND price_per_sqm IS NOT NULL) as total_cnt,
-                FLOOR((SELECT COUNT(*) FROM beijing_house_info WHERE region LIKE '%{district.strip()}%' AND price_per_sqm IS NOT NULL) * 0.25) as q1_pos,
-                FLOOR((SELECT COUNT(*) FROM beijing_house_info WHERE region LIKE '%{district.strip()}%' AND price_per_sqm IS NOT NULL) * 0.5) as median_pos,
-                FLOOR((SELECT COUNT(*) FROM beijing_house_info WHERE region LIKE '%{district.strip()}%' AND price_per_sqm IS NOT NULL) * 0.75) as q3_pos
-            FROM beijing_house_info,
-                 (SELECT @row_num := 0) as init
-            WHERE region LIKE '%{district.strip()}%' AND price_per_sqm IS NOT NULL
-            ORDER BY price_per_sqm ASC
-        ) as ranked_prices
-        GROUP BY total_cnt, q1_pos, median_pos, q3_pos
-        """
-        
-        cursor.execute(query)
-        stats = cursor.fetchone()
-
-        if not stats or stats['min'] is None:
-            return json.dumps({
-                "code": 200,
-                "msg": "成功",
-                "data": {"boxplot": []}
-            }, ensure_ascii=False)
-
-        def format_val(val):
-            return int(val) if val is not None else 0
-
-        boxplot = [{
-            "district": district.strip(),
-            "min": format_val(stats['min']),
-            "q1": format_val(stats['q1']),
-            "median": format_val(stats['median']),
-            "q3": format_val(stats['q3']),
-            "max": format_val(stats['max'])
-        }]
+        boxplot = _boxplot_from_database(cursor, district, outliers)
 
         response = {
             "code": 200,
@@ -1196,29 +1910,146 @@ def get_boxplot_data(district: str) -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         error_msg = f"箱线图查询失败: {str(e)}"
         print(error_msg)
-        return json.dumps({
+        return {
             "code": 500,
             "msg": error_msg
-        }, ensure_ascii=False)
+        }
 
-def get_city_clustering() -> str:
+def suggest_locations(keyword: str, limit: int = SUGGEST_DEFAULT_LIMIT) -> ServicePayload:
+    """
+    实现GET /api/beijing/locations/suggest
+    地点联想：在内存索引上按名称（完全/前缀/子串）及拼音（全拼/首字母）匹配区域、商圈、小区
+    索引查询为亚毫秒级，不经过响应缓存（输入过程中的大量前缀不占用缓存条目）
+    :param keyword: 输入内容（必填）
+    :param limit: 返回数量（1-50）
+    """
+    if not keyword or not keyword.strip():
+        return ServicePayload({
+            "code": 400,
+            "data": {},
+            "message": "q参数为必填项"
+        })
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+    try:
+        index = get_location_index()
+        if index is None:
+            return ServicePayload({
+                "code": 500,
+                "data": {},
+                "message": "数据库连接失败"
+            })
+        return ServicePayload({
+            "code": 200,
+            "data": {
+                "query": keyword.strip(),
+                "suggestions": index.search(keyword, limit)
+            }
+        })
+    except Exception as e:
+        print(f"地点联想失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return ServicePayload({
+            "code": 500,
+            "data": {},
+            "message": f"查询失败: {str(e)}"
+        })
+
+
+# 北京页面看板的组件（名称 -> 取结果的函数），顺序即默认返回顺序
+BEIJING_DASHBOARD_WIDGETS = {
+    'overview': lambda options: get_beijing_overview.payload(),
+    'district_ranking': lambda options: get_district_ranking.payload(),
+    'district_prices': lambda options: get_district_prices.payload(),
+    'floor': lambda options: analysis_floor.payload(),
+    'layout': lambda options: analysis_layout.payload(),
+    'orientation': lambda options: analysis_orientation.payload(),
+    'elevator': lambda options: analysis_elevator.payload(),
+    'scatter': lambda options: get_scatter_data.payload(options['district'], options['scatter_limit'],
+                                                        options['scatter_mode']),
+    'boxplot': lambda options: get_boxplot_data.payload(options['district'] or '', outliers=options['outliers']),
+}
+
+
+def get_beijing_dashboard(widgets: Optional[List[str]] = None, district: Optional[str] = None,
+                          scatter_limit: int = 1000, scatter_mode: str = 'raw',
+                          outliers: bool = False) -> ServicePayload:
+    """
+    实现GET /api/beijing/dashboard
+    一次请求返回北京页面的多个组件数据，data中每个组件的值与其独立接口的完整响应相同
+    各组件复用同一个请求连接、同一份内存快照及各自的响应缓存，合并时直接拼接已序列化的响应体
+    :param widgets: 需要的组件名称列表（为空返回全部）
+    :param district: 散点图/箱线图的区域筛选（可选）
+    :param scatter_limit: 散点图数据点数量
+    :param scatter_mode: 散点图模式（见get_scatter_data）
+    :param outliers: 箱线图是否附带离群点
+    """
+    names = [name for name in (widgets or []) if name] or list(BEIJING_DASHBOARD_WIDGETS)
+    unknown = [name for name in names if name not in BEIJING_DASHBOARD_WIDGETS]
+    if unknown:
+        return ServicePayload({
+            "code": 400,
+            "msg": f"未知的组件: {', '.join(unknown)}，可选: {', '.join(BEIJING_DASHBOARD_WIDGETS)}"
+        })
+
+    options = {'district': district, 'scatter_limit': scatter_limit, 'scatter_mode': scatter_mode,
+               'outliers': outliers}
+    parts = {}
+    for name in dict.fromkeys(names):
+        parts[name] = BEIJING_DASHBOARD_WIDGETS[name](options)
+    return ServicePayload.combine(parts)
+
+
+def _city_tier(price: float) -> str:
+    """按均价划分城市等级（与SQL查询中的CASE一致）"""
+    if price >= 30000:
+        return '一线城市'
+    if price >= 15000:
+        return '二线城市'
+    if price >= 8000:
+        return '三线城市'
+    return '四线城市'
+
+
+def _format_city_cluster(item, tier: str) -> Dict:
+    return {
+        "city_name": item['city_name'],
+        "city_avg_price": int(item['city_avg_price']) if item['city_avg_price'] else 0,
+        "city_avg_total_price": int(item['city_avg_total_price']) if item['city_avg_total_price'] else 0,
+        "listing_count": int(item['listing_count']) if item['listing_count'] else 0,
+        "price_rent_ratio": int(item['price_rent_ratio']) if item['price_rent_ratio'] else 0,
+        "city_tier": tier
+    }
+
+
+@service_api(NATIONAL_TABLES)
+def get_city_clustering() -> Dict:
     """
     方案C：城市分级气泡图数据
     按均价和挂牌量将城市分为一二三四线城市
     返回：城市名、均价、总价、挂牌量、租售比、城市等级
     """
+    rankings = _load_national_rankings()
+    if rankings is not None:
+        cities = rankings.top_cities('price', predicate=lambda city: city['listing_count'] is not None)
+        return {
+            "code": 200,
+            "data": {"cities": [_format_city_cluster(city, _city_tier(city['city_avg_price'])) for city in cities]}
+        }
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -1253,16 +2084,7 @@ def get_city_clustering() -> str:
         cursor.execute(query)
         results = cursor.fetchall()
 
-        cities = []
-        for item in results:
-            cities.append({
-                "city_name": item['city_name'],
-                "city_avg_price": int(item['city_avg_price']) if item['city_avg_price'] else 0,
-                "city_avg_total_price": int(item['city_avg_total_price']) if item['city_avg_total_price'] else 0,
-                "listing_count": int(item['listing_count']) if item['listing_count'] else 0,
-                "price_rent_ratio": int(item['price_rent_ratio']) if item['price_rent_ratio'] else 0,
-                "city_tier": item['city_tier']
-            })
+        cities = [_format_city_cluster(item, item['city_tier']) for item in results]
 
         response = {
             "code": 200,
@@ -1271,18 +2093,19 @@ def get_city_clustering() -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"城市分级查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
-def get_district_change_heatmap(city: Optional[str] = None) -> str:
+@service_api(NATIONAL_TABLES)
+def get_district_change_heatmap(city: Optional[str] = None) -> Dict:
     """
     方案C：区县涨跌比热力图数据
     展示各城市区县的涨跌情况
@@ -1290,11 +2113,11 @@ def get_district_change_heatmap(city: Optional[str] = None) -> str:
     """
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -1335,30 +2158,48 @@ def get_district_change_heatmap(city: Optional[str] = None) -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"涨跌比热力图查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
+
+
+def _format_listing_ranking(cities) -> List[Dict]:
+    return [
+        {
+            "rank": idx,
+            "city_name": item['city_name'],
+            "listing_count": int(item['listing_count']) if item['listing_count'] else 0,
+            "city_avg_price": int(item['city_avg_price']) if item['city_avg_price'] else 0
+        }
+        for idx, item in enumerate(cities, 1)
+    ]
 
 
-def get_listing_top_ranking(limit: int = 20) -> str:
+@service_api(NATIONAL_TABLES)
+def get_listing_top_ranking(limit: int = 20) -> Dict:
     """
     方案C：挂牌量TOP排行
     展示房源供应最多的城市
     :param limit: 返回数量（默认20）
     """
+    rankings = _load_national_rankings()
+    if rankings is not None:
+        cities = rankings.top_cities('listings', max(1, min(limit, 50)), positive=True)
+        return {"code": 200, "data": {"ranking": _format_listing_ranking(cities)}}
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
@@ -1379,55 +2220,68 @@ def get_listing_top_ranking(limit: int = 20) -> str:
         cursor.execute(query)
         results = cursor.fetchall()
 
-        ranking = []
-        for idx, item in enumerate(results, 1):
-            ranking.append({
-                "rank": idx,
-                "city_name": item['city_name'],
-                "listing_count": int(item['listing_count']) if item['listing_count'] else 0,
-                "city_avg_price": int(item['city_avg_price']) if item['city_avg_price'] else 0
-            })
-
         response = {
             "code": 200,
-            "data": {"ranking": ranking}
+            "data": {"ranking": _format_listing_ranking(results)}
         }
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"挂牌量排行查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
+
+
+def _format_district_ranking(districts) -> List[Dict]:
+    return [
+        {
+            "rank": idx,
+            "city_name": item['city_name'],
+            "district_name": item['district_name'],
+            "district_avg_price": int(item['district_avg_price']) if item['district_avg_price'] else 0,
+            "district_ratio": round(float(item['district_ratio']), 1) if item['district_ratio'] else 0.0
+        }
+        for idx, item in enumerate(districts, 1)
+    ]
 
 
-def get_district_price_ranking(limit: int = 50, city: Optional[str] = None) -> str:
+@service_api(NATIONAL_TABLES)
+def get_district_price_ranking(limit: int = 50, city: Optional[str] = None) -> Dict:
     """
     方案D：区县价格排行
     全国所有区县的房价排名
     :param limit: 返回数量（默认50）
     :param city: 指定城市（可选）
     """
+    limit = max(1, min(limit, 100))
+    city = city.strip() if city else None
+    rankings = _load_national_rankings()
+    if rankings is not None:
+        districts = rankings.top_districts('price', limit, positive=True, city=city)
+        return {"code": 200, "data": {"ranking": _format_district_ranking(districts)}}
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
-        limit = max(1, min(limit, 100))
 
         where_conditions = ["district_avg_price IS NOT NULL", "district_avg_price > 0"]
-        if city and city.strip():
-            where_conditions.append(f"city_name LIKE '%{city.strip()}%'")
+        params = []
+        if city:
+            where_conditions.append("city_name LIKE ?")
+            params.append(f"%{city}%")
         where_clause = "WHERE " + " AND ".join(where_conditions)
 
         query = f"""
@@ -1442,82 +2296,80 @@ def get_district_price_ranking(limit: int = 50, city: Optional[str] = None) -> s
         LIMIT {limit}
         """
         
-        cursor.execute(query)
+        cursor.execute(query, params)
         results = cursor.fetchall()
 
-        ranking = []
-        for idx, item in enumerate(results, 1):
-            ranking.append({
-                "rank": idx,
-                "city_name": item['city_name'],
-                "district_name": item['district_name'],
-                "district_avg_price": int(item['district_avg_price']) if item['district_avg_price'] else 0,
-                "district_ratio": round(float(item['district_ratio']), 1) if item['district_ratio'] else 0.0
-            })
-
         response = {
             "code": 200,
-            "data": {"ranking": ranking}
+            "data": {"ranking": _format_district_ranking(results)}
         }
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"区县价格排行查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
-def get_city_districts_comparison(city: str) -> str:
+@service_api(NATIONAL_TABLES)
+def get_city_districts_comparison(city: str) -> Dict:
     """
     方案D：同城区县对比
     选定城市后，展示其各区县的价格差异
     :param city: 城市名称（必填）
     """
     if not city or not city.strip():
-        return json.dumps({
+        return {
             "code": 400,
             "data": {},
             "message": "city参数为必填项"
-        }, ensure_ascii=False)
+        }
 
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
 
+        resolver = load_name_resolver()
+        if resolver is not None:
+            condition, params = city_condition(resolver, 'city_name', 'current_price',
+                                               resolver.resolve_cities(city=city.strip()))
+        else:
+            condition, params = "city_name LIKE ?", [f"%{city.strip()}%"]
+
         query = f"""
         SELECT
             district_name,
             district_avg_price,
             district_ratio
         FROM current_price
-        WHERE city_name LIKE '%{city.strip()}%'
+        WHERE {condition}
             AND district_avg_price IS NOT NULL
             AND district_avg_price > 0
         ORDER BY district_avg_price DESC
         """
         
-        cursor.execute(query)
+        cursor.execute(query, params)
         results = cursor.fetchall()
 
         if not results:
-            return json.dumps({
+            return {
                 "code": 404,
                 "data": {},
                 "message": f"未找到城市 {city} 的区县数据"
-            }, ensure_ascii=False)
+            }
 
         districts = []
         for item in results:
@@ -1537,36 +2389,42 @@ def get_city_districts_comparison(city: str) -> str:
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"同城区县对比查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
-def get_district_change_ranking(limit: int = 30, order: str = "desc") -> str:
+@service_api(NATIONAL_TABLES)
+def get_district_change_ranking(limit: int = 30, order: str = "desc") -> Dict:
     """
     方案D：区县涨跌榜
     按district_ratio排序展示涨跌幅最大的区县
     :param limit: 返回数量（默认30）
     :param order: 排序方式 (desc/asc，默认desc)
     """
+    limit = max(1, min(limit, 100))
+    order = order.upper() if order.lower() in ['desc', 'asc'] else 'DESC'
+    rankings = _load_national_rankings()
+    if rankings is not None:
+        districts = rankings.top_districts('change', limit, descending=order == 'DESC')
+        return {"code": 200, "data": {"ranking": _format_district_ranking(districts)}}
+
     connection = get_db_connection()
     if not connection:
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": "数据库连接失败"
-        }, ensure_ascii=False)
+        }
 
     try:
         cursor = connection.cursor()
-        limit = max(1, min(limit, 100))
-        order = order.upper() if order.lower() in ['desc', 'asc'] else 'DESC'
 
         query = f"""
         SELECT
@@ -1583,34 +2441,87 @@ def get_district_change_ranking(limit: int = 30, order: str = "desc") -> str:
         cursor.execute(query)
         results = cursor.fetchall()
 
-        ranking = []
-        for idx, item in enumerate(results, 1):
-            ranking.append({
-                "rank": idx,
-                "city_name": item['city_name'],
-                "district_name": item['district_name'],
-                "district_avg_price": int(item['district_avg_price']) if item['district_avg_price'] else 0,
-                "district_ratio": round(float(item['district_ratio']), 1) if item['district_ratio'] else 0.0
-            })
-
         response = {
             "code": 200,
-            "data": {"ranking": ranking}
+            "data": {"ranking": _format_district_ranking(results)}
         }
 
         cursor.close()
         connection.close()
-        return json.dumps(response, ensure_ascii=False)
+        return response
 
     except Exception as e:
         print(f"区县涨跌榜查询失败: {e}")
-        return json.dumps({
+        return {
             "code": 500,
             "data": {},
             "message": f"查询失败: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 
+# 房源列表返回字段
+HOUSE_LIST_COLUMNS = "house_id, total_price, price_per_sqm, area, layout, orientation, floor, has_elevator, region, tags"
+# 房源列表可选的排序字段（house_id为默认顺序）；按其他字段排序时该字段为空的房源排在最后
+HOUSE_SORT_COLUMNS = ('house_id', 'total_price', 'price_per_sqm', 'area')
+
+
+def _format_house(house) -> Dict:
+    """格式化房源列表中的一条记录"""
+    return {
+        "house_id": house['house_id'],
+        "total_price": round(house['total_price'], 2) if house['total_price'] else 0.00,
+        "price_per_sqm": int(house['price_per_sqm']) if house['price_per_sqm'] else 0,
+        "area": round(house['area'], 2) if house['area'] else 0.00,
+        "layout": house['layout'] or "未知",
+        "orientation": house['orientation'] or "未知",
+        "floor": house['floor'] or 0,
+        "has_elevator": house['has_elevator'] or "未知",
+        "region": house['region'] or "未知",
+        "tags": house['tags'] or ""
+    }
+
+
+def _house_list_filters(district, layout, min_price, max_price, min_area, max_area) -> Tuple:
+    """规范化筛选条件（空字符串、非正数视为不限），同时作为总数缓存的键"""
+    def positive(value):
+        return value if value is not None and value > 0 else None
+
+    return (
+        district.strip() if district and district.strip() else None,
+        layout.strip() if layout and layout.strip() else None,
+        positive(min_price),
+        positive(max_price),
+        positive(min_area),
+        positive(max_area),
+    )
+
+
+def _encode_list_cursor(sort: str, order: str, house) -> str:
+    """根据本页最后一条房源生成下一页游标：(排序方式, 排序值, house_id) 的URL安全编码"""
+    value = house[sort] if sort != 'house_id' else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        value = None
+    raw = json.dumps([sort, order, value, house['house_id']], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_list_cursor(token: str, sort: str, order: str) -> Optional[Tuple]:
+    """解析游标，返回 (排序值, house_id)；格式错误或与当前排序方式不一致时返回None"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor_sort, cursor_order, value, house_id = json.loads(raw.decode('utf-8'))
+    except Exception:
+        return None
+    if cursor_sort != sort or cursor_order != order:
+        return None
+    if isinstance(house_id, bool) or not isinstance(house_id, (str, int)):
+        return None
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        return None
+    return value, house_id
+
+
+@service_api(BEIJING_TABLES)
 def query_houses_list(
         district: Optional[str] = None,
         layout: Optional[str] = None,
@@ -1619,102 +2530,450 @@ def query_houses_list(
         min_area: Optional[int] = None,
         max_area: Optional[int] = None,
         page: int = 1,
-        page_size: int = 20
-) -> str:
+        page_size: int = 20,
+        sort: str = 'house_id',
+        order: str = 'asc',
+        cursor: Optional[str] = None
+) -> Dict:
     """
     实现GET /api/beijing/houses
-    房源列表查询（支持多条件筛选和分页）
+    房源列表查询（支持多条件筛选、排序和分页）
+    :param sort: 排序字段（house_id/total_price/price_per_sqm/area）
+    :param order: asc/desc
+    :param cursor: 上一页返回的next_cursor；提供时按游标翻页（忽略page），
+                   从 (排序值, house_id) 之后继续读取，任意深度的翻页代价与第一页相同
     """
-    connection = get_db_connection()
-    if not connection:
-        return json.dumps({"code": 500, "msg": "数据库连接失败"})
-
-    try:
-        cursor = connection.cursor()
-
-        # 构建查询条件
-        where_conditions = []
-        if district and district.strip():
-            where_conditions.append(f"region LIKE '%{district.strip()}%'")
-        if layout and layout.strip():
-            where_conditions.append(f"layout LIKE '%{layout.strip()}%'")
-        if min_price is not None and min_price > 0:
-            where_conditions.append(f"total_price >= {min_price}")
-        if max_price is not None and max_price > 0:
-            where_conditions.append(f"total_price <= {max_price}")
-        if min_area is not None and min_area > 0:
-            where_conditions.append(f"area >= {min_area}")
-        if max_area is not None and max_area > 0:
-            where_conditions.append(f"area <= {max_area}")
-
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-
-        # 1. 查询总记录数
-        count_query = f"SELECT COUNT(*) as total FROM beijing_house_info {where_clause}"
-        cursor.execute(count_query)
-        total = cursor.fetchone()['total']
-
-        # 2. 计算分页参数
-        page = max(1, page)
-        page_size = max(1, min(page_size, 100))  # 限制每页最大100条
-        offset = (page - 1) * page_size
-
-        # 3. 查询房源数据
-        data_query = f"""
-        SELECT
-            house_id,
-            total_price,
-            price_per_sqm,
-            area,
-            layout,
-            orientation,
-            floor,
-            has_elevator,
-            region,
-            tags
-        FROM beijing_house_info
-        {where_clause}
-        ORDER BY house_id ASC
-        LIMIT {offset}, {page_size}
-        """
-        cursor.execute(data_query)
-        houses = cursor.fetchall()
+    if sort not in HOUSE_SORT_COLUMNS:
+        return {"code": 400, "msg": f"不支持的排序字段: {sort}，可选: {', '.join(HOUSE_SORT_COLUMNS)}"}
+    if order not in ('asc', 'desc'):
+        return {"code": 400, "msg": "order参数只能为asc或desc"}
+    after = None
+    if cursor:
+        after = _decode_list_cursor(cursor, sort, order)
+        if after is None:
+            return {"code": 400, "msg": "cursor参数无效或与当前排序方式不一致"}
+
+    filters = _house_list_filters(district, layout, min_price, max_price, min_area, max_area)
+    descending = order == 'desc'
+    page = max(1, page)
+    page_size = max(1, min(page_size, 100))  # 限制每页最大100条
+
+    houses = None
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            houses, total, has_more = _query_houses_list_from_snapshot(
+                snapshot, filters, sort, descending, page, page_size, after
+            )
+        except Exception as e:
+            print(f"房源列表快照筛选失败，改为查询数据库: {e}")
 
-        # 格式化结果
-        formatted_houses = []
-        for house in houses:
-            formatted_houses.append({
-                "house_id": house['house_id'],
-                "total_price": round(house['total_price'], 2) if house['total_price'] else 0.00,
-                "price_per_sqm": int(house['price_per_sqm']) if house['price_per_sqm'] else 0,
-                "area": round(house['area'], 2) if house['area'] else 0.00,
-                "layout": house['layout'] or "未知",
-                "orientation": house['orientation'] or "未知",
-                "floor": house['floor'] or 0,
-                "has_elevator": house['has_elevator'] or "未知",
-                "region": house['region'] or "未知",
-                "tags": house['tags'] or ""
-            })
+    if houses is None:
+        connection = get_db_connection()
+        if not connection:
+            return {"code": 500, "msg": "数据库连接失败"}
 
-        response = {
-            "code": 200,
-            "data": {
-                "total": total,
-                "page": page,
-                "page_size": page_size,
-                "houses": formatted_houses
-            }
+        try:
+            db_cursor = connection.cursor()
+            conditions, params = _house_list_conditions(db_cursor, filters)
+            total = _count_houses_list(db_cursor, filters, conditions, params)
+            houses, has_more = _query_houses_page_from_database(
+                db_cursor, conditions, params, sort, descending, page, page_size, after
+            )
+            db_cursor.close()
+            connection.close()
+        except Exception as e:
+            print(f"房源列表查询失败: {e}")
+            return {"code": 500, "msg": f"查询失败: {str(e)}"}
+
+    return {
+        "code": 200,
+        "data": {
+            "total": total,
+            "page": page if after is None else None,
+            "page_size": page_size,
+            "sort": sort,
+            "order": order,
+            "houses": [_format_house(house) for house in houses],
+            "next_cursor": _encode_list_cursor(sort, order, houses[-1]) if has_more and houses else None
         }
+    }
+
+
+def _house_list_mask(snapshot, filters: Tuple) -> np.ndarray:
+    """筛选条件对应的快照掩码（与_house_list_conditions语义一致）"""
+    district, layout, min_price, max_price, min_area, max_area = filters
+    mask = snapshot.all()
+    if district:
+        mask &= snapshot.contains('region', district)
+    if layout:
+        rooms = layout_rooms(layout)
+        if rooms is not None and _has_typed_snapshot(snapshot):
+            mask &= snapshot.numeric['rooms'] == rooms
+        else:
+            mask &= snapshot.contains('layout', layout)
+    if min_price is not None:
+        mask &= snapshot.between('total_price', low=min_price)
+    if max_price is not None:
+        mask &= snapshot.between('total_price', high=max_price)
+    if min_area is not None:
+        mask &= snapshot.between('area', low=min_area)
+    if max_area is not None:
+        mask &= snapshot.between('area', high=max_area)
+    return mask
+
+
+def _snapshot_sort_order(snapshot, sort: str, descending: bool) -> np.ndarray:
+    """快照全部行按 (排序字段, house_id) 排列的行下标（排序字段为空的行在最后），随快照缓存"""
+    def compute():
+        if sort == 'house_id':
+            positions = np.arange(snapshot.size)
+            return positions[::-1].copy() if descending else positions
+        values = snapshot.numeric[sort]
+        missing = np.isnan(values)
+        present = np.flatnonzero(~missing)
+        # 稳定排序：同值的行保持house_id顺序
+        present = present[np.argsort(values[present], kind='stable')]
+        absent = np.flatnonzero(missing)
+        if descending:
+            present, absent = present[::-1], absent[::-1]
+        return np.concatenate((present, absent))
+
+    return snapshot.memo(f"house_list_order:{sort}:{'desc' if descending else 'asc'}", compute)
+
+
+def _snapshot_cursor_start(snapshot, ordered: np.ndarray, sort: str, descending: bool, after: Tuple) -> int:
+    """游标之后第一条房源在ordered中的位置（ordered中位于游标之后的行构成后缀）"""
+    value, house_id = after
+    if descending:
+        id_after = ordered < snapshot.position_of(house_id, 'left')
+    else:
+        id_after = ordered >= snapshot.position_of(house_id, 'right')
+
+    if sort == 'house_id':
+        later = id_after
+    else:
+        values = snapshot.numeric[sort][ordered]
+        missing = np.isnan(values)
+        if value is None:
+            later = missing & id_after
+        else:
+            with np.errstate(invalid='ignore'):
+                beyond = values < value if descending else values > value
+            later = missing | beyond | ((values == value) & id_after)
+    return len(ordered) - int(np.count_nonzero(later))
 
-        cursor.close()
-        connection.close()
-        return json.dumps(response, ensure_ascii=False)
-
-    except Exception as e:
-        print(f"房源列表查询失败: {e}")
-        return json.dumps({"code": 500, "msg": f"查询失败: {str(e)}"})
 
+def _query_houses_list_from_snapshot(snapshot, filters: Tuple, sort: str, descending: bool,
+                                     page: int, page_size: int, after: Optional[Tuple]):
+    """
+    基于内存快照筛选房源列表：筛选、排序与计数在内存中完成，只对当前页回表读取
+    :return: (当前页房源, 总数, 是否还有下一页)
+    """
+    mask = _house_list_mask(snapshot, filters)
+    ordered = _snapshot_sort_order(snapshot, sort, descending)
+    matched = ordered[mask[ordered]]
+    if after is not None:
+        start = _snapshot_cursor_start(snapshot, matched, sort, descending, after)
+    else:
+        start = (page - 1) * page_size
+
+    houses = snapshot.fetch_rows(matched[start:start + page_size], HOUSE_LIST_COLUMNS)
+    return houses, len(matched), start + page_size < len(matched)
+
+
+def _house_list_conditions(cursor, filters: Tuple) -> Tuple[List[str], list]:
+    """筛选条件对应的SQL条件列表和参数"""
+    district, layout, min_price, max_price, min_area, max_area = filters
+    conditions = []
+    params = []
+    if district:
+        condition, district_params = location_condition(cursor, district, ('region',))
+        conditions.append(condition)
+        params.extend(district_params)
+    if layout:
+        rooms = layout_rooms(layout)
+        if rooms is not None and has_typed_house_columns(cursor):
+            conditions.append("rooms = ?")
+            params.append(rooms)
+        else:
+            conditions.append("layout LIKE ?")
+            params.append(f"%{layout}%")
+    for column, operator, value in (('total_price', '>=', min_price), ('total_price', '<=', max_price),
+                                    ('area', '>=', min_area), ('area', '<=', max_area)):
+        if value is not None:
+            conditions.append(f"{column} {operator} ?")
+            params.append(value)
+    return conditions, params
+
+
+def _count_houses_list(cursor, filters: Tuple, conditions: List[str], params: list) -> int:
+    """符合条件的房源总数：按 (规范化的筛选条件, 数据版本) 缓存，翻页、换排序时不再重复COUNT(*)"""
+    def compute():
+        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+        cursor.execute(f"SELECT COUNT(*) as total FROM beijing_house_info {where_clause}", params)
+        return cursor.fetchone()['total']
+
+    if not response_cache.is_enabled('count_houses_list'):
+        return compute()
+    return response_cache.get_or_compute(
+        ('count_houses_list',) + filters, get_data_version(*BEIJING_TABLES), compute,
+        cacheable=lambda total: total is not None
+    )
+
+
+def _query_houses_page_from_database(cursor, conditions: List[str], params: list, sort: str,
+                                     descending: bool, page: int, page_size: int, after: Optional[Tuple]):
+    """
+    读取一页房源，多取一条判断是否还有下一页
+    - 游标翻页与第一页：(排序字段, house_id) 行值比较，由排序索引直接定位；
+      先读排序字段非空的部分，不足一页时接着读排序字段为空的部分（按house_id）
+    - 指定page（第二页及以后）：兼容原有的 LIMIT/OFFSET 分页，排序结果与游标翻页一致
+    :return: (当前页房源, 是否还有下一页)
+    """
+    direction = 'DESC' if descending else 'ASC'
+    compare = '<' if descending else '>'
+    size = page_size + 1
+
+    def select(extra: List[str], extra_params: list, order_by: str, limit: int, offset: int = 0) -> List:
+        where_clause = " AND ".join(conditions + extra) or "1=1"
+        cursor.execute(f"""
+            SELECT {HOUSE_LIST_COLUMNS} FROM beijing_house_info
+            WHERE {where_clause}
+            ORDER BY {order_by}
+            LIMIT ? OFFSET ?
+        """, params + extra_params + [limit, offset])
+        return cursor.fetchall()
+
+    if after is None and page > 1:
+        order_by = f"house_id {direction}" if sort == 'house_id' \
+            else f"{sort} IS NULL, {sort} {direction}, house_id {direction}"
+        rows = select([], [], order_by, size, (page - 1) * page_size)
+    elif sort == 'house_id':
+        extra, extra_params = ([f"house_id {compare} ?"], [after[1]]) if after is not None else ([], [])
+        rows = select(extra, extra_params, f"house_id {direction}", size)
+    else:
+        value, house_id = after if after is not None else (None, None)
+        rows = []
+        null_extra, null_params = [], []
+        if after is None or value is not None:
+            extra, extra_params = ([f"({sort}, house_id) {compare} (?, ?)"], [value, house_id]) \
+                if after is not None else ([f"{sort} IS NOT NULL"], [])
+            rows = select(extra, extra_params, f"{sort} {direction}, house_id {direction}", size)
+        else:
+            null_extra, null_params = [f"house_id {compare} ?"], [house_id]
+        if len(rows) < size:
+            rows += select([f"{sort} IS NULL"] + null_extra, null_params, f"house_id {direction}", size - len(rows))
+
+    return rows[:page_size], len(rows) > page_size
+
+
+# ---------- 房源筛选分面 ----------
+
+# 总价分段（万元，与区域统计的价格段一致）与面积分段（㎡），各段为 [min, max)
+HOUSE_FACET_PRICE_BOUNDS = [200, 400, 600, 800, 1000, 1500, 2000]
+HOUSE_FACET_AREA_BOUNDS = [50, 70, 90, 120, 144, 200]
+# 分面维度 -> 该维度自身的筛选条件在filters中的下标（计算某个维度的计数时不应用其自身条件）
+HOUSE_FACET_FILTERS = {
+    'district': (0,),
+    'layout': (1,),
+    'price_range': (2, 3),
+    'area_range': (4, 5),
+    'elevator': (),
+}
+
+
+def _facet_bands(bounds: List[int], unit: str) -> List[Dict]:
+    """分段定义：[{label, min, max}]，首段无下限、末段无上限"""
+    bands = [{"label": f"{bounds[0]}{unit}以下", "min": None, "max": bounds[0]}]
+    bands += [{"label": f"{low}-{high}{unit}", "min": low, "max": high} for low, high in zip(bounds, bounds[1:])]
+    bands.append({"label": f"{bounds[-1]}{unit}以上", "min": bounds[-1], "max": None})
+    return bands
+
+
+HOUSE_FACET_PRICE_BANDS = _facet_bands(HOUSE_FACET_PRICE_BOUNDS, '万')
+HOUSE_FACET_AREA_BANDS = _facet_bands(HOUSE_FACET_AREA_BOUNDS, '㎡')
+
+
+def _band_codes(values: np.ndarray, bounds: List[int]) -> np.ndarray:
+    codes = np.searchsorted(bounds, values, side='right').astype(np.int32)
+    codes[np.isnan(values)] = -1
+    return codes
+
+
+def _band_sql(column: str, bounds: List[int], bands: List[Dict]) -> str:
+    """分段的SQL表达式（与_band_codes一致）"""
+    cases = " ".join(f"WHEN {column} < {bound} THEN '{band['label']}'" for bound, band in zip(bounds, bands))
+    return f"CASE {cases} ELSE '{bands[-1]['label']}' END"
+
+
+def _house_facet_index(snapshot) -> BitmapIndex:
+    """快照上的分面位图索引，随快照缓存"""
+    def compute():
+        index = BitmapIndex(snapshot.size)
+        index.add('district', *snapshot.categorical['region'])
+        index.add('layout', *_layout_category_key(snapshot))
+        index.add('price_range', _band_codes(snapshot.numeric['total_price'], HOUSE_FACET_PRICE_BOUNDS),
+                  [band['label'] for band in HOUSE_FACET_PRICE_BANDS])
+        index.add('area_range', _band_codes(snapshot.numeric['area'], HOUSE_FACET_AREA_BOUNDS),
+                  [band['label'] for band in HOUSE_FACET_AREA_BANDS])
+        index.add('elevator', *snapshot.derive('has_elevator', lambda value: '未知' if value is None else value))
+        if _has_typed_snapshot(snapshot):
+            # 户型筛选只指定居室数时按居室数的位图筛选
+            rooms = snapshot.numeric['rooms']
+            values = np.unique(rooms[~np.isnan(rooms)])
+            codes = np.searchsorted(values, rooms).astype(np.int32)
+            codes[np.isnan(rooms)] = -1
+            index.add('rooms', codes, [int(value) for value in values])
+        return index
+
+    return snapshot.memo('house_facet_index', compute)
+
+
+def _snapshot_range_bitmap(snapshot, index: BitmapIndex, column: str,
+                           low: Optional[float], high: Optional[float]) -> np.ndarray:
+    """low <= column <= high 的位图：在按该字段排序的行下标上二分定位区间"""
+    ordered = _snapshot_sort_order(snapshot, column, False)
+    values = snapshot.memo(f'house_facet_sorted:{column}', lambda: snapshot.numeric[column][ordered])
+    # NaN排在最后，不落入任何区间
+    start = 0 if low is None else int(np.searchsorted(values, low, side='left'))
+    end = int(np.searchsorted(values, np.inf if high is None else high, side='right'))
+    mask = np.zeros(snapshot.size, dtype=bool)
+    mask[ordered[start:end]] = True
+    return index.pack(mask)
+
+
+def _snapshot_facet_filters(snapshot, index: BitmapIndex, filters: Tuple) -> Dict[str, Optional[np.ndarray]]:
+    """各维度筛选条件的位图（None表示不限），语义与_house_list_mask一致"""
+    district, layout, min_price, max_price, min_area, max_area = filters
+    bitmaps: Dict[str, Optional[np.ndarray]] = dict.fromkeys(HOUSE_FACET_FILTERS)
+    if district:
+        bitmaps['district'] = index.union('district', snapshot.matching_categories('region', district))
+    if layout:
+        rooms = layout_rooms(layout)
+        if rooms is not None and _has_typed_snapshot(snapshot):
+            bitmaps['layout'] = index.bitmap('rooms', rooms)
+        else:
+            bitmaps['layout'] = index.pack(snapshot.contains('layout', layout))
+    if min_price is not None or max_price is not None:
+        bitmaps['price_range'] = _snapshot_range_bitmap(snapshot, index, 'total_price', min_price, max_price)
+    if min_area is not None or max_area is not None:
+        bitmaps['area_range'] = _snapshot_range_bitmap(snapshot, index, 'area', min_area, max_area)
+    return bitmaps
 
 
+def _house_facets_from_snapshot(snapshot, filters: Tuple) -> Tuple[int, Dict[str, Dict]]:
+    """
+    基于位图索引计算分面：每个维度的计数应用其他维度的筛选条件（不应用自身条件），
+    选中某个行政区后其他行政区的计数仍然可见
+    :return: (符合全部条件的总数, {维度: {取值: 数量}})
+    """
+    index = _house_facet_index(snapshot)
+    bitmaps = _snapshot_facet_filters(snapshot, index, filters)
+    total = index.count(BitmapIndex.intersect(list(bitmaps.values())))
+    counts = {}
+    for facet in HOUSE_FACET_FILTERS:
+        others = BitmapIndex.intersect([bitmap for name, bitmap in bitmaps.items() if name != facet])
+        counts[facet] = dict(zip(index.labels(facet), index.counts(facet, others).tolist()))
+    return total, counts
+
+
+def _house_facets_from_database(cursor, filters: Tuple) -> Tuple[int, Dict[str, Dict]]:
+    """快照不可用时每个维度一次GROUP BY（条件语义同上）"""
+    expressions = {
+        'district': ("region", "region IS NOT NULL"),
+        'layout': (_layout_category_sql(cursor), "layout IS NOT NULL"),
+        'price_range': (_band_sql('total_price', HOUSE_FACET_PRICE_BOUNDS, HOUSE_FACET_PRICE_BANDS),
+                        "total_price IS NOT NULL"),
+        'area_range': (_band_sql('area', HOUSE_FACET_AREA_BOUNDS, HOUSE_FACET_AREA_BANDS), "area IS NOT NULL"),
+        'elevator': ("IFNULL(has_elevator, '未知')", "1=1"),
+    }
+    conditions, params = _house_list_conditions(cursor, filters)
+    total = _count_houses_list(cursor, filters, conditions, params)
+
+    counts = {}
+    for facet, skipped in HOUSE_FACET_FILTERS.items():
+        facet_filters = tuple(None if i in skipped else value for i, value in enumerate(filters))
+        facet_conditions, facet_params = _house_list_conditions(cursor, facet_filters)
+        expression, not_null = expressions[facet]
+        where_clause = " AND ".join(facet_conditions + [not_null])
+        cursor.execute(f"""
+            SELECT {expression} as value, COUNT(*) as count
+            FROM beijing_house_info
+            WHERE {where_clause}
+            GROUP BY value
+        """, facet_params)
+        counts[facet] = {row['value']: row['count'] for row in cursor.fetchall()}
+    return total, counts
+
+
+def _format_house_facets(counts: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+    """
+    分面结果格式：户型、价格段、面积段按固定顺序列出全部取值（含0）；
+    行政区、电梯只列出有房源的取值，按数量降序
+    """
+    def ranked(values: Dict) -> List[Dict]:
+        items = [(value, count) for value, count in values.items() if value and count > 0]
+        items.sort(key=lambda item: (-item[1], item[0]))
+        return [{"value": value, "count": count} for value, count in items]
+
+    def bands(values: Dict, definitions: List[Dict]) -> List[Dict]:
+        return [
+            {"value": band['label'], "min": band['min'], "max": band['max'], "count": values.get(band['label'], 0)}
+            for band in definitions
+        ]
+
+    return {
+        "district": ranked(counts['district']),
+        "layout": [{"value": label, "count": counts['layout'].get(label, 0)} for label in LAYOUT_CATEGORIES],
+        "price_range": bands(counts['price_range'], HOUSE_FACET_PRICE_BANDS),
+        "area_range": bands(counts['area_range'], HOUSE_FACET_AREA_BANDS),
+        "elevator": ranked(counts['elevator']),
+    }
+
+
+@service_api(BEIJING_TABLES)
+def get_house_facets(
+        district: Optional[str] = None,
+        layout: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        min_area: Optional[int] = None,
+        max_area: Optional[int] = None
+) -> Dict:
+    """
+    实现GET /api/beijing/houses/facets
+    房源筛选面板的分面计数：当前筛选条件（参数同/api/beijing/houses）下
+    各行政区、户型、总价段、面积段、电梯选项的房源数
+    """
+    filters = _house_list_filters(district, layout, min_price, max_price, min_area, max_area)
 
+    result = None
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            result = _house_facets_from_snapshot(snapshot, filters)
+        except Exception as e:
+            print(f"房源分面快照计算失败，改为查询数据库: {e}")
 
+    if result is None:
+        connection = get_db_connection()
+        if not connection:
+            return {"code": 500, "msg": "数据库连接失败"}
+        try:
+            cursor = connection.cursor()
+            result = _house_facets_from_database(cursor, filters)
+            cursor.close()
+            connection.close()
+        except Exception as e:
+            print(f"房源分面查询失败: {e}")
+            return {"code": 500, "msg": f"查询失败: {str(e)}"}
+
+    total, counts = result
+    return {
+        "code": 200,
+        "data": {
+            "total": total,
+            "facets": _format_house_facets(counts)
+        }
+    }
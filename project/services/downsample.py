@@ -0,0 +1,192 @@
+"""
+散点图降采样
+把任意数量的 (面积, 单价) 点压缩为固定规模的结果，返回的数据量只与点预算/分箱数有关：
+- grid_bins：矩形网格分箱，返回非空格子的中心与计数
+- hex_bins：六边形分箱（与matplotlib.hexbin的格点划分一致）
+- stratified_sample：按分组比例分层抽样，并为离群点预留名额
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.house_snapshot import grouped_quantiles
+
+
+def _extent(values: np.ndarray):
+    low, high = float(values.min()), float(values.max())
+    if high <= low:
+        # 所有点取值相同时扩展为单位宽度，避免除零
+        high = low + 1.0
+    return low, high
+
+
+def _summarize_cells(cell_ids: np.ndarray, extra: Optional[np.ndarray]):
+    """按格子编号统计计数及附加列均值，返回 (格子编号, 计数, 均值)"""
+    cells, inverse, counts = np.unique(cell_ids, return_inverse=True, return_counts=True)
+    means = None
+    if extra is not None:
+        valid = ~np.isnan(extra)
+        sums = np.bincount(inverse[valid], weights=extra[valid], minlength=len(cells))
+        non_null = np.bincount(inverse[valid], minlength=len(cells))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(non_null > 0, sums / np.maximum(non_null, 1), np.nan)
+    return cells, counts, means
+
+
+def grid_bins(x: np.ndarray, y: np.ndarray, bins: int, extra: Optional[np.ndarray] = None) -> Dict:
+    """
+    矩形网格分箱
+    :param x, y: 坐标（不含NaN）
+    :param bins: 每个方向的格子数
+    :param extra: 需要按格子求平均的附加列（可含NaN）
+    :return: {'x_range', 'y_range', 'x_step', 'y_step', 'cells': [{'x', 'y', 'count', 'mean'}]}
+    """
+    x_min, x_max = _extent(x)
+    y_min, y_max = _extent(y)
+    x_step = (x_max - x_min) / bins
+    y_step = (y_max - y_min) / bins
+    ix = np.minimum(((x - x_min) / x_step).astype(np.int64), bins - 1)
+    iy = np.minimum(((y - y_min) / y_step).astype(np.int64), bins - 1)
+
+    cells, counts, means = _summarize_cells(ix * bins + iy, extra)
+    result = []
+    for i, (cell, count) in enumerate(zip(cells.tolist(), counts.tolist())):
+        cx, cy = divmod(cell, bins)
+        result.append({
+            'x': x_min + (cx + 0.5) * x_step,
+            'y': y_min + (cy + 0.5) * y_step,
+            'count': count,
+            'mean': None if means is None or np.isnan(means[i]) else float(means[i]),
+        })
+    return {'x_range': [x_min, x_max], 'y_range': [y_min, y_max],
+            'x_step': x_step, 'y_step': y_step, 'cells': result}
+
+
+def hex_bins(x: np.ndarray, y: np.ndarray, gridsize: int, extra: Optional[np.ndarray] = None) -> Dict:
+    """
+    六边形分箱：两套错开半格的矩形格点，每个点归入距离最近的格点（y方向按√3缩放）
+    :param gridsize: x方向的六边形个数，y方向个数按 gridsize/√3 取整
+    :return: 同grid_bins，x_step/y_step为同一套格点的间距（六边形中心相距半个间距错开）
+    """
+    nx = gridsize
+    ny = max(1, int(gridsize / np.sqrt(3)))
+    x_min, x_max = _extent(x)
+    y_min, y_max = _extent(y)
+    sx = (x_max - x_min) / nx
+    sy = (y_max - y_min) / ny
+
+    ix = (x - x_min) / sx
+    iy = (y - y_min) / sy
+    ix1, iy1 = np.round(ix), np.round(iy)
+    ix2, iy2 = np.floor(ix), np.floor(iy)
+    d1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2
+    d2 = (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+    first = d1 < d2
+
+    # 第一套格点 (nx+1)*(ny+1) 个，第二套 nx*ny 个，统一编号
+    lattice1 = ix1.astype(np.int64) * (ny + 1) + iy1.astype(np.int64)
+    lattice2 = (nx + 1) * (ny + 1) + np.minimum(ix2, nx - 1).astype(np.int64) * ny \
+        + np.minimum(iy2, ny - 1).astype(np.int64)
+    cells, counts, means = _summarize_cells(np.where(first, lattice1, lattice2), extra)
+
+    offset = (nx + 1) * (ny + 1)
+    result = []
+    for i, (cell, count) in enumerate(zip(cells.tolist(), counts.tolist())):
+        if cell < offset:
+            cx, cy = divmod(cell, ny + 1)
+            center = (x_min + cx * sx, y_min + cy * sy)
+        else:
+            cx, cy = divmod(cell - offset, ny)
+            center = (x_min + (cx + 0.5) * sx, y_min + (cy + 0.5) * sy)
+        result.append({
+            'x': center[0],
+            'y': center[1],
+            'count': count,
+            'mean': None if means is None or np.isnan(means[i]) else float(means[i]),
+        })
+    return {'x_range': [x_min, x_max], 'y_range': [y_min, y_max],
+            'x_step': sx, 'y_step': sy, 'cells': result}
+
+
+def _allocate(sizes: np.ndarray, budget: int) -> np.ndarray:
+    """按比例分配名额（最大余数法），每个非空分组至少一个（预算足够时），不超过分组大小"""
+    sizes = sizes.astype(np.int64)
+    total = int(sizes.sum())
+    if total <= budget:
+        return sizes.copy()
+
+    non_empty = sizes > 0
+    quota = np.zeros(len(sizes), dtype=np.int64)
+    if budget >= int(non_empty.sum()):
+        quota[non_empty] = 1
+    remaining = budget - int(quota.sum())
+    capacity = sizes - quota
+
+    shares = capacity * (remaining / max(int(capacity.sum()), 1))
+    extra = np.minimum(np.floor(shares).astype(np.int64), capacity)
+    quota += extra
+    left = budget - int(quota.sum())
+    if left > 0:
+        order = np.argsort(-(shares - np.floor(shares)), kind='stable')
+        for g in order.tolist():
+            if left == 0:
+                break
+            if quota[g] < sizes[g]:
+                quota[g] += 1
+                left -= 1
+    return quota
+
+
+def _outlier_scores(codes: np.ndarray, groups: int, columns: List[np.ndarray]) -> np.ndarray:
+    """各点在本分组内按1.5倍IQR规则超出须线的程度（以IQR为单位，0表示非离群点）"""
+    scores = np.zeros(len(codes))
+    for values in columns:
+        result = grouped_quantiles(codes, values, groups, (0.25, 0.75))
+        q1, q3 = result['quantiles'][:, 0], result['quantiles'][:, 1]
+        iqr = np.maximum(q3 - q1, 1e-9)
+        low = q1 - 1.5 * iqr
+        high = q3 + 1.5 * iqr
+        point_low, point_high, point_iqr = low[codes], high[codes], iqr[codes]
+        with np.errstate(invalid='ignore'):
+            excess = np.maximum(point_low - values, values - point_high) / point_iqr
+        scores = np.maximum(scores, np.nan_to_num(excess, nan=0.0))
+    return scores
+
+
+def stratified_sample(codes: np.ndarray, groups: int, columns: List[np.ndarray], budget: int,
+                      rng: np.random.Generator, outlier_share: float = 0.1) -> np.ndarray:
+    """
+    分层抽样
+    :param codes: 每个点的分组编码（0..groups-1）
+    :param columns: 判断离群点的数值列（不含NaN）
+    :param budget: 点预算
+    :param outlier_share: 预留给离群点的名额比例，按偏离程度从大到小选取
+    :return: 选中点的下标（升序）
+    """
+    n = len(codes)
+    if n <= budget:
+        return np.arange(n)
+
+    scores = _outlier_scores(codes, groups, columns)
+    outliers = np.flatnonzero(scores > 0)
+    reserved = min(len(outliers), int(budget * outlier_share))
+    chosen = []
+    if reserved:
+        # 离群点名额同样按分组比例分配，组内取偏离最大的
+        quota = _allocate(np.bincount(codes[outliers], minlength=groups), reserved)
+        order = outliers[np.lexsort((-scores[outliers], codes[outliers]))]
+        starts = np.searchsorted(codes[order], np.arange(groups))
+        for g in np.flatnonzero(quota).tolist():
+            chosen.append(order[starts[g]:starts[g] + quota[g]])
+
+    taken = np.zeros(n, dtype=bool)
+    if chosen:
+        taken[np.concatenate(chosen)] = True
+    pool = np.flatnonzero(~taken)
+    quota = _allocate(np.bincount(codes[pool], minlength=groups), budget - int(taken.sum()))
+    order = pool[np.argsort(codes[pool], kind='stable')]
+    starts = np.searchsorted(codes[order], np.arange(groups + 1))
+    for g in np.flatnonzero(quota).tolist():
+        members = order[starts[g]:starts[g + 1]]
+        chosen.append(rng.choice(members, size=int(quota[g]), replace=False))
+    return np.sort(np.concatenate(chosen)) if chosen else np.arange(0)
@@ -0,0 +1,95 @@
+"""
+位图索引（房源筛选分面计数）
+房源列表的筛选面板需要同时展示每个行政区、户型、价格段、面积段、电梯选项在当前筛选下的房源数，
+逐个取值 COUNT(*) 的代价随取值数线性增长。这里为快照中每个取值（数值字段为每个分段）保存一个
+按行打包的位图（每行1位，按8字节对齐为uint64），筛选条件同样表示为位图：
+- 多个条件：位图按位与
+- 某个维度全部取值的计数：取值位图矩阵与筛选位图按位与后逐行统计置位数（popcount），一次矩阵运算完成
+百万级房源时单个位图约125KB，计数只扫描位图，不再访问原始数据。
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 每个字节的置位数（NumPy 2.0以下没有np.bitwise_count时使用）
+_POPCOUNT8 = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """按最后一维统计置位数（words为uint64位图或位图矩阵）"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT8[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+class BitmapIndex:
+    """
+    行位图索引（构建后只读，可多线程共享）
+    位图为长度 words 的uint64数组，第i行对应第i位，行顺序与快照一致
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.words = (size + 63) // 64
+        # 维度 -> (取值列表, 位图矩阵[取值数, words])
+        self._facets: Dict[str, Tuple[List, np.ndarray]] = {}
+
+    def pack(self, mask: np.ndarray) -> np.ndarray:
+        """行掩码 -> 位图"""
+        packed = np.zeros(self.words * 8, dtype=np.uint8)
+        bits = np.packbits(mask, bitorder='little')
+        packed[:len(bits)] = bits
+        return packed.view(np.uint64)
+
+    def empty(self) -> np.ndarray:
+        return np.zeros(self.words, dtype=np.uint64)
+
+    def add(self, name: str, codes: np.ndarray, labels: Sequence):
+        """
+        添加一个维度
+        :param codes: 各行的取值编码（labels中的下标），-1表示该行不属于任何取值
+        :param labels: 取值列表
+        """
+        matrix = np.zeros((len(labels), self.words), dtype=np.uint64)
+        for position in range(len(labels)):
+            matrix[position] = self.pack(codes == position)
+        self._facets[name] = (list(labels), matrix)
+
+    def labels(self, name: str) -> List:
+        return self._facets[name][0]
+
+    def bitmap(self, name: str, label) -> np.ndarray:
+        """某个取值的位图，取值不存在时为空位图"""
+        labels, matrix = self._facets[name]
+        try:
+            return matrix[labels.index(label)]
+        except ValueError:
+            return self.empty()
+
+    def union(self, name: str, positions: Sequence[int]) -> np.ndarray:
+        """多个取值（labels中的下标）的位图按位或"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return self.empty()
+        return np.bitwise_or.reduce(self._facets[name][1][positions], axis=0)
+
+    def counts(self, name: str, bitmap: Optional[np.ndarray] = None) -> np.ndarray:
+        """维度各取值在筛选位图（None表示不筛选）下的行数"""
+        matrix = self._facets[name][1]
+        return popcount(matrix if bitmap is None else matrix & bitmap)
+
+    def count(self, bitmap: Optional[np.ndarray]) -> int:
+        return self.size if bitmap is None else int(popcount(bitmap))
+
+    @staticmethod
+    def intersect(bitmaps: Sequence[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+        """多个筛选位图按位与，None表示该条件不限；全部为None时返回None"""
+        result = None
+        for bitmap in bitmaps:
+            if bitmap is not None:
+                result = bitmap if result is None else result & bitmap
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return sum(matrix.nbytes for _, matrix in self._facets.values())
@@ -0,0 +1,550 @@
+"""
+北京房源内存列式快照
+将beijing_house_info加载为NumPy列数组（文本列字典编码，数值列为float64），
+筛选条件以布尔掩码求值、分组聚合以bincount完成，避免每个请求重复扫描SQLite。
+数据版本变化（见utils.database.get_data_version）时自动重新加载。
+"""
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import CONFIG
+from utils.database import get_db_connection, get_data_version
+
+HOUSE_TABLE = 'beijing_house_info'
+
+# 数值列：非数值内容（NULL、无法解析的文本）记为NaN，比较结果与SQL中的NULL一致为False
+# rooms/floor_level_category为迁移v6的派生字段，表中没有时全部为NULL（见HouseSnapshot.has_column）
+NUMERIC_COLUMNS = ('total_price', 'price_per_sqm', 'area', 'floor', 'build_year', 'rooms')
+# 文本列：字典编码，NULL编码为-1
+CATEGORICAL_COLUMNS = ('region', 'business_area', 'community', 'layout', 'orientation',
+                       'has_elevator', 'location', 'floor_level_category')
+
+# SQLite IN列表单次绑定参数数量
+_FETCH_CHUNK = 900
+
+
+def grouped_quantiles(codes: np.ndarray, values: np.ndarray, groups: int,
+                      probs: Sequence[float] = (0.0, 0.25, 0.5, 0.75, 1.0)) -> Dict:
+    """
+    分组精确分位数：一次排序（按分组、数值）后按各组偏移直接取位，
+    插值方式与numpy.quantile默认的linear一致
+    :param codes: 分组编码（<0 的行忽略）
+    :param values: 数值（NaN忽略）
+    :param groups: 分组数量
+    :param probs: 分位点
+    :return: {'counts': 各组样本数, 'quantiles': groups×len(probs)矩阵（空组为NaN),
+              'sorted': 排序后的数值, 'starts': 各组在sorted中的起始偏移}
+    """
+    valid = (codes >= 0) & ~np.isnan(values)
+    codes = codes[valid]
+    values = values[valid]
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+    quantiles = np.full((groups, len(probs)), np.nan)
+    present = np.flatnonzero(counts)
+    if len(present):
+        last = counts[present] - 1
+        base = starts[present]
+        for j, prob in enumerate(probs):
+            position = last * prob
+            low = np.floor(position).astype(np.int64)
+            high = np.minimum(low + 1, last)
+            fraction = position - low
+            low_values = sorted_values[base + low]
+            high_values = sorted_values[base + high]
+            quantiles[present, j] = low_values + (high_values - low_values) * fraction
+    return {'counts': counts, 'quantiles': quantiles, 'sorted': sorted_values, 'starts': starts}
+
+
+def sql_round(value: Optional[float], digits: int = 0) -> Optional[float]:
+    """与SQLite ROUND一致的四舍五入（远离零），Python内置round为银行家舍入"""
+    if value is None:
+        return None
+    factor = 10 ** digits
+    scaled = abs(value) * factor
+    rounded = float(np.floor(scaled + 0.5)) / factor
+    return rounded if value >= 0 else -rounded
+
+
+class HouseSnapshot:
+    """
+    房源列式快照（只读）
+    - 行顺序与 ORDER BY house_id 一致，按掩码取下标即得到house_id有序的结果
+    - 掩码方法返回长度为size的bool数组，可用 & | ~ 自由组合
+    """
+
+    def __init__(self, version: str, rowids: np.ndarray,
+                 numeric: Dict[str, np.ndarray],
+                 categorical: Dict[str, Tuple[np.ndarray, List[str]]],
+                 house_ids: Optional[np.ndarray] = None, columns: Sequence[str] = ()):
+        self.version = version
+        # 加载时表中实际存在的字段
+        self.columns = frozenset(columns)
+        self.rowids = rowids
+        # 各行的house_id（升序，与行下标一一对应），表中没有house_id时为rowid
+        self.house_ids = rowids if house_ids is None else house_ids
+        self.numeric = numeric
+        self.categorical = categorical
+        self.size = len(rowids)
+        self.loaded_at = time.time()
+        # 文本列的子串检索索引（惰性构建）：{column: (拼接后的小写文本, 各类别起始偏移)}
+        self._text_index: Dict[str, Tuple[str, np.ndarray]] = {}
+        self._text_lock = threading.Lock()
+        # 派生结果缓存：快照随数据版本整体替换，缓存自然随之失效
+        self._memo: Dict[str, object] = {}
+        self._memo_lock = threading.Lock()
+
+    def memo(self, key: str, compute: Callable[[], object]):
+        """在当前快照上缓存派生结果（只用于有限的固定键，避免按用户输入无限增长）"""
+        if key in self._memo:
+            return self._memo[key]
+        with self._memo_lock:
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+
+    # ---------- 掩码 ----------
+
+    def all(self) -> np.ndarray:
+        return np.ones(self.size, dtype=bool)
+
+    def category_mask(self, column: str, predicate: Callable[[str], bool]) -> np.ndarray:
+        """按类别值判断：谓词只对去重后的类别执行一次，再映射回所有行"""
+        codes, categories = self.categorical[column]
+        matched = np.fromiter((bool(predicate(value)) for value in categories),
+                              dtype=bool, count=len(categories))
+        # 末尾追加False对应NULL（编码-1）
+        return np.append(matched, False)[codes]
+
+    def _get_text_index(self, column: str) -> Tuple[str, np.ndarray]:
+        """将类别值以换行拼接成一个字符串，子串检索在C层完成，不必逐个类别比较"""
+        index = self._text_index.get(column)
+        if index is None:
+            with self._text_lock:
+                index = self._text_index.get(column)
+                if index is None:
+                    categories = self.categorical[column][1]
+                    lengths = np.fromiter((len(value) + 1 for value in categories),
+                                          dtype=np.int64, count=len(categories))
+                    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(categories) else lengths
+                    text = '\n'.join(value.lower() for value in categories) + '\n'
+                    index = self._text_index[column] = (text, starts)
+        return index
+
+    def matching_categories(self, column: str, text: str, prefix: bool = False) -> np.ndarray:
+        """包含（或以其开头）关键词的类别编码"""
+        needle = text.lower()
+        if '\n' in needle or not needle:
+            test = (lambda value: value.lower().startswith(needle)) if prefix \
+                else (lambda value: needle in value.lower())
+            categories = self.categorical[column][1]
+            return np.asarray([code for code, value in enumerate(categories) if test(value)], dtype=np.int64)
+
+        joined, starts = self._get_text_index(column)
+        pattern = ('(?:^|(?<=\n))' if prefix else '') + re.escape(needle)
+        positions = np.fromiter((match.start() for match in re.finditer(pattern, joined)), dtype=np.int64)
+        if len(positions) == 0:
+            return positions
+        return np.unique(np.searchsorted(starts, positions, side='right') - 1)
+
+    def codes_mask(self, column: str, codes: np.ndarray) -> np.ndarray:
+        """类别编码集合 -> 行掩码"""
+        selected = np.zeros(len(self.categorical[column][1]) + 1, dtype=bool)
+        selected[codes] = True
+        selected[-1] = False
+        return selected[self.categorical[column][0]]
+
+    def contains(self, column: str, text: str) -> np.ndarray:
+        """等价于 column LIKE '%text%'（ASCII不区分大小写，NULL不匹配）"""
+        return self.codes_mask(column, self.matching_categories(column, text))
+
+    def startswith(self, column: str, text: str) -> np.ndarray:
+        """等价于 column LIKE 'text%'"""
+        return self.codes_mask(column, self.matching_categories(column, text, prefix=True))
+
+    def equals(self, column: str, value) -> np.ndarray:
+        if column in self.numeric:
+            return self.numeric[column] == value
+        return self.category_mask(column, lambda item: item == value)
+
+    def isin(self, column: str, values: Iterable[str]) -> np.ndarray:
+        wanted = set(values)
+        return self.category_mask(column, lambda item: item in wanted)
+
+    def not_null(self, column: str) -> np.ndarray:
+        if column in self.numeric:
+            return ~np.isnan(self.numeric[column])
+        return self.categorical[column][0] >= 0
+
+    def between(self, column: str, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """low <= column <= high，任一端为None表示不限；NaN不匹配"""
+        values = self.numeric[column]
+        if low is None and high is None:
+            return ~np.isnan(values)
+        mask = np.ones(self.size, dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+    def less(self, column: str, value: float) -> np.ndarray:
+        return self.numeric[column] < value
+
+    def greater(self, column: str, value: float) -> np.ndarray:
+        return self.numeric[column] > value
+
+    # ---------- 取值 ----------
+
+    def indices(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """掩码对应的行下标（按house_id升序）"""
+        if mask is None:
+            return np.arange(self.size)
+        return np.flatnonzero(mask)
+
+    def has_column(self, column: str) -> bool:
+        return column in self.columns
+
+    def position_of(self, house_id, side: str = 'left') -> int:
+        """house_id在行顺序中的位置（二分查找）：side='left'时之前的行均小于house_id，'right'时均不大于"""
+        return int(np.searchsorted(self.house_ids, house_id, side=side))
+
+    def count(self, mask: Optional[np.ndarray] = None) -> int:
+        return self.size if mask is None else int(np.count_nonzero(mask))
+
+    def labels(self, column: str, idx: Optional[np.ndarray] = None) -> List[Optional[str]]:
+        """解码文本列（NULL为None）"""
+        codes, categories = self.categorical[column]
+        if idx is not None:
+            codes = codes[idx]
+        lookup = categories + [None]
+        return [lookup[code] for code in codes.tolist()]
+
+    def derive(self, column: str, mapper: Callable[[Optional[str]], Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+        """
+        在类别层面派生新的分组（如户型归并为"1室/2室/..."）
+        :param mapper: 原类别值（NULL为None）-> 新类别值（None表示排除）
+        :return: (新编码数组, 新类别列表)，被排除的行编码为-1
+        """
+        codes, categories = self.categorical[column]
+        new_categories: List[str] = []
+        positions: Dict[str, int] = {}
+        mapping = []
+        for value in categories + [None]:
+            target = mapper(value)
+            if target is None:
+                mapping.append(-1)
+                continue
+            if target not in positions:
+                positions[target] = len(new_categories)
+                new_categories.append(target)
+            mapping.append(positions[target])
+        return np.asarray(mapping, dtype=np.int32)[codes], new_categories
+
+    # ---------- 聚合 ----------
+
+    def quantiles(self, key, column: str, mask: Optional[np.ndarray] = None,
+                  probs: Sequence[float] = (0.0, 0.25, 0.5, 0.75, 1.0)) -> Dict:
+        """
+        分组精确分位数（见grouped_quantiles），NULL分组与NaN值不参与计算
+        :param key: 文本列名，或derive()返回的(编码数组, 类别列表)；None表示整体作为一组
+        """
+        if key is None:
+            codes, categories = np.zeros(self.size, dtype=np.int32), ['']
+        elif isinstance(key, str):
+            codes, categories = self.categorical[key]
+        else:
+            codes, categories = key
+        values = self.numeric[column]
+        if mask is not None:
+            codes = codes[mask]
+            values = values[mask]
+        result = grouped_quantiles(codes, values, len(categories), probs)
+        result['categories'] = categories
+        return result
+
+    def stats(self, column: str, mask: Optional[np.ndarray] = None) -> Dict:
+        """单列统计，语义同SQL：COUNT(*)计全部行，AVG/MIN/MAX/SUM忽略NULL"""
+        values = self.numeric[column] if mask is None else self.numeric[column][mask]
+        valid = values[~np.isnan(values)]
+        if len(valid) == 0:
+            return {'rows': len(values), 'count': 0, 'sum': None, 'avg': None, 'min': None, 'max': None}
+        total = float(valid.sum())
+        return {
+            'rows': len(values),
+            'count': len(valid),
+            'sum': total,
+            'avg': total / len(valid),
+            'min': float(valid.min()),
+            'max': float(valid.max()),
+        }
+
+    def group_by(self, key, mask: Optional[np.ndarray] = None,
+                 values: Sequence[str] = (), null_label: Optional[str] = None) -> List[Dict]:
+        """
+        分组聚合
+        :param key: 文本列名，或derive()返回的(编码数组, 类别列表)
+        :param mask: 行筛选掩码
+        :param values: 需要计算平均值的数值列
+        :param null_label: NULL分组的名称（None表示丢弃NULL分组，相当于WHERE key IS NOT NULL）
+        :return: [{'key':..., 'count':..., 'avg_<col>':..., 'sum_<col>':...}, ...]，按key排序
+        """
+        if isinstance(key, str):
+            codes, categories = self.categorical[key]
+        else:
+            codes, categories = key
+        if mask is not None:
+            codes = codes[mask]
+        # 整体偏移1，NULL（-1）落在0号桶
+        shifted = codes + 1
+        buckets = len(categories) + 1
+        counts = np.bincount(shifted, minlength=buckets)
+
+        aggregates = {}
+        for column in values:
+            data = self.numeric[column] if mask is None else self.numeric[column][mask]
+            valid = ~np.isnan(data)
+            sums = np.bincount(shifted[valid], weights=data[valid], minlength=buckets)
+            non_null = np.bincount(shifted[valid], minlength=buckets)
+            aggregates[column] = (sums, non_null)
+
+        groups = []
+        for bucket in np.flatnonzero(counts).tolist():
+            if bucket == 0:
+                if null_label is None:
+                    continue
+                label = null_label
+            else:
+                label = categories[bucket - 1]
+            group = {'key': label, 'count': int(counts[bucket])}
+            for column, (sums, non_null) in aggregates.items():
+                n = int(non_null[bucket])
+                group[f'sum_{column}'] = float(sums[bucket]) if n else None
+                group[f'avg_{column}'] = float(sums[bucket]) / n if n else None
+            groups.append(group)
+        groups.sort(key=lambda item: item['key'])
+        return groups
+
+    # ---------- 抽样 ----------
+
+    def sample(self, mask: Optional[np.ndarray], size: int, seed: Optional[int] = None,
+               offset: int = 0) -> np.ndarray:
+        """
+        从满足掩码的行中均匀随机抽取（不放回），返回行下标（随机顺序）
+        :param seed: 随机种子；指定时同一份数据上结果可复现，配合offset可以分页
+        :param offset: 跳过的条数（在同一种子生成的随机序列上偏移）
+        """
+        matched = self.indices(mask)
+        return matched[sample_positions(len(matched), size, seed, offset)]
+
+    # ---------- 回表 ----------
+
+    def fetch_rows(self, idx: Sequence[int], columns: str = '*') -> List:
+        """
+        按行下标回表读取完整记录（按rowid主键查找），保持idx的顺序
+        :param idx: 行下标
+        :param columns: 查询字段，默认全部字段
+        """
+        idx = np.asarray(list(idx), dtype=np.int64)
+        return fetch_house_rows(self.rowids[idx].tolist(), columns)
+
+
+def sample_positions(total: int, size: int, seed: Optional[int] = None, offset: int = 0) -> np.ndarray:
+    """
+    在 0..total-1 中均匀随机抽取位置（不放回，随机顺序），代价与total线性相关、不需要排序
+    未指定种子时直接抽取；指定种子时取该种子下随机排列的 [offset, offset+size) 段，
+    同一种子的各段互不重复，可用于稳定的随机分页
+    """
+    size = max(0, min(size, total - offset)) if seed is not None else max(0, min(size, total))
+    if size == 0:
+        return np.arange(0)
+    rng = np.random.default_rng(seed)
+    if seed is None:
+        return rng.choice(total, size=size, replace=False)
+    return rng.permutation(total)[offset:offset + size]
+
+
+def fetch_house_rows(rowids: Sequence[int], columns: str = '*') -> List:
+    """
+    按rowid批量读取房源记录（主键查找），保持rowids的顺序，已删除的记录被跳过
+    :param rowids: beijing_house_info的rowid列表
+    :param columns: 查询字段，默认全部字段
+    """
+    rowids = list(rowids)
+    if not rowids:
+        return []
+    connection = get_db_connection()
+    if not connection:
+        return []
+    try:
+        cursor = connection.cursor()
+        by_rowid = {}
+        for start in range(0, len(rowids), _FETCH_CHUNK):
+            chunk = sorted(rowids[start:start + _FETCH_CHUNK])
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(
+                f"SELECT {columns} FROM {HOUSE_TABLE} WHERE rowid IN ({placeholders}) ORDER BY rowid",
+                chunk
+            )
+            rows = cursor.fetchall()
+            if len(rows) != len(chunk):
+                # 读取rowid之后有记录被删除，重新确认仍存在的rowid
+                cursor.execute(
+                    f"SELECT rowid FROM {HOUSE_TABLE} WHERE rowid IN ({placeholders}) ORDER BY rowid",
+                    chunk
+                )
+                chunk = [row[0] for row in cursor.fetchall()]
+            by_rowid.update(zip(chunk, rows))
+        cursor.close()
+        return [by_rowid[rowid] for rowid in rowids if rowid in by_rowid]
+    finally:
+        connection.close()
+
+
+def _table_columns(cursor) -> List[str]:
+    # table_xinfo 同时列出生成列（派生字段）
+    cursor.execute(f"PRAGMA table_xinfo({HOUSE_TABLE})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _encode(values: List) -> Tuple[np.ndarray, List[str]]:
+    """字典编码：返回(编码数组, 类别列表)，NULL编码为-1"""
+    positions: Dict[str, int] = {}
+    categories: List[str] = []
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        if not isinstance(value, str):
+            value = str(value)
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(categories)
+            categories.append(value)
+        codes[i] = code
+    return codes, categories
+
+
+def load_house_snapshot(version: Optional[str] = None) -> Optional[HouseSnapshot]:
+    """从数据库加载房源快照，表不存在时返回None"""
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        existing = _table_columns(cursor)
+        if not existing:
+            cursor.close()
+            return None
+
+        order = 'house_id' if 'house_id' in existing else 'rowid'
+        select = ['rowid', order]
+        for column in NUMERIC_COLUMNS:
+            # 只保留数值类型，其余（NULL/文本）读出为NULL
+            select.append(
+                f"CASE WHEN typeof({column}) IN ('integer', 'real') THEN {column} END"
+                if column in existing else 'NULL'
+            )
+        for column in CATEGORICAL_COLUMNS:
+            select.append(column if column in existing else 'NULL')
+        cursor.execute(f"SELECT {', '.join(select)} FROM {HOUSE_TABLE} ORDER BY {order}")
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+
+    columns = list(zip(*rows)) if rows else [()] * (2 + len(NUMERIC_COLUMNS) + len(CATEGORICAL_COLUMNS))
+    rowids = np.asarray(columns[0], dtype=np.int64)
+    house_ids = np.asarray(columns[1]) if rows else rowids
+    numeric = {
+        column: np.asarray(columns[2 + i], dtype=np.float64)
+        for i, column in enumerate(NUMERIC_COLUMNS)
+    }
+    offset = 2 + len(NUMERIC_COLUMNS)
+    categorical = {
+        column: _encode(list(columns[offset + i]))
+        for i, column in enumerate(CATEGORICAL_COLUMNS)
+    }
+    return HouseSnapshot(version, rowids, numeric, categorical, house_ids, existing)
+
+
+_snapshot: Optional[HouseSnapshot] = None
+_failed_version: Optional[str] = None
+_load_lock = threading.Lock()
+
+
+def get_house_snapshot() -> Optional[HouseSnapshot]:
+    """
+    获取当前房源快照，数据版本变化时重新加载
+    重新加载期间其他线程继续使用旧快照；快照不可用时返回None，调用方应回退到SQL查询
+    """
+    global _snapshot, _failed_version
+    if not CONFIG['snapshot']['enabled']:
+        return None
+
+    version = get_data_version(HOUSE_TABLE)
+    if version is None:
+        return None
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    if version == _failed_version:
+        return snapshot
+
+    # 已有旧快照时不阻塞等待，其他线程正在加载则先返回旧快照
+    if not _load_lock.acquire(blocking=snapshot is None):
+        return snapshot
+    try:
+        if _snapshot is not None and _snapshot.version == version:
+            return _snapshot
+        start = time.perf_counter()
+        try:
+            loaded = load_house_snapshot(version)
+        except Exception as e:
+            print(f"[ERROR] 房源快照加载失败: {e}")
+            loaded = None
+        if loaded is None:
+            _failed_version = version
+            return _snapshot
+        _snapshot = loaded
+        print(f"[INFO] 房源快照已加载: {loaded.size} 条，用时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return loaded
+    finally:
+        _load_lock.release()
+
+
+def init_house_snapshot():
+    """服务启动时预加载房源快照"""
+    if not CONFIG['snapshot']['enabled']:
+        print("[INFO] 房源内存快照已关闭")
+        return
+    if get_house_snapshot() is None:
+        print("[WARNING] 房源快照不可用，相关查询将直接访问数据库")
+
+
+def get_snapshot_stats() -> Dict:
+    """快照状态（供系统监控接口使用）"""
+    snapshot = _snapshot
+    if snapshot is None:
+        return {'enabled': CONFIG['snapshot']['enabled'], 'loaded': False}
+    arrays = [snapshot.rowids, *snapshot.numeric.values()] + [codes for codes, _ in snapshot.categorical.values()]
+    if snapshot.house_ids is not snapshot.rowids:
+        arrays.append(snapshot.house_ids)
+    memory = sum(array.nbytes for array in arrays)
+    return {
+        'enabled': CONFIG['snapshot']['enabled'],
+        'loaded': True,
+        'version': snapshot.version,
+        'rows': snapshot.size,
+        'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.loaded_at)),
+        'memory_bytes': int(memory),
+        'categories': {column: len(categories) for column, (_, categories) in snapshot.categorical.items()},
+    }
@@ -0,0 +1,92 @@
+"""
+房源位置检索
+区域关键词（如"朝阳"、"望京"、"融泽嘉园"）在区域、商圈、小区、位置字段中做子串匹配，
+原实现为多个字段的 LIKE '%x%'，每次都要全表扫描。迁移v4建立了FTS5 trigram全文索引
+house_location_fts（rowid与beijing_house_info一致，由触发器同步），这里把关键词转换为
+全文索引上的 MATCH 条件：
+- 3个字及以上：直接作为短语匹配（trigram按子串匹配）
+- 1~2个字：trigram无法直接匹配，先在词表 house_location_vocab 中找出包含该关键词的词条
+  （索引值前后加了"|"，"朝阳"会产生"|朝阳"、"朝阳|"等词条），再以这些词条做OR匹配
+索引不存在（未执行迁移、SQLite不支持FTS5）或关键词含有LIKE通配符时退回原来的LIKE条件，结果一致
+"""
+from typing import List, Sequence, Tuple
+
+from utils.database import get_db_connection
+from utils.migrations import LOCATION_COLUMNS, LOCATION_FTS_TABLE, LOCATION_VOCAB_TABLE
+
+HOUSE_TABLE = 'beijing_house_info'
+# 短关键词展开的词条数上限，超过时（关键词过于宽泛）直接使用LIKE
+MAX_VOCAB_TERMS = 200
+
+
+def _like_condition(keyword: str, columns: Sequence[str]) -> Tuple[str, list]:
+    like_param = f"%{keyword}%"
+    return "(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")", [like_param] * len(columns)
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def has_location_index(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LOCATION_VOCAB_TABLE,))
+    return cursor.fetchone() is not None
+
+
+def _match_expression(cursor, keyword: str, columns: Sequence[str]):
+    """关键词对应的MATCH表达式；没有任何词条包含关键词时返回空字符串，无法使用索引时返回None"""
+    column_filter = '{' + ' '.join(columns) + '}'
+    if len(keyword) >= 3:
+        return f"{column_filter} : {_quote(keyword)}"
+
+    # trigram词条按小写存储
+    placeholders = ', '.join('?' * len(columns))
+    cursor.execute(f"""
+        SELECT DISTINCT term FROM {LOCATION_VOCAB_TABLE}
+        WHERE col IN ({placeholders}) AND instr(term, ?) > 0
+        LIMIT ?
+    """, (*columns, keyword.lower(), MAX_VOCAB_TERMS + 1))
+    terms = [row[0] for row in cursor.fetchall()]
+    if len(terms) > MAX_VOCAB_TERMS:
+        return None
+    if not terms:
+        return ''
+    return f"{column_filter} : (" + ' OR '.join(_quote(term) for term in terms) + ")"
+
+
+def location_condition(cursor, keyword: str,
+                       columns: Sequence[str] = LOCATION_COLUMNS) -> Tuple[str, list]:
+    """
+    关键词匹配任一字段的WHERE条件（作用于beijing_house_info）
+    :param cursor: 用于查询索引词表的游标
+    :param keyword: 区域关键词
+    :param columns: 需要匹配的字段（LOCATION_COLUMNS的子集）
+    :return: (条件, 参数)
+    """
+    keyword = str(keyword)
+    if (any(column not in LOCATION_COLUMNS for column in columns)
+            or any(char in keyword for char in '%_|') or not has_location_index(cursor)):
+        return _like_condition(keyword, columns)
+
+    expression = _match_expression(cursor, keyword, columns)
+    if expression is None:
+        return _like_condition(keyword, columns)
+    if not expression:
+        return "0", []
+    return f"rowid IN (SELECT rowid FROM {LOCATION_FTS_TABLE} WHERE {LOCATION_FTS_TABLE} MATCH ?)", [expression]
+
+
+def resolve_location_rowids(keyword: str, columns: Sequence[str] = LOCATION_COLUMNS) -> List[int]:
+    """返回关键词匹配的房源rowid（升序）"""
+    connection = get_db_connection()
+    if not connection:
+        return []
+    try:
+        cursor = connection.cursor()
+        condition, params = location_condition(cursor, keyword, columns)
+        cursor.execute(f"SELECT rowid FROM {HOUSE_TABLE} WHERE {condition} ORDER BY rowid", params)
+        rowids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return rowids
+    finally:
+        connection.close()
@@ -0,0 +1,262 @@
+"""
+地点联想索引
+启动时把全部行政区、商圈、小区及其房源数加载为内存索引，/api/beijing/locations/suggest 直接在索引上查询：
+- 名称：完全匹配 > 前缀匹配（有序列表二分查找）> 子串匹配（按字建立的倒排表）
+- 拼音：行政区（与爬虫config.BEIJING_DISTRICTS一致）和商圈（爬虫生成的areas.json）的全拼及首字母前缀匹配
+同一匹配级别内按 区域 > 商圈 > 小区、房源数降序排列。索引随房源快照（数据版本）重建。
+"""
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from config import CONFIG, project_root
+from services.house_snapshot import HOUSE_TABLE, get_house_snapshot
+from utils.database import get_db_connection, get_data_version
+
+# 行政区拼音（链家URL中的行政区标识，见renhao_spider/config.py）
+DISTRICT_PINYIN = {
+    '朝阳': 'chaoyang',
+    '海淀': 'haidian',
+    '昌平': 'changping',
+    '丰台': 'fengtai',
+    '大兴': 'daxing',
+    '通州': 'tongzhouqu',
+    '房山': 'fangshan',
+    '顺义': 'shunyi',
+    '西城': 'xicheng',
+    '东城': 'dongcheng',
+    '密云': 'miyun',
+    '石景山': 'shijingshan',
+    '怀柔': 'huairou',
+    '门头沟': 'mentougou',
+    '延庆': 'yanqing',
+    '平谷': 'pinggu',
+}
+
+# (字段, 类型名称)，类型顺序即同级匹配的排序优先级
+LOCATION_TYPES = (('region', '区域'), ('business_area', '商圈'), ('community', '小区'))
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+
+# 匹配级别（越小越靠前）
+_EXACT, _PREFIX, _PINYIN_PREFIX, _SUBSTRING = 0, 1, 2, 3
+
+_SYLLABLE = re.compile(
+    r'(?:zh|ch|sh|[bpmfdtnlgkhjqxrzcsyw])?'
+    r'(?:iang|iong|uang|ang|eng|ing|ong|ian|iao|uai|uan|ai|ao|an|ei|en|er|ia|ie|in|iu|ou|ua|ue|ui|un|uo|a|e|i|o|u|v)'
+)
+
+
+def split_pinyin(pinyin: str) -> Optional[List[str]]:
+    """把全拼切分为音节（如 chaoyang -> chao, yang），无法切分时返回None"""
+    @lru_cache(maxsize=None)
+    def split(start: int) -> Optional[Tuple[str, ...]]:
+        if start == len(pinyin):
+            return ()
+        # 优先尝试较长的音节，失败时回退（xian -> xian，xianggang -> xiang, gang）
+        for end in range(min(len(pinyin), start + 6), start, -1):
+            if _SYLLABLE.fullmatch(pinyin, start, end):
+                rest = split(end)
+                if rest is not None:
+                    return (pinyin[start:end],) + rest
+        return None
+
+    syllables = split(0)
+    return list(syllables) if syllables is not None else None
+
+
+def pinyin_keys(name: str, pinyin: str) -> List[str]:
+    """名称可用于检索的拼音：全拼，以及能按名称字数切分时的首字母（朝阳 -> chaoyang, cy）"""
+    pinyin = pinyin.lower()
+    keys = [pinyin]
+    syllables = split_pinyin(pinyin)
+    # 链家标识偶尔带后缀（通州 -> tongzhouqu），只取与名称字数对应的音节
+    if syllables and len(syllables) >= len(name):
+        initials = ''.join(syllable[0] for syllable in syllables[:len(name)])
+        if initials != pinyin:
+            keys.append(initials)
+    return keys
+
+
+def load_pinyin_map() -> Dict[str, str]:
+    """名称 -> 拼音：行政区内置，商圈来自areas.json（{行政区: {商圈: 拼音}}）"""
+    mapping = dict(DISTRICT_PINYIN)
+    path = CONFIG['location_suggest']['pinyin_file']
+    if path and not os.path.isabs(path):
+        path = str(project_root / path)
+    if not path or not os.path.exists(path):
+        print(f"[INFO] 未找到商圈拼音文件，地点联想只支持行政区拼音: {path}")
+        return mapping
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for areas in json.load(f).values():
+                for name, pinyin in areas.items():
+                    if pinyin and name not in mapping:
+                        mapping[name] = pinyin
+    except Exception as e:
+        print(f"[WARNING] 读取商圈拼音文件失败: {e}")
+    return mapping
+
+
+class LocationSuggestIndex:
+    """地点联想索引（构建后只读，可多线程共享）"""
+
+    def __init__(self, locations: List[Tuple[str, str, int]], pinyin_map: Dict[str, str]):
+        """
+        :param locations: [(类型名称, 名称, 房源数)]
+        :param pinyin_map: 名称 -> 拼音
+        """
+        type_rank = {label: rank for rank, (_, label) in enumerate(LOCATION_TYPES)}
+        # 条目编号即同级排序：类型优先级、房源数降序、名称
+        locations = sorted(locations, key=lambda item: (type_rank[item[0]], -item[2], item[1]))
+        self.types = [item[0] for item in locations]
+        self.names = [item[1] for item in locations]
+        self.counts = [item[2] for item in locations]
+        self.pinyin = [pinyin_map.get(name) for name in self.names]
+        self._lowered = [name.lower() for name in self.names]
+
+        self._exact: Dict[str, List[int]] = {}
+        self._chars: Dict[str, List[int]] = {}
+        keys = []
+        for i, name in enumerate(self._lowered):
+            self._exact.setdefault(name, []).append(i)
+            for char in set(name):
+                self._chars.setdefault(char, []).append(i)
+            keys.append((name, i, _PREFIX))
+            if self.pinyin[i]:
+                keys.extend((key, i, _PINYIN_PREFIX) for key in pinyin_keys(name, self.pinyin[i]))
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        self._key_entries = [(i, level) for _, i, level in keys]
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query: str, limit: int = SUGGEST_DEFAULT_LIMIT) -> List[Dict]:
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+
+        best: Dict[int, int] = {}
+
+        def hit(i: int, level: int):
+            if level < best.get(i, _SUBSTRING + 1):
+                best[i] = level
+
+        for i in self._exact.get(query, ()):
+            hit(i, _EXACT)
+
+        # 名称及拼音前缀：有序键上二分定位，连续扫描到前缀不再匹配为止
+        position = bisect_left(self._keys, query)
+        while position < len(self._keys) and self._keys[position].startswith(query):
+            i, level = self._key_entries[position]
+            hit(i, level)
+            position += 1
+
+        # 子串：取出现条目最少的字的倒排表，按编号（即同级排序）扫描，集满limit条即可停止
+        postings = min((self._chars.get(char, ()) for char in set(query)), key=len)
+        found = 0
+        for i in postings:
+            if found >= limit:
+                break
+            if i not in best and query in self._lowered[i]:
+                best[i] = _SUBSTRING
+                found += 1
+
+        ranked = heapq.nsmallest(limit, best.items(), key=lambda item: (item[1], item[0]))
+        return [
+            {
+                'type': self.types[i],
+                'name': self.names[i],
+                'count': self.counts[i],
+                'pinyin': self.pinyin[i],
+            }
+            for i, _ in ranked
+        ]
+
+    def stats(self) -> Dict:
+        sizes = {}
+        for label in self.types:
+            sizes[label] = sizes.get(label, 0) + 1
+        return {
+            'entries': len(self.names),
+            'types': sizes,
+            'pinyin_keys': len(self._keys) - len(self.names),
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.built_at)),
+        }
+
+
+def _locations_from_snapshot(snapshot) -> List[Tuple[str, str, int]]:
+    locations = []
+    for column, label in LOCATION_TYPES:
+        locations.extend((label, group['key'], group['count'])
+                         for group in snapshot.group_by(column) if group['key'])
+    return locations
+
+
+def _locations_from_database() -> Optional[List[Tuple[str, str, int]]]:
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        locations = []
+        for column, label in LOCATION_TYPES:
+            cursor.execute(f"""
+                SELECT {column} as name, COUNT(*) as count FROM {HOUSE_TABLE}
+                WHERE {column} IS NOT NULL AND {column} != ''
+                GROUP BY {column}
+            """)
+            locations.extend((label, row['name'], row['count']) for row in cursor.fetchall())
+        cursor.close()
+        return locations
+    finally:
+        connection.close()
+
+
+def build_location_index(snapshot=None) -> Optional[LocationSuggestIndex]:
+    started = time.perf_counter()
+    locations = _locations_from_snapshot(snapshot) if snapshot is not None else _locations_from_database()
+    if locations is None:
+        return None
+    index = LocationSuggestIndex(locations, load_pinyin_map())
+    print(f"[INFO] 地点联想索引已构建: {len(index)} 个地点，"
+          f"耗时 {round((time.perf_counter() - started) * 1000, 1)}ms")
+    return index
+
+
+_index: Optional[LocationSuggestIndex] = None
+_index_version: Optional[str] = None
+_index_lock = threading.Lock()
+
+
+def get_location_index() -> Optional[LocationSuggestIndex]:
+    """当前数据版本的地点联想索引；有快照时随快照缓存，否则按数据版本缓存"""
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        return snapshot.memo('location_suggest_index', lambda: build_location_index(snapshot))
+
+    global _index, _index_version
+    version = get_data_version(HOUSE_TABLE)
+    if _index is not None and _index_version == version:
+        return _index
+    with _index_lock:
+        if _index is None or _index_version != version:
+            index = build_location_index()
+            if index is None:
+                return _index
+            _index, _index_version = index, version
+        return _index
+
+
+def init_location_suggest():
+    """服务启动时构建地点联想索引"""
+    if get_location_index() is None:
+        print("[WARNING] 地点联想索引不可用")
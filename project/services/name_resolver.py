@@ -0,0 +1,307 @@
+"""
+全国省份/城市/区县名称解析
+趋势、预测、历史价格、城市搜索和全国区域统计原先用 LIKE '%城市%' 查找，既无法使用索引，也会误匹配
+（如"州"同时匹配广州、郑州、苏州……）。这里在启动时从current_price、trend、predict1读取全部名称，
+为每个省份、城市、区县分配整数id，并建立别名表：
+- 原名，以及去掉/补上行政后缀的写法（广州 <-> 广州市，浦东新区 -> 浦东，朝阳区 <-> 朝阳）
+- 拼音全拼及首字母（安装pypinyin时，如 guangzhou、gz）
+名称先按别名精确解析；没有精确匹配时，只有唯一一个名称包含该关键词才采用，多个候选时视为不明确。
+解析后各表以实际存储的名称做等值查询（city_name = ?），走已有的索引。索引按三张表的数据版本缓存。
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.database import get_db_connection, get_data_version
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 可选依赖：未安装时不支持拼音解析
+    lazy_pinyin = None
+
+RESOLVER_TABLES = ('current_price', 'trend', 'predict1')
+
+# 层级 -> 可去掉的行政后缀（长的在前）
+NAME_SUFFIXES = {
+    'province': ('特别行政区', '维吾尔自治区', '壮族自治区', '回族自治区', '自治区', '省', '市'),
+    'city': ('自治州', '地区', '市', '盟'),
+    'district': ('自治县', '新区', '区', '县', '市', '旗'),
+}
+# 层级 -> 名称没有后缀时补上的常用后缀
+DEFAULT_SUFFIX = {'province': '省', 'city': '市', 'district': '区'}
+
+# 各表中城市名称所在的字段
+CITY_NAME_COLUMNS = {'current_price': 'city_name', 'trend': 'city_name', 'predict1': 'city'}
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return ''.join((name or '').split()).lower()
+
+
+def strip_suffix(name: str, level: str) -> str:
+    """去掉行政后缀（去掉后不足2个字时保留原名，如"东区"）"""
+    for suffix in NAME_SUFFIXES[level]:
+        if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+            return name[:-len(suffix)]
+    return name
+
+
+def name_aliases(name: str, level: str) -> List[str]:
+    """名称的全部别名（已规范化）"""
+    name = normalize_name(name)
+    base = strip_suffix(name, level)
+    aliases = [name, base]
+    if base == name:
+        aliases.append(name + DEFAULT_SUFFIX[level])
+    if lazy_pinyin is not None:
+        syllables = lazy_pinyin(base)
+        if all(syllable.isascii() for syllable in syllables):
+            aliases.append(''.join(syllables))
+            aliases.append(''.join(syllable[0] for syllable in syllables if syllable))
+    return list(dict.fromkeys(alias for alias in aliases if alias))
+
+
+class NameResolver:
+    """
+    名称解析索引（构建后只读，可多线程共享）
+    每个地点为一个字典：id、level、name（current_price中的名称）、province_id、city_id、pinyin，
+    城市另有stored（表 -> 该表中存储的名称列表）和rows（current_price中该城市的各条城市记录）。
+    "广州"与"广州市"归并为同一城市用于解析，但current_price中二者是两条价格不同的记录，
+    城市搜索按rows逐条返回，与原SQL的 SELECT DISTINCT city_name, province_name, city_avg_price 一致
+    """
+
+    def __init__(self, version: Optional[str]):
+        self.version = version
+        self.places: List[Dict] = []
+        self._aliases: Dict[tuple, List[int]] = {}
+        self._keys: Dict[tuple, int] = {}
+        self._children: Dict[int, List[int]] = {}
+        self.built_at = time.time()
+
+    def _place(self, level: str, name: str, parent: Optional[Dict] = None) -> Dict:
+        """取得或创建地点；城市按去后缀后的名称归并（trend中的"广州市"与current_price中的"广州"为同一城市）"""
+        key = (level, parent['id'] if parent and level == 'district' else None,
+               strip_suffix(normalize_name(name), level))
+        if key in self._keys:
+            return self.places[self._keys[key]]
+        aliases = name_aliases(name, level)
+        place = {'id': len(self.places), 'level': level, 'name': name,
+                 'province_id': None, 'city_id': None,
+                 'pinyin': [alias for alias in aliases if alias.isascii()]}
+        if level == 'city':
+            place.update(stored={}, rows=[])
+        if parent is not None:
+            place['province_id'] = parent['id'] if parent['level'] == 'province' else parent['province_id']
+            if parent['level'] == 'city':
+                place['city_id'] = parent['id']
+            self._children.setdefault(parent['id'], []).append(place['id'])
+        self.places.append(place)
+        self._keys[key] = place['id']
+        for alias in aliases:
+            self._aliases.setdefault((level, alias), []).append(place['id'])
+        return place
+
+    def add_current_price(self, rows: Iterable[tuple]):
+        """rows: (省份, 城市, 区县, 城市均价)"""
+        for province_name, city_name, district_name, avg_price in rows:
+            if not city_name:
+                continue
+            province = self._place('province', province_name) if province_name else None
+            city = self._place('city', city_name, province)
+            self.add_stored_city(city, 'current_price', city_name)
+            row = (city_name, province_name, avg_price)
+            if row not in city['rows']:
+                city['rows'].append(row)
+            if district_name:
+                self._place('district', district_name, city)
+
+    def add_stored_city(self, city: Dict, table: str, stored_name: str):
+        names = city['stored'].setdefault(table, [])
+        if stored_name not in names:
+            names.append(stored_name)
+
+    def add_table_cities(self, table: str, names: Iterable[str]):
+        """trend/predict1中的城市名，与current_price中的城市归并；只出现在这些表中的城市单独建立"""
+        for name in names:
+            if name:
+                self.add_stored_city(self._place('city', name), table, name)
+
+    def get(self, place_id: Optional[int]) -> Optional[Dict]:
+        return self.places[place_id] if place_id is not None else None
+
+    def children(self, place: Dict) -> List[Dict]:
+        return [self.places[i] for i in self._children.get(place['id'], [])]
+
+    def lookup(self, name: Optional[str], level: str, parent: Optional[Dict] = None) -> List[Dict]:
+        """按别名精确查找，parent为省份或城市时只保留其下级"""
+        places = [self.places[i] for i in self._aliases.get((level, normalize_name(name)), [])]
+        return [place for place in places if parent is None or self._within(place, parent)]
+
+    def candidates(self, name: Optional[str], level: str, parent: Optional[Dict] = None) -> List[Dict]:
+        """精确匹配的地点；没有精确匹配时返回名称包含该关键词的全部地点"""
+        keyword = normalize_name(name)
+        if not keyword:
+            return []
+        exact = self.lookup(keyword, level, parent)
+        if exact:
+            return exact
+        return [place for place in self.places
+                if place['level'] == level and keyword in normalize_name(place['name'])
+                and (parent is None or self._within(place, parent))]
+
+    def resolve(self, name: Optional[str], level: str, parent: Optional[Dict] = None) -> Optional[Dict]:
+        """解析为唯一的地点；找不到或有多个候选时返回None"""
+        places = self.candidates(name, level, parent)
+        return places[0] if len(places) == 1 else None
+
+    def resolve_all(self, name: Optional[str], level: str, parent: Optional[Dict] = None) -> List[Dict]:
+        """精确匹配的全部地点（如多个城市都有"鼓楼区"），没有精确匹配时同resolve"""
+        exact = self.lookup(name, level, parent)
+        if exact:
+            return exact
+        place = self.resolve(name, level, parent)
+        return [place] if place else []
+
+    def resolve_city(self, city: Optional[str], province: Optional[str] = None) -> Optional[Dict]:
+        """解析城市；省份只作为限定条件，省份本身无法解析时忽略（兼容把城市名当省份传入的调用）"""
+        parent = self.resolve(province, 'province') if province else None
+        return self.resolve(city, 'city', parent) or (self.resolve(city, 'city') if parent else None)
+
+    def resolve_cities(self, province: Optional[str] = None, city: Optional[str] = None,
+                       district: Optional[str] = None) -> List[Dict]:
+        """
+        省份/城市/区县条件对应的城市（趋势等城市级数据的查询范围）
+        - 有城市：解析该城市（省份作为限定条件）
+        - 只有区县：区县所在的城市
+        - 只有省份：省份下的全部城市；省份无法解析但同名城市存在时为该城市
+        """
+        if city:
+            place = self.resolve_city(city, province)
+            return [place] if place else []
+        parent = self.resolve(province, 'province') if province else None
+        if district:
+            place = self.resolve(district, 'district', parent)
+            return [self.places[place['city_id']]] if place else []
+        if parent is not None:
+            return [child for child in self.children(parent) if child['level'] == 'city']
+        place = self.resolve(province, 'city') if province else None
+        return [place] if place else []
+
+    def _within(self, place: Dict, parent: Dict) -> bool:
+        if parent['level'] == 'province':
+            return place['province_id'] == parent['id']
+        return place['city_id'] == parent['id']
+
+    def stored_names(self, cities: Iterable[Dict], table: str) -> List[str]:
+        """城市在指定表中存储的名称（用于 IN (...) 等值查询）"""
+        names = []
+        for city in cities:
+            names.extend(city['stored'].get(table, []))
+        return list(dict.fromkeys(names))
+
+    def search_cities(self, keyword: str, limit: int = 20) -> List[Tuple[str, Optional[str], Optional[float]]]:
+        """
+        城市名或省份名包含关键词（或城市/省份拼音以关键词开头）的current_price城市记录
+        (城市名, 省份名, 城市均价)，按均价降序（均价为空的在最后）
+        """
+        keyword = normalize_name(keyword)
+        if not keyword:
+            return []
+
+        def pinyin_matches(place: Optional[Dict]) -> bool:
+            return (place is not None and keyword.isascii()
+                    and any(alias.startswith(keyword) for alias in place['pinyin']))
+
+        rows = []
+        for city in self.places:
+            if city['level'] != 'city':
+                continue
+            pinyin = pinyin_matches(city) or pinyin_matches(self.get(city['province_id']))
+            rows.extend(row for row in city['rows']
+                        if pinyin or keyword in normalize_name(row[0]) or keyword in normalize_name(row[1]))
+        rows.sort(key=lambda row: (row[2] is None, -(row[2] or 0), row[0]))
+        return rows[:limit]
+
+    def __len__(self):
+        return len(self.places)
+
+
+def _fetch(cursor, query: str) -> List[tuple]:
+    try:
+        cursor.execute(query)
+        return [tuple(row) for row in cursor.fetchall()]
+    except Exception as e:
+        # trend/predict1不存在时只解析current_price中的名称
+        print(f"[WARNING] 名称解析读取失败: {e}")
+        return []
+
+
+def build_name_resolver(version: Optional[str] = None) -> Optional[NameResolver]:
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        started = time.perf_counter()
+        cursor = connection.cursor()
+        resolver = NameResolver(version)
+        resolver.add_current_price(_fetch(cursor, """
+            SELECT province_name, city_name, district_name, MAX(city_avg_price)
+            FROM current_price
+            GROUP BY province_name, city_name, district_name
+            ORDER BY province_name, city_name, district_name
+        """))
+        for table in ('trend', 'predict1'):
+            column = CITY_NAME_COLUMNS[table]
+            resolver.add_table_cities(table, (row[0] for row in _fetch(
+                cursor, f"SELECT DISTINCT {column} FROM {table} ORDER BY {column}")))
+        cursor.close()
+    finally:
+        connection.close()
+    print(f"[INFO] 名称解析索引已构建: {len(resolver)} 个省份/城市/区县"
+          f"{'' if lazy_pinyin is not None else '（未安装pypinyin，不支持拼音）'}，"
+          f"耗时 {round((time.perf_counter() - started) * 1000, 1)}ms")
+    return resolver
+
+
+_resolver: Optional[NameResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_name_resolver() -> Optional[NameResolver]:
+    """当前数据版本的名称解析索引（版本变化后的第一次调用重新构建）"""
+    global _resolver
+    version = get_data_version(*RESOLVER_TABLES)
+    if _resolver is not None and _resolver.version == version:
+        return _resolver
+    with _resolver_lock:
+        if _resolver is None or _resolver.version != version:
+            resolver = build_name_resolver(version)
+            if resolver is None:
+                return _resolver
+            _resolver = resolver
+        return _resolver
+
+
+def load_name_resolver() -> Optional[NameResolver]:
+    """同get_name_resolver，构建失败时返回None，调用方改用LIKE查询"""
+    try:
+        return get_name_resolver()
+    except Exception as e:
+        print(f"名称解析索引构建失败: {e}")
+        return None
+
+
+def init_name_resolver():
+    """服务启动时构建名称解析索引"""
+    if load_name_resolver() is None:
+        print("[WARNING] 名称解析索引不可用，城市名称查询改用LIKE")
+
+
+def city_condition(resolver: NameResolver, column: str, table: str, cities: Iterable[Dict]) -> Tuple[str, list]:
+    """城市在指定表中存储名称的等值条件 (SQL片段, 参数)；没有城市时为恒假条件"""
+    names = resolver.stored_names(cities, table)
+    if not names:
+        return "0", []
+    if len(names) == 1:
+        return f"{column} = ?", names
+    return f"{column} IN ({', '.join('?' * len(names))})", names
@@ -0,0 +1,217 @@
+"""
+全国城市汇总与排行
+current_price 每个区县一行，城市字段（均价、总价、租售比、挂牌量）在同一城市的各行重复。原先全国概览、
+城市排行、城市分级、挂牌量排行、区县价格/涨跌榜每次请求都对整表去重、排序。这里：
+- city_summary：每个城市一行（去重后的城市字段 + 区县涨跌比均值 + 区县数），
+  带current_price的数据版本，数据重新导入（版本变化）后自动刷新，也可手动执行：
+
+      cd project
+      python -m tools.city_summary_job            # 刷新城市汇总表
+      python -m tools.city_summary_job status     # 查看是否与current_price一致
+
+- 排行数组：城市按均价、租售比、涨跌比、挂牌量，区县按均价、涨跌比预先排好序，
+  按数据版本缓存在内存中，排行接口只做切片
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from utils.database import get_db_connection, get_data_version
+
+NATIONAL_TABLE = 'current_price'
+CITY_SUMMARY_TABLE = 'city_summary'
+
+# 城市字段（同一城市各行取最大值，与挂牌量排行原有的去重方式一致）
+CITY_FIELDS = ('city_avg_price', 'city_avg_total_price', 'price_rent_ratio', 'listing_count')
+# 排行指标 -> 字段
+CITY_RANK_METRICS = {
+    'price': 'city_avg_price',
+    'rent_ratio': 'price_rent_ratio',
+    'change': 'avg_district_ratio',
+    'listings': 'listing_count',
+}
+DISTRICT_RANK_METRICS = {
+    'price': 'district_avg_price',
+    'change': 'district_ratio',
+}
+
+CITY_SUMMARY_QUERY = f"""
+    SELECT city_name,
+           MAX(province_name) as province_name,
+           {', '.join(f'MAX({field}) as {field}' for field in CITY_FIELDS)},
+           AVG(district_ratio) as avg_district_ratio,
+           COUNT(district_name) as district_count
+    FROM {NATIONAL_TABLE}
+    WHERE city_name IS NOT NULL AND city_name != ''
+    GROUP BY city_name
+"""
+CITY_SUMMARY_COLUMNS = ('city_name', 'province_name') + CITY_FIELDS + ('avg_district_ratio', 'district_count')
+DISTRICT_COLUMNS = ('city_name', 'district_name', 'district_avg_price', 'district_ratio')
+
+
+def has_city_summary(cursor) -> bool:
+    """城市汇总表是否存在（迁移v8）"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CITY_SUMMARY_TABLE,))
+    return cursor.fetchone() is not None
+
+
+def refresh_city_summary(cursor, version: Optional[str] = None) -> int:
+    """按current_price重新生成城市汇总表（调用方提交事务），返回城市数"""
+    version = version or get_data_version(NATIONAL_TABLE)
+    cursor.execute(f"DELETE FROM {CITY_SUMMARY_TABLE}")
+    cursor.execute(f"""
+        INSERT INTO {CITY_SUMMARY_TABLE} ({', '.join(CITY_SUMMARY_COLUMNS)}, data_version)
+        SELECT {', '.join(CITY_SUMMARY_COLUMNS)}, ? FROM ({CITY_SUMMARY_QUERY})
+    """, (version,))
+    return cursor.rowcount
+
+
+def city_summary_version(cursor) -> Optional[str]:
+    """城市汇总表对应的数据版本（表为空时为None）"""
+    cursor.execute(f"SELECT data_version FROM {CITY_SUMMARY_TABLE} LIMIT 1")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _load_cities(connection, version: Optional[str]) -> List[Dict]:
+    """
+    读取城市汇总：汇总表与当前数据版本一致时直接读取，过期时先刷新；
+    汇总表不存在（未执行迁移）或刷新失败时直接按current_price计算
+    """
+    cursor = connection.cursor()
+    try:
+        if has_city_summary(cursor):
+            try:
+                if version is None or city_summary_version(cursor) != version:
+                    count = refresh_city_summary(cursor, version)
+                    connection.commit()
+                    print(f"[INFO] 城市汇总表已刷新: {count} 个城市")
+                cursor.execute(f"SELECT {', '.join(CITY_SUMMARY_COLUMNS)} FROM {CITY_SUMMARY_TABLE}")
+                return [dict(zip(CITY_SUMMARY_COLUMNS, row)) for row in cursor.fetchall()]
+            except Exception as e:
+                connection.rollback()
+                print(f"[WARNING] 城市汇总表刷新失败，改为直接计算: {e}")
+        cursor.execute(CITY_SUMMARY_QUERY)
+        return [dict(zip(CITY_SUMMARY_COLUMNS, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class RankOrder:
+    """
+    按字段升序排列的行下标（排除NULL，同值保持原顺序）
+    正值在升序数组中是一段后缀，positive_start为第一个正值的位置，"只取正值"的排行不必另存一份数组
+    """
+
+    def __init__(self, rows: List[Dict], column: str):
+        self.order = sorted((i for i, row in enumerate(rows) if row[column] is not None),
+                            key=lambda i: rows[i][column])
+        self.positive_start = bisect.bisect_right([rows[i][column] for i in self.order], 0)
+
+    def take(self, rows: List[Dict], limit: Optional[int], descending: bool, positive: bool = False,
+             predicate: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        order = self.order[self.positive_start:] if positive else self.order
+        if predicate is None:
+            if limit is None:
+                picked = order[::-1] if descending else order
+            else:
+                picked = order[:-limit - 1:-1] if descending else order[:limit]
+            return [rows[i] for i in picked]
+        result = []
+        for i in (reversed(order) if descending else order):
+            if limit is not None and len(result) >= limit:
+                break
+            if predicate(rows[i]):
+                result.append(rows[i])
+        return result
+
+
+class NationalRankings:
+    """城市汇总与排行数组（构建后只读，可多线程共享）"""
+
+    def __init__(self, version: Optional[str], cities: List[Dict], districts: List[Dict]):
+        self.version = version
+        self.cities = sorted(cities, key=lambda row: row['city_name'])
+        self.districts = districts
+        self._city_orders = {metric: RankOrder(self.cities, column)
+                             for metric, column in CITY_RANK_METRICS.items()}
+        self._district_orders = {metric: RankOrder(self.districts, column)
+                                 for metric, column in DISTRICT_RANK_METRICS.items()}
+        self.built_at = time.time()
+
+    def top_cities(self, metric: str, limit: Optional[int] = None, descending: bool = True,
+                   positive: bool = False, predicate: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        """按指标排序的城市（limit为None时返回全部，positive时只取指标为正的城市）"""
+        return self._city_orders[metric].take(self.cities, limit, descending, positive, predicate)
+
+    def top_districts(self, metric: str, limit: Optional[int] = None, descending: bool = True,
+                      positive: bool = False, city: Optional[str] = None) -> List[Dict]:
+        """按指标排序的区县，city为城市名关键词（包含匹配，同SQL的LIKE '%city%'）"""
+        predicate = None
+        if city:
+            keyword = city.lower()
+            predicate = lambda row: keyword in (row['city_name'] or '').lower()
+        return self._district_orders[metric].take(self.districts, limit, descending, positive, predicate)
+
+
+
+def build_national_rankings(version: Optional[str] = None) -> Optional[NationalRankings]:
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        started = time.perf_counter()
+        cities = _load_cities(connection, version)
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT {', '.join(DISTRICT_COLUMNS)} FROM {NATIONAL_TABLE}")
+        districts = [dict(zip(DISTRICT_COLUMNS, row)) for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        connection.close()
+    rankings = NationalRankings(version, cities, districts)
+    print(f"[INFO] 全国排行已构建: {len(rankings.cities)} 个城市，{len(rankings.districts)} 个区县，"
+          f"耗时 {round((time.perf_counter() - started) * 1000, 1)}ms")
+    return rankings
+
+
+_rankings: Optional[NationalRankings] = None
+_rankings_lock = threading.Lock()
+
+
+def get_national_rankings() -> Optional[NationalRankings]:
+    """当前数据版本的全国城市汇总与排行（版本变化后的第一次调用重新构建）"""
+    global _rankings
+    version = get_data_version(NATIONAL_TABLE)
+    if _rankings is not None and _rankings.version == version:
+        return _rankings
+    with _rankings_lock:
+        if _rankings is None or _rankings.version != version:
+            rankings = build_national_rankings(version)
+            if rankings is None:
+                return _rankings
+            _rankings = rankings
+        return _rankings
+
+
+def init_national_rankings():
+    """服务启动时刷新城市汇总并构建排行"""
+    try:
+        if get_national_rankings() is None:
+            print("[WARNING] 全国排行不可用")
+    except Exception as e:
+        print(f"[WARNING] 全国排行构建失败: {e}")
+
+
+def get_national_rankings_stats() -> Dict:
+    """全国排行状态（供系统监控接口使用）"""
+    rankings = _rankings
+    if rankings is None:
+        return {'loaded': False}
+    return {
+        'loaded': True,
+        'version': rankings.version,
+        'cities': len(rankings.cities),
+        'districts': len(rankings.districts),
+        'built_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(rankings.built_at)),
+    }
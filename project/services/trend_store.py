@@ -0,0 +1,212 @@
+"""
+城市房价时间序列存储
+价格趋势接口原先每次请求都查询trend（2026年再查predict1），全国平均趋势还要对整表GROUP BY。
+这里把trend加载为按城市排列的矩阵（每个城市一行，按 (年份-起始年份)*12 + 月份-1 定位），
+同时预先计算：
+- 全国平均序列（各城市同月均价的平均，同SQL的 ROUND(AVG(month_avg_price), 0)）
+- 各城市及全国的季度、年度汇总（该季度/年度各月均价的平均）
+- predict1中各城市的预测序列
+接口按年份对数组切片。数据按trend、predict1的数据版本缓存，数据变化后的第一次请求重新加载。
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.house_snapshot import sql_round
+from utils.database import get_db_connection, get_data_version
+
+TREND_STORE_TABLES = ('trend', 'predict1')
+# 汇总粒度 -> 每个周期包含的月数
+TREND_PERIODS = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+def _period_means(values: np.ndarray, months: int) -> np.ndarray:
+    """按最后一维每months个月取平均（忽略缺失月份，整个周期都缺失时为NaN）"""
+    if months == 1:
+        return values
+    grouped = values.reshape(values.shape[:-1] + (-1, months))
+    counts = np.sum(~np.isnan(grouped), axis=-1)
+    sums = np.nansum(grouped, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+class TrendStore:
+    """
+    时间序列存储（构建后只读，可多线程共享）
+    values为 [城市数, 月份数] 的矩阵，缺失的月份为NaN
+    """
+
+    def __init__(self, version: Optional[str], rows: List[tuple], predicts: List[tuple]):
+        self.version = version
+        years = [year for _, year, _, _ in rows if year is not None]
+        self.start_year = min(years) if years else 0
+        self.years = (max(years) - self.start_year + 1) if years else 0
+        self.cities: List[str] = sorted({city for city, _, _, _ in rows if city})
+        self._rows = {city: i for i, city in enumerate(self.cities)}
+
+        # trend中同城同月有多行时取最后一行（正常数据每城每月一行）
+        self.values = np.full((len(self.cities), self.years * 12), np.nan)
+        for city, year, month, price in rows:
+            if city and year is not None and month and 1 <= month <= 12 and price is not None:
+                self.values[self._rows[city], self.offset(year, month)] = price
+
+        # 全国平均：各城市同月均价的平均，四舍五入到整数（与原SQL一致）
+        with np.errstate(invalid='ignore'):
+            counts = np.sum(~np.isnan(self.values), axis=0)
+            national = np.where(counts > 0, np.nansum(self.values, axis=0) / np.maximum(counts, 1), np.nan)
+        self.national = np.array([np.nan if np.isnan(v) else sql_round(float(v), 0) for v in national])
+
+        self._rollups = {
+            period: (_period_means(self.values, months), _period_means(self.national, months))
+            for period, months in TREND_PERIODS.items() if months > 1
+        }
+
+        # 预测序列：城市 -> [(年份, 月份, 预测价格, 预测方法)]，按年月排序
+        self.predicts: Dict[str, List[tuple]] = {}
+        for city, year, month, price, method in predicts:
+            if city and price is not None:
+                self.predicts.setdefault(city, []).append((year, month, price, method))
+        for series in self.predicts.values():
+            series.sort(key=lambda item: (item[0], item[1]))
+        self.built_at = time.time()
+
+    def offset(self, year: int, month: int) -> int:
+        return (year - self.start_year) * 12 + month - 1
+
+    def has_city(self, city: str) -> bool:
+        return city in self._rows
+
+    def find_city(self, keyword: str) -> Optional[str]:
+        """名称解析不可用时的城市查找：完全一致，或唯一一个包含关键词的城市"""
+        if keyword in self._rows:
+            return keyword
+        matched = [city for city in self.cities if keyword in city]
+        return matched[0] if len(matched) == 1 else None
+
+    def _window(self, year: Optional[int], months: int) -> Tuple[int, int]:
+        """年份对应的周期下标范围，year为None或超出范围时为全部"""
+        size = self.years * 12 // months
+        if year is None:
+            return 0, size
+        start = min(max(self.offset(year, 1), 0), self.years * 12) // months
+        end = min(max(self.offset(year + 1, 1), 0), self.years * 12) // months
+        return start, end
+
+    def series(self, city: Optional[str], year: Optional[int] = None, period: str = 'month') -> List[Dict]:
+        """
+        城市（None为全国平均）的序列，跳过缺失的周期
+        每项包含year及month/quarter（按粒度）和avg_price（浮点数，由调用方取整）
+        """
+        months = TREND_PERIODS[period]
+        if months == 1:
+            values = self.national if city is None else self.values[self._rows[city]]
+        else:
+            city_values, national_values = self._rollups[period]
+            values = national_values if city is None else city_values[self._rows[city]]
+        start, end = self._window(year, months)
+        result = []
+        for position in np.flatnonzero(~np.isnan(values[start:end])) + start:
+            month_offset = int(position) * months
+            item = {"year": self.start_year + month_offset // 12}
+            if period == 'month':
+                item["month"] = month_offset % 12 + 1
+            elif period == 'quarter':
+                item["quarter"] = month_offset % 12 // 3 + 1
+            item["avg_price"] = float(values[position])
+            result.append(item)
+        return result
+
+    def predictions(self, city: str) -> List[tuple]:
+        return self.predicts.get(city, [])
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.national.nbytes + sum(
+            city_values.nbytes + national_values.nbytes for city_values, national_values in self._rollups.values())
+
+
+def _fetch(cursor, query: str) -> List[tuple]:
+    try:
+        cursor.execute(query)
+        return [tuple(row) for row in cursor.fetchall()]
+    except Exception as e:
+        # predict1不存在时只加载趋势数据
+        print(f"[WARNING] 时间序列读取失败: {e}")
+        return []
+
+
+def build_trend_store(version: Optional[str] = None) -> Optional[TrendStore]:
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        started = time.perf_counter()
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT city_name, year, month, month_avg_price
+            FROM trend
+            ORDER BY city_name, year, month
+        """)
+        rows = [tuple(row) for row in cursor.fetchall()]
+        predicts = _fetch(cursor, "SELECT city, year, month, predicted_price, method FROM predict1")
+        cursor.close()
+    finally:
+        connection.close()
+    store = TrendStore(version, rows, predicts)
+    print(f"[INFO] 时间序列已加载: {len(store.cities)} 个城市 × {store.years * 12} 个月，"
+          f"预测 {len(store.predicts)} 个城市，耗时 {round((time.perf_counter() - started) * 1000, 1)}ms")
+    return store
+
+
+_store: Optional[TrendStore] = None
+_store_lock = threading.Lock()
+
+
+def get_trend_store() -> Optional[TrendStore]:
+    """当前数据版本的时间序列存储（版本变化后的第一次调用重新加载）"""
+    global _store
+    version = get_data_version(*TREND_STORE_TABLES)
+    if _store is not None and _store.version == version:
+        return _store
+    with _store_lock:
+        if _store is None or _store.version != version:
+            store = build_trend_store(version)
+            if store is None:
+                return _store
+            _store = store
+        return _store
+
+
+def load_trend_store() -> Optional[TrendStore]:
+    """同get_trend_store，加载失败时返回None，调用方改用SQL查询"""
+    try:
+        return get_trend_store()
+    except Exception as e:
+        print(f"时间序列加载失败: {e}")
+        return None
+
+
+def init_trend_store():
+    """服务启动时加载时间序列"""
+    if load_trend_store() is None:
+        print("[WARNING] 时间序列不可用，价格趋势将直接查询数据库")
+
+
+def get_trend_store_stats() -> Dict:
+    """时间序列状态（供系统监控接口使用）"""
+    store = _store
+    if store is None:
+        return {'loaded': False}
+    return {
+        'loaded': True,
+        'version': store.version,
+        'cities': len(store.cities),
+        'months': store.years * 12,
+        'start_year': store.start_year,
+        'predict_cities': len(store.predicts),
+        'memory_bytes': store.nbytes,
+        'built_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(store.built_at)),
+    }
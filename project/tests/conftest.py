@@ -0,0 +1,34 @@
+"""
+测试公共夹具
+数据库路径在导入utils.database之前指向临时目录（不读写项目数据库），
+house_db写入一批随机房源（含并列值、空值、文本楼层）并执行全部迁移
+"""
+import os
+import random
+import sqlite3
+import tempfile
+
+import pytest
+
+from tests.house_data import HOUSE_SCHEMA, insert_houses, random_house
+
+_DB_DIR = tempfile.mkdtemp(prefix='py_spider_tests_')
+os.environ['DB_PATH'] = os.path.join(_DB_DIR, 'house_data.sqlite')
+
+
+@pytest.fixture(scope='session')
+def house_db():
+    """临时数据库：随机房源（打乱写入顺序）+ 全部迁移"""
+    from utils.database import DB_CONFIG
+    from utils.migrations import run_migrations
+
+    rng = random.Random(20240601)
+    houses = [random_house(rng, number) for number in range(1, 501)]
+    rng.shuffle(houses)
+    connection = sqlite3.connect(DB_CONFIG['database'])
+    connection.execute(HOUSE_SCHEMA)
+    insert_houses(connection, houses)
+    connection.commit()
+    connection.close()
+    run_migrations(show_plans=False)
+    return DB_CONFIG['database']
@@ -0,0 +1,45 @@
+"""
+测试用房源数据：与导出脚本一致的表结构（floor为TEXT），以及含并列值、空值、文本楼层的随机房源
+"""
+import random
+
+HOUSE_SCHEMA = """
+    CREATE TABLE beijing_house_info (
+        house_id TEXT PRIMARY KEY, total_price REAL, price_per_sqm REAL, area REAL,
+        layout TEXT, orientation TEXT, floor TEXT, has_elevator TEXT, region TEXT,
+        business_area TEXT, community TEXT, location TEXT, tags TEXT, build_year INTEGER
+    )
+"""
+HOUSE_COLUMNS = ('house_id', 'total_price', 'price_per_sqm', 'area', 'layout', 'orientation', 'floor',
+                 'has_elevator', 'region', 'business_area', 'community', 'location', 'tags', 'build_year')
+
+REGIONS = ['朝阳', '海淀', '东城', '西城', '丰台']
+LAYOUTS = ['1室1厅1卫', '2室1厅1卫', '2室2厅1卫', '3室2厅2卫', '4室2厅3卫', '6室3厅4卫', '别墅']
+# 总价/面积取有限个值（含分段边界），排序与分段时有并列值
+TOTAL_PRICES = [150, 200, 288, 300, 400, 450, 600, 800, 1000, 1500, 2000, 2600]
+AREAS = [45.5, 50, 68.2, 70, 89.9, 90, 120, 144, 180.3, 200, 260]
+FLOORS = ['3', '5', '12', '16', '28', '低楼层(共6层)', '中楼层(共18层)', '高层(共28层)', '地下室']
+
+
+def random_house(rng: random.Random, number: int) -> tuple:
+    def maybe(value, probability=0.06):
+        return None if rng.random() < probability else value
+
+    region = maybe(rng.choice(REGIONS), 0.03)
+    area = maybe(rng.choice(AREAS))
+    total_price = maybe(rng.choice(TOTAL_PRICES))
+    price_per_sqm = round(total_price * 10000 / area, 2) if total_price and area else None
+    return (
+        f"BJ{number:05d}", total_price, price_per_sqm, area,
+        maybe(rng.choice(LAYOUTS), 0.04), maybe(rng.choice(['南', '南北', '东', '西'])),
+        maybe(rng.choice(FLOORS)), maybe(rng.choice(['有', '无'])),
+        region, maybe(f"{region or ''}商圈{rng.randint(1, 3)}"), f"小区{rng.randint(1, 40)}",
+        f"北京{region or ''}", '', maybe(rng.randint(1985, 2022)),
+    )
+
+
+def insert_houses(connection, houses):
+    connection.executemany(
+        f"INSERT INTO beijing_house_info ({', '.join(HOUSE_COLUMNS)}) VALUES ({', '.join('?' * len(HOUSE_COLUMNS))})",
+        houses
+    )
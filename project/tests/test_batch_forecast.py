@@ -0,0 +1,80 @@
+"""
+批量预测测试：BatchHousePriceForecast与逐城市的HousePriceForecast结果一致
+（多项式拟合为批量最小二乘，与逐条拟合只有舍入误差）
+"""
+import math
+import random
+
+import pytest
+
+from predict_city import BatchHousePriceForecast, HousePriceForecast
+
+FORECAST_PERIODS = 12
+
+
+def _series(rng: random.Random, length: int, start_year: int, constant: bool = False):
+    price = rng.uniform(8000, 90000)
+    records = []
+    for i in range(length):
+        if not constant:
+            price += rng.gauss(0, 400)
+        year, month = start_year + i // 12, i % 12 + 1
+        records.append({'date': f"{year}-{month:02d}", 'price': int(price)})
+    return records
+
+
+def _histories():
+    rng = random.Random(25)
+    histories = [_series(rng, rng.randint(3, 80), rng.choice([2015, 2018, 2020])) for _ in range(60)]
+    # 长度相同的序列分在同一组批量计算；常数序列的r为NaN、多项式残差为0
+    histories += [_series(rng, 24, 2020) for _ in range(3)]
+    histories.append(_series(rng, 30, 2019, constant=True))
+    return histories
+
+
+def _assert_same(batch, single, path='result'):
+    if isinstance(single, dict):
+        assert batch.keys() == single.keys(), path
+        for key in single:
+            _assert_same(batch[key], single[key], f"{path}.{key}")
+    elif isinstance(single, list):
+        assert len(batch) == len(single), path
+        for i, (left, right) in enumerate(zip(batch, single)):
+            _assert_same(left, right, f"{path}[{i}]")
+    elif isinstance(single, float):
+        if math.isnan(single):
+            assert math.isnan(batch), path
+        else:
+            assert batch == pytest.approx(single, rel=1e-9, abs=1e-6), path
+    elif isinstance(single, str) and path.endswith('polynomial.formula'):
+        # 系数为0时舍入误差可能让符号不同（-0.0000 与 0.0000）
+        assert batch.replace('-0.0000', '0.0000') == single.replace('-0.0000', '0.0000'), path
+    else:
+        assert batch == single, path
+
+
+def test_batch_matches_single_series():
+    histories = _histories()
+    batch = BatchHousePriceForecast(histories).comprehensive_analysis(FORECAST_PERIODS)
+    assert len(batch) == len(histories)
+    for i, history in enumerate(histories):
+        single = HousePriceForecast(history).comprehensive_analysis(FORECAST_PERIODS)
+        _assert_same(batch[i], single, f"series[{i}]")
+
+
+def test_linear_regression_is_exact():
+    """线性回归与scipy.stats.linregress的计算顺序一致，结果逐位相同"""
+    histories = _histories()
+    batch = BatchHousePriceForecast(histories).comprehensive_analysis(FORECAST_PERIODS)
+    for i, history in enumerate(histories):
+        single = HousePriceForecast(history).linear_regression(FORECAST_PERIODS)
+        linear = batch[i]['forecast_results']['linear']
+        assert linear['slope'] == single['slope']
+        assert linear['predictions'] == single['predictions']
+
+
+def test_short_series_rejected():
+    with pytest.raises(ValueError):
+        BatchHousePriceForecast([_series(random.Random(1), 2, 2020)])
+    with pytest.raises(ValueError):
+        BatchHousePriceForecast([])
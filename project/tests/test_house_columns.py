@@ -0,0 +1,54 @@
+"""
+房源派生字段（迁移v6）测试：楼层分类按数值文本楼层和描述文本归类
+
+    cd project
+    python -m pytest tests
+"""
+import sqlite3
+
+import pytest
+
+from utils.house_columns import HOUSE_TABLE
+from utils.migrations import _migration_006_typed_house_columns
+
+pytestmark = pytest.mark.skipif(sqlite3.sqlite_version_info < (3, 31, 0),
+                                reason="派生字段需要SQLite 3.31+")
+
+# (floor原值, 期望的楼层分类)；floor与export_to_sqlite.py一致为TEXT字段
+FLOOR_CASES = [
+    ('5', '低楼层'),
+    ('12', '中楼层'),
+    ('28', '高楼层'),
+    ('高层(共28层)', '高楼层'),
+    ('中楼层(共18层)', '中楼层'),
+    ('底层(共6层)', '低楼层'),
+    ('地下室', '未知楼层'),
+    (None, None),
+]
+
+
+def _house_table(floors):
+    connection = sqlite3.connect(':memory:')
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        CREATE TABLE {HOUSE_TABLE} (
+            house_id TEXT PRIMARY KEY, layout TEXT, floor TEXT, total_price REAL, price_per_sqm REAL,
+            build_year INTEGER
+        )
+    """)
+    cursor.executemany(f"INSERT INTO {HOUSE_TABLE} (house_id, floor) VALUES (?, ?)",
+                       [(str(i), floor) for i, floor in enumerate(floors)])
+    return connection, cursor
+
+
+def _categories(cursor):
+    cursor.execute(f"SELECT floor_level_category FROM {HOUSE_TABLE} ORDER BY CAST(house_id AS INTEGER)")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def test_floor_level_category_classifies_text_floors():
+    connection, cursor = _house_table([floor for floor, _ in FLOOR_CASES])
+    _migration_006_typed_house_columns(cursor)
+    assert _categories(cursor) == [expected for _, expected in FLOOR_CASES]
+    connection.close()
+
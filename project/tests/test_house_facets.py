@@ -0,0 +1,44 @@
+"""
+房源分面测试：位图索引的计数与逐维度GROUP BY的结果一致
+"""
+import pytest
+
+import services.data_service as ds
+from services.house_snapshot import get_house_snapshot
+from utils.database import get_db_connection
+
+# (district, layout, min_price, max_price, min_area, max_area)，价格/面积含分段边界值
+FILTERS = [
+    (None, None, None, None, None, None),
+    ('朝阳', None, None, None, None, None),
+    (None, '2室', 200, 800, None, None),
+    ('海淀', '3室', None, None, 70, 144),
+    (None, '厅', 400, None, None, 90),
+    ('不存在的区域', None, None, None, None, None),
+]
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_bitmap_facets_match_database(house_db, filters):
+    filters = ds._house_list_filters(*filters)
+    snapshot = get_house_snapshot()
+    assert snapshot is not None
+    total, counts = ds._house_facets_from_snapshot(snapshot, filters)
+
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        expected_total, expected = ds._house_facets_from_database(cursor, filters)
+        cursor.close()
+    finally:
+        connection.close()
+
+    assert total == expected_total
+    assert ds._format_house_facets(counts) == ds._format_house_facets(expected)
+
+
+def test_facet_total_matches_house_list(house_db):
+    filters = ds._house_list_filters('朝阳', '2室', 200, None, None, 120)
+    total, _ = ds._house_facets_from_snapshot(get_house_snapshot(), filters)
+    listed = ds.query_houses_list.__wrapped__(district='朝阳', layout='2室', min_price=200, max_area=120)
+    assert total == listed['data']['total']
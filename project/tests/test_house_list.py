@@ -0,0 +1,66 @@
+"""
+房源列表分页测试：游标翻页与 page/page_size 分页的结果一致（快照与数据库两条路径）
+"""
+import pytest
+
+import services.data_service as ds
+
+PAGE_SIZE = 7
+FILTERS = [
+    {},
+    {'district': '朝阳'},
+    {'layout': '2室', 'min_price': 300, 'max_area': 120},
+]
+
+
+@pytest.fixture(params=['snapshot', 'database'])
+def query_houses(request, house_db, monkeypatch):
+    """不经过响应缓存的query_houses_list；database时快照不可用，走SQL分页"""
+    if request.param == 'database':
+        monkeypatch.setattr(ds, 'get_house_snapshot', lambda: None)
+    else:
+        assert ds.get_house_snapshot() is not None
+    return ds.query_houses_list.__wrapped__
+
+
+def _offset_ids(query, total, **params):
+    ids = []
+    for page in range(1, total // PAGE_SIZE + 2):
+        result = query(page=page, page_size=PAGE_SIZE, **params)
+        ids += [house['house_id'] for house in result['data']['houses']]
+    return ids
+
+
+def _cursor_ids(query, **params):
+    ids = []
+    cursor = None
+    while True:
+        result = query(page_size=PAGE_SIZE, cursor=cursor, **params)
+        assert result['code'] == 200
+        ids += [house['house_id'] for house in result['data']['houses']]
+        cursor = result['data']['next_cursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+@pytest.mark.parametrize('sort', ds.HOUSE_SORT_COLUMNS)
+def test_cursor_pages_match_offset_pages(query_houses, sort, order, filters):
+    params = dict(filters, sort=sort, order=order)
+    total = query_houses(**params)['data']['total']
+    offset_ids = _offset_ids(query_houses, total, **params)
+    assert total > PAGE_SIZE
+    assert len(offset_ids) == len(set(offset_ids)) == total
+    assert _cursor_ids(query_houses, **params) == offset_ids
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('sort', ds.HOUSE_SORT_COLUMNS)
+def test_snapshot_order_matches_database(house_db, monkeypatch, sort, filters):
+    query = ds.query_houses_list.__wrapped__
+    params = dict(filters, sort=sort, order='desc')
+    total = query(**params)['data']['total']
+    from_snapshot = _offset_ids(query, total, **params)
+    monkeypatch.setattr(ds, 'get_house_snapshot', lambda: None)
+    assert _offset_ids(query, total, **params) == from_snapshot
@@ -0,0 +1,72 @@
+"""
+房源汇总表测试：增删改房源后，触发器维护的house_summary与全表重新计算的结果一致
+"""
+import random
+import sqlite3
+
+import pytest
+
+from tests.house_data import HOUSE_SCHEMA, REGIONS, insert_houses, random_house
+from utils.house_summary import verify_house_summary
+from utils.migrations import _migration_006_typed_house_columns, _migration_007_house_summary
+
+pytestmark = pytest.mark.skipif(sqlite3.sqlite_version_info < (3, 31, 0),
+                                reason="派生字段需要SQLite 3.31+")
+
+
+@pytest.fixture
+def cursor():
+    connection = sqlite3.connect(':memory:')
+    cursor = connection.cursor()
+    cursor.execute(HOUSE_SCHEMA)
+    insert_houses(connection, [random_house(random.Random(1), number) for number in range(1, 201)])
+    _migration_006_typed_house_columns(cursor)
+    _migration_007_house_summary(cursor)
+    yield cursor
+    connection.close()
+
+
+def _house_ids(cursor, where: str = "1=1", params=()):
+    cursor.execute(f"SELECT house_id FROM beijing_house_info WHERE {where} ORDER BY house_id", params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def test_summary_after_build(cursor):
+    assert verify_house_summary(cursor) == []
+
+
+def test_triggers_keep_summary_in_sync(cursor):
+    rng = random.Random(2)
+    insert_houses(cursor.connection, [random_house(rng, number) for number in range(1001, 1101)])
+    assert verify_house_summary(cursor) == []
+
+    ids = _house_ids(cursor)
+    for house_id in rng.sample(ids, 40):
+        cursor.execute("UPDATE beijing_house_info SET total_price = ?, price_per_sqm = ? WHERE house_id = ?",
+                       (rng.choice([99, 500, 3000, None]), rng.choice([15000.5, 80000, None]), house_id))
+    for house_id in rng.sample(ids, 20):
+        cursor.execute("UPDATE beijing_house_info SET region = ?, floor = ?, layout = ? WHERE house_id = ?",
+                       (rng.choice(REGIONS + [None]), rng.choice(['7', '高层(共30层)', None]),
+                        rng.choice(['3室1厅1卫', None]), house_id))
+    # 文本价格（如"面议"）不计入单价/总价的统计
+    cursor.execute("UPDATE beijing_house_info SET total_price = '面议' WHERE house_id = ?", (ids[0],))
+    assert verify_house_summary(cursor) == []
+
+
+def test_deleting_extremes_and_last_rows(cursor):
+    # 删除各区域单价最高、最低的房源：最值需要按剩余房源重新计算
+    for aggregate in ('MAX', 'MIN'):
+        cursor.execute(f"""
+            DELETE FROM beijing_house_info WHERE rowid IN (
+                SELECT rowid FROM beijing_house_info AS house
+                WHERE price_per_sqm = (SELECT {aggregate}(price_per_sqm) FROM beijing_house_info
+                                       WHERE region IS house.region)
+            )
+        """)
+        assert verify_house_summary(cursor) == []
+
+    # 删除某个区域的全部房源：该取值的汇总行一并删除
+    cursor.execute("DELETE FROM beijing_house_info WHERE region = ?", (REGIONS[0],))
+    assert verify_house_summary(cursor) == []
+    cursor.execute("SELECT COUNT(*) FROM house_summary WHERE dimension = 'region' AND value = ?", (REGIONS[0],))
+    assert cursor.fetchone()[0] == 0
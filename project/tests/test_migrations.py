@@ -0,0 +1,77 @@
+"""
+迁移测试：条件尚不满足（表不存在）的迁移不记录版本，建表后再次执行迁移时补做
+"""
+import sqlite3
+
+import pytest
+
+from tests.house_data import HOUSE_SCHEMA
+from utils.house_columns import HOUSE_TABLE, HOUSE_TYPED_COLUMNS
+from utils.house_summary import SUMMARY_TABLE, SUMMARY_TRIGGERS
+from utils.migrations import LIST_QUERY_INDEXES, _migration_001_list_query_indexes, apply_migrations
+
+REPORT_INDEXES = [name for name, table, _ in LIST_QUERY_INDEXES if table == 'reports']
+REPORT_SCHEMA = ("CREATE TABLE reports (id INTEGER PRIMARY KEY, user_id TEXT, type TEXT, city TEXT, "
+                 "title TEXT, created_at TEXT)")
+NATIONAL_SCHEMAS = [
+    "CREATE TABLE current_price (province_name TEXT, city_name TEXT, district_name TEXT, city_avg_price REAL, "
+    "city_avg_total_price REAL, price_rent_ratio REAL, listing_count INTEGER, district_avg_price REAL, "
+    "district_ratio REAL)",
+    "CREATE TABLE trend (city_name TEXT, year INTEGER, month INTEGER, month_avg_price REAL)",
+    "CREATE TABLE predict1 (city TEXT, year INTEGER, month INTEGER, predicted_price REAL, method TEXT)",
+]
+
+
+def _objects(cursor, kind: str):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _analyzed_tables(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    if cursor.fetchone() is None:
+        return set()
+    cursor.execute("SELECT tbl FROM sqlite_stat1")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def test_report_indexes_created_after_table_exists():
+    cursor = sqlite3.connect(':memory:').cursor()
+    cursor.execute("CREATE TABLE trend (city_name TEXT, year INTEGER, month INTEGER, month_avg_price REAL)")
+    cursor.execute("INSERT INTO trend VALUES ('北京', 2024, 1, 60000)")
+    assert _migration_001_list_query_indexes(cursor) is False
+    assert 'idx_trend_city_year_month' in _objects(cursor, 'index')
+    assert not set(REPORT_INDEXES) & _objects(cursor, 'index')
+    # 只对建立了索引的表更新统计信息
+    assert _analyzed_tables(cursor) == {'trend'}
+
+    cursor.execute(REPORT_SCHEMA)
+    _migration_001_list_query_indexes(cursor)
+    assert set(REPORT_INDEXES) <= _objects(cursor, 'index')
+
+
+@pytest.mark.skipif(sqlite3.sqlite_version_info < (3, 34, 0), reason="全文索引需要SQLite 3.34+")
+def test_skipped_migrations_retried_after_tables_created():
+    """服务先以只有全国数据的库启动并执行迁移，之后才导入北京房源和报告"""
+    connection = sqlite3.connect(':memory:')
+    cursor = connection.cursor()
+    for schema in NATIONAL_SCHEMAS:
+        cursor.execute(schema)
+    first = apply_migrations(connection, show_plans=False)
+    assert not {1, 2, 4, 5, 6, 7} & set(first)
+    assert 'trg_current_price_insert_version' in _objects(cursor, 'trigger')
+
+    cursor.execute(HOUSE_SCHEMA)
+    cursor.execute(REPORT_SCHEMA)
+    second = apply_migrations(connection, show_plans=False)
+    assert {1, 2, 4, 5, 6, 7} <= set(second)
+    assert {'idx_bhi_region_price_area', 'idx_bhi_total_price_house_id', *REPORT_INDEXES} <= _objects(cursor, 'index')
+    assert 'trg_beijing_house_info_insert_version' in _objects(cursor, 'trigger')
+    assert 'house_location_fts' in _objects(cursor, 'table')
+    assert 'trg_beijing_house_info_insert_location_fts' in _objects(cursor, 'trigger')
+    cursor.execute(f"PRAGMA table_xinfo({HOUSE_TABLE})")
+    assert {name for name, _, _ in HOUSE_TYPED_COLUMNS} <= {row[1] for row in cursor.fetchall()}
+    assert SUMMARY_TABLE in _objects(cursor, 'table')
+    assert set(SUMMARY_TRIGGERS.values()) <= _objects(cursor, 'trigger')
+    assert apply_migrations(connection, show_plans=False) == []
+    connection.close()
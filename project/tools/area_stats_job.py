@@ -0,0 +1,73 @@
+"""
+区域统计批量预计算任务
+一次读取beijing_house_info，计算全部行政区和商圈的统计并写入area_stats表，
+get_area_statistics在数据版本未变化时直接读取预计算结果。
+
+    cd project
+    python -m tools.area_stats_job               # 计算全部行政区和商圈
+    python -m tools.area_stats_job 海淀 望京      # 只计算指定区域
+    python -m tools.area_stats_job status        # 查看预计算结果是否过期
+"""
+import sys
+import os
+
+# 支持在project目录下以脚本方式运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import Dict, List, Optional
+
+from utils.database import get_db_connection, get_data_version
+from tools.house_query import AREA_STATS_TABLE, HOUSE_TABLE, precompute_area_statistics
+
+
+def run_area_stats_job(areas: Optional[List[str]] = None) -> Dict:
+    """执行预计算并打印结果，返回precompute_area_statistics的统计信息"""
+    print(f"[INFO] 开始预计算区域统计: {'全部区域' if areas is None else ', '.join(areas)}")
+    result = precompute_area_statistics(areas)
+    print(f"[SUCCESS] 写入 {result['areas']} 个区域（无数据跳过 {result['skipped']} 个），"
+          f"用时 {result['duration_ms']}ms，数据版本 {result['data_version']}")
+    return result
+
+
+def area_stats_status() -> Dict:
+    """预计算结果的数量、更新时间及是否与当前数据版本一致"""
+    connection = get_db_connection()
+    if not connection:
+        return {}
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            SELECT area_type, data_version, COUNT(*) as count, MAX(updated_at) as updated_at
+            FROM {AREA_STATS_TABLE}
+            GROUP BY area_type, data_version
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+
+    current = get_data_version(HOUSE_TABLE)
+    return {
+        'data_version': current,
+        'groups': [
+            {
+                'area_type': row['area_type'],
+                'count': row['count'],
+                'updated_at': row['updated_at'],
+                'fresh': row['data_version'] == current,
+            }
+            for row in rows
+        ],
+    }
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args == ['status']:
+        status = area_stats_status()
+        print(f"当前数据版本: {status.get('data_version')}")
+        for group in status.get('groups', []):
+            state = '有效' if group['fresh'] else '已过期'
+            print(f"{group['area_type']:<15} {group['count']:>6} 条  {group['updated_at']}  {state}")
+    else:
+        run_area_stats_job(args or None)
@@ -0,0 +1,87 @@
+"""
+全国城市汇总刷新
+city_summary由服务在启动或current_price数据变化后自动刷新（见services.national_rankings），
+导入current_price后也可以手动刷新或查看状态：
+
+    cd project
+    python -m tools.city_summary_job            # 按current_price重新生成城市汇总表
+    python -m tools.city_summary_job status     # 查看城市汇总是否与current_price一致
+"""
+import sys
+import os
+
+# 支持在project目录下以脚本方式运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+from typing import Dict, Optional
+
+from utils.database import get_db_connection, get_data_version
+from services.national_rankings import (
+    CITY_SUMMARY_TABLE, NATIONAL_TABLE, city_summary_version, has_city_summary, refresh_city_summary,
+)
+
+MISSING_TABLE_MESSAGE = "[ERROR] 城市汇总表不存在，请先执行数据库迁移（python -m utils.migrations）"
+
+
+def run_refresh() -> Optional[int]:
+    """按current_price重新生成城市汇总表，返回城市数"""
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        if not has_city_summary(cursor):
+            print(MISSING_TABLE_MESSAGE)
+            return None
+        started = time.perf_counter()
+        count = refresh_city_summary(cursor)
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+    print(f"[SUCCESS] 城市汇总表已刷新: {count} 个城市，用时 {round((time.perf_counter() - started) * 1000, 1)}ms")
+    return count
+
+
+def city_summary_status() -> Dict:
+    """城市汇总的城市数、更新时间及是否与当前数据版本一致"""
+    connection = get_db_connection()
+    if not connection:
+        return {}
+    try:
+        cursor = connection.cursor()
+        if not has_city_summary(cursor):
+            print(MISSING_TABLE_MESSAGE)
+            return {}
+        version = city_summary_version(cursor)
+        cursor.execute(f"SELECT COUNT(*) as count, MAX(updated_at) as updated_at FROM {CITY_SUMMARY_TABLE}")
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        connection.close()
+
+    current = get_data_version(NATIONAL_TABLE)
+    return {
+        'data_version': current,
+        'summary_version': version,
+        'cities': row['count'],
+        'updated_at': row['updated_at'],
+        'fresh': version is not None and version == current,
+    }
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args == ['status']:
+        status = city_summary_status()
+        if status:
+            print(f"当前数据版本: {status['data_version']}")
+            print(f"汇总数据版本: {status['summary_version']}")
+            print(f"{status['cities']} 个城市  {status['updated_at']}  {'有效' if status['fresh'] else '已过期'}")
+        sys.exit(0 if status.get('fresh') else 1)
+    elif not args:
+        sys.exit(0 if run_refresh() is not None else 1)
+    else:
+        print(__doc__)
+        sys.exit(2)
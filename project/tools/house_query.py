@@ -3,7 +3,10 @@
 提供智能房源查询、区域统计等功能
 使用数据库连接池
 """
+import json
+import time
 import pandas as pd
+import numpy as np
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import sys
@@ -12,110 +15,204 @@ import os
 # 添加父目录到路径以便导入 utils
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils import get_db_connection
+from utils import get_db_connection, get_data_version
+from services.house_snapshot import (
+    HOUSE_TABLE, get_house_snapshot, load_house_snapshot, sample_positions, fetch_house_rows, sql_round
+)
+from services.area_stats import get_cached_area_statistics
+from services.location_index import location_condition
+from services.name_resolver import city_condition, load_name_resolver
+from utils.house_columns import FLOOR_PREFERENCES, has_typed_house_columns, layout_rooms
 
 
-def query_houses_by_requirements(requirements: dict, limit: int = 20) -> List[Dict]:
+# 需求中的区域关键词匹配的字段（任一字段包含即匹配：区域、商圈、小区、位置）
+REQUIREMENT_DISTRICT_COLUMNS = ('region', 'business_area', 'community', 'location')
+
+
+def _snapshot_requirements_mask(snapshot, requirements: dict,
+                                district_columns: Tuple[str, ...] = REQUIREMENT_DISTRICT_COLUMNS):
     """
-    根据用户需求查询符合条件的房源（随机返回）
+    将需求条件转换为内存快照上的筛选掩码（条件语义与compile_requirements一致）
+    :param district_columns: 区域关键词需要匹配的字段（任一字段包含即匹配）
+    """
+    mask = snapshot.all()
+
+    if requirements.get('district'):
+        district_mask = np.zeros(snapshot.size, dtype=bool)
+        for column in district_columns:
+            district_mask |= snapshot.contains(column, str(requirements['district']))
+        mask &= district_mask
+
+    if requirements.get('budget_min') is not None:
+        mask &= snapshot.between('total_price', low=requirements['budget_min'])
+    if requirements.get('budget_max') is not None:
+        mask &= snapshot.between('total_price', high=requirements['budget_max'])
+
+    if requirements.get('area_min') is not None:
+        mask &= snapshot.between('area', low=requirements['area_min'])
+    if requirements.get('area_max') is not None:
+        mask &= snapshot.between('area', high=requirements['area_max'])
+
+    # 快照加载了派生字段（迁移v6）时，户型与楼层偏好按派生字段匹配
+    typed = snapshot.has_column('rooms') and snapshot.has_column('floor_level_category')
+
+    if requirements.get('layout'):
+        rooms = layout_rooms(str(requirements['layout']))
+        if rooms is not None and typed:
+            mask &= snapshot.numeric['rooms'] == rooms
+        else:
+            mask &= snapshot.contains('layout', str(requirements['layout']))
+
+    floor_pref = requirements.get('floor_pref')
+    if typed and floor_pref in FLOOR_PREFERENCES:
+        mask &= snapshot.equals('floor_level_category', FLOOR_PREFERENCES[floor_pref])
+    elif floor_pref == '低层':
+        mask &= snapshot.less('floor', 6)
+    elif floor_pref == '中层':
+        mask &= snapshot.between('floor', 6, 12)
+    elif floor_pref == '高层':
+        mask &= snapshot.greater('floor', 12)
+
+    return mask
+
+
+def compile_requirements(requirements: dict,
+                         district_columns: Tuple[str, ...] = REQUIREMENT_DISTRICT_COLUMNS,
+                         cursor=None) -> Tuple[str, list]:
+    """
+    将需求条件编译为SQL的WHERE子句和参数（房源查询与计数共用）
 
     Args:
-        requirements: 查询条件字典
-            - budget_min: 最低预算（万元）
-            - budget_max: 最高预算（万元）
-            - district: 区域名称
-            - layout: 户型（如 "2室"）
-            - area_min: 最小面积（平米）
-            - area_max: 最大面积（平米）
-            - floor_pref: 楼层偏好（如 "中层"、"高层"、"低层"）
+        requirements: 查询条件字典（字段见query_houses_by_requirements）
+        district_columns: 区域关键词需要匹配的字段
+        cursor: 数据库游标（可选），提供时区域条件使用位置全文索引，户型与楼层偏好使用
+            派生字段rooms/floor_level_category（迁移v6），否则使用LIKE和原楼层字段
+
+    Returns:
+        (where_clause, params)，没有条件时where_clause为 "1=1"
+    """
+    conditions = []
+    params = []
+
+    # 1. 区域条件
+    if requirements.get('district'):
+        if cursor is not None:
+            condition, district_params = location_condition(cursor, requirements['district'], district_columns)
+            conditions.append(condition)
+            params.extend(district_params)
+        else:
+            like_param = f"%{requirements['district']}%"
+            conditions.append("(" + " OR ".join(f"{column} LIKE ?" for column in district_columns) + ")")
+            params.extend([like_param] * len(district_columns))
+
+    # 2. 预算条件（总价）
+    if requirements.get('budget_min') is not None:
+        conditions.append("total_price >= ?")
+        params.append(requirements['budget_min'])
+
+    if requirements.get('budget_max') is not None:
+        conditions.append("total_price <= ?")
+        params.append(requirements['budget_max'])
+
+    # 3. 面积条件
+    if requirements.get('area_min') is not None:
+        conditions.append("area >= ?")
+        params.append(requirements['area_min'])
+
+    if requirements.get('area_max') is not None:
+        conditions.append("area <= ?")
+        params.append(requirements['area_max'])
+
+    typed = cursor is not None and has_typed_house_columns(cursor)
+
+    # 4. 户型条件（只指定居室数时走rooms索引）
+    if requirements.get('layout'):
+        rooms = layout_rooms(str(requirements['layout']))
+        if rooms is not None and typed:
+            conditions.append("rooms = ?")
+            params.append(rooms)
+        else:
+            conditions.append("layout LIKE ?")
+            params.append(f"%{requirements['layout']}%")
+
+    # 5. 楼层偏好
+    floor_pref = requirements.get('floor_pref')
+    if typed and floor_pref in FLOOR_PREFERENCES:
+        conditions.append("floor_level_category = ?")
+        params.append(FLOOR_PREFERENCES[floor_pref])
+    elif floor_pref == '低层':
+        conditions.append("floor < ?")
+        params.append(6)
+    elif floor_pref == '中层':
+        conditions.append("(floor >= ? AND floor <= ?)")
+        params.extend([6, 12])
+    elif floor_pref == '高层':
+        conditions.append("floor > ?")
+        params.append(12)
+
+    where_clause = " AND ".join(conditions) if conditions else "1=1"
+    return where_clause, params
+
+
+def _sample_matching_rows(cursor, where_clause: str, params: list, limit: int,
+                          seed: Optional[int] = None, offset: int = 0) -> Tuple[List, int]:
+    """
+    不使用 ORDER BY RANDOM() 的随机抽样：只读取满足条件的rowid（不排序、不读整行），
+    在rowid集合上均匀抽样后再按主键回表
+    :return: (抽中的记录, 满足条件的总数)
+    """
+    cursor.execute(f"SELECT rowid FROM beijing_house_info WHERE {where_clause}", params)
+    rowids = [row[0] for row in cursor.fetchall()]
+    picked = sample_positions(len(rowids), limit, seed, offset)
+    return fetch_house_rows([rowids[i] for i in picked.tolist()]), len(rowids)
+
+
+def match_houses(requirements: dict, limit: int = 20, seed: Optional[int] = None,
+                 offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    根据用户需求筛选房源：一次筛选同时得到随机抽取的房源和满足条件的总数
+
+    Args:
+        requirements: 查询条件字典（字段见query_houses_by_requirements）
         limit: 返回数量限制
+        seed: 随机种子（可选），指定时结果可复现
+        offset: 配合seed分页，跳过随机序列中的前offset条
 
     Returns:
-        房源数据列表
+        (房源数据列表, 满足条件的总数)
     """
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            mask = _snapshot_requirements_mask(snapshot, requirements)
+            results = snapshot.fetch_rows(snapshot.sample(mask, limit, seed, offset))
+            total = snapshot.count(mask)
+            print(f"✅ 快照筛选结果: 共 {total} 条符合条件，返回 {len(results)} 条")
+            return results, total
+        except Exception as e:
+            print(f"⚠️ 快照筛选失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
-        return []
+        return [], 0
 
     try:
         cursor = connection.cursor()
-
-        # 构建WHERE条件
-        conditions = []
-        params = []
-
-        # 1. 区域条件
-        if requirements.get('district'):
-            district = requirements['district']
-            conditions.append("""(
-                region LIKE ? 
-            )""")
-            like_param = f"%{district}%"
-            params.extend([like_param])
-
-        # 2. 预算条件（总价）
-        if requirements.get('budget_min') is not None:
-            conditions.append("total_price >= ?")
-            params.append(requirements['budget_min'])
-
-        if requirements.get('budget_max') is not None:
-            conditions.append("total_price <= ?")
-            params.append(requirements['budget_max'])
-
-        # 3. 面积条件
-        if requirements.get('area_min') is not None:
-            conditions.append("area >= ?")
-            params.append(requirements['area_min'])
-
-        if requirements.get('area_max') is not None:
-            conditions.append("area <= ?")
-            params.append(requirements['area_max'])
-
-        # 4. 户型条件
-        if requirements.get('layout'):
-            conditions.append("layout LIKE ?")
-            params.append(f"%{requirements['layout']}%")
-
-        # 5. 楼层偏好（可选，根据你的数据库字段调整）
-        if requirements.get('floor_pref'):
-            floor_pref = requirements['floor_pref']
-            if floor_pref == '低层':
-                conditions.append("floor < ?")
-                params.append(6)
-            elif floor_pref == '中层':
-                conditions.append("(floor >= ? AND floor <= ?)")
-                params.extend([6, 12])
-            elif floor_pref == '高层':
-                conditions.append("floor > ?")
-                params.append(12)
-
-        # 构建完整SQL
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-
-        query = f"""
-        SELECT * FROM beijing_house_info 
-        WHERE {where_clause}
-        ORDER BY RANDOM()
-        LIMIT ?
-        """
-
-        params.append(limit)
+        where_clause, params = compile_requirements(requirements, cursor=cursor)
 
         print(f"📝 执行查询SQL:")
-        print(f"   条件数: {len(conditions)}")
         print(f"   WHERE: {where_clause}")
         print(f"   参数: {params}")
 
-        # 执行查询
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+        # 执行查询（在匹配的rowid上随机抽样）
+        results, total = _sample_matching_rows(cursor, where_clause, params, limit, seed, offset)
 
-        print(f"✅ 查询结果: 找到 {len(results)} 条数据")
+        print(f"✅ 查询结果: 共 {total} 条符合条件，返回 {len(results)} 条")
 
         cursor.close()
         connection.close()
 
-        return results
+        return results, total
 
     except Exception as e:
         print(f"❌ 数据库查询失败: {e}")
@@ -123,69 +220,53 @@ def query_houses_by_requirements(requirements: dict, limit: int = 20) -> List[Di
         traceback.print_exc()
         if connection:
             connection.close()
-        return []
+        return [], 0
+
+
+def query_houses_by_requirements(requirements: dict, limit: int = 20,
+                                 seed: Optional[int] = None, offset: int = 0) -> List[Dict]:
+    """
+    根据用户需求查询符合条件的房源（随机返回）
+
+    Args:
+        requirements: 查询条件字典
+            - budget_min: 最低预算（万元）
+            - budget_max: 最高预算（万元）
+            - district: 区域名称（匹配区域、商圈、小区、位置任一字段）
+            - layout: 户型（如 "2室"）
+            - area_min: 最小面积（平米）
+            - area_max: 最大面积（平米）
+            - floor_pref: 楼层偏好（如 "中层"、"高层"、"低层"）
+        limit: 返回数量限制
+        seed: 随机种子（可选），指定时结果可复现
+        offset: 配合seed分页，跳过随机序列中的前offset条
+
+    Returns:
+        房源数据列表
+    """
+    results, _ = match_houses(requirements, limit, seed, offset)
+    return results
 
 
 def count_matched_houses(requirements: dict) -> int:
     """
     统计符合条件的房源总数（不限制返回数量）
-    用于返回 total_matched 字段
+    条件与query_houses_by_requirements相同；同时需要房源列表时使用match_houses，只筛选一次
     """
+    snapshot = get_house_snapshot()
+    if snapshot is not None:
+        try:
+            return snapshot.count(_snapshot_requirements_mask(snapshot, requirements))
+        except Exception as e:
+            print(f"⚠️ 快照统计失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
         return 0
 
     try:
         cursor = connection.cursor()
-
-        # 构建WHERE条件（与上面相同）
-        conditions = []
-        params = []
-
-        if requirements.get('district'):
-            district = requirements['district']
-            conditions.append("""(
-                region LIKE ? 
-                OR business_area LIKE ? 
-                OR community LIKE ?
-                OR location LIKE ?
-            )""")
-            like_param = f"%{district}%"
-            params.extend([like_param, like_param, like_param, like_param])
-
-        if requirements.get('budget_min') is not None:
-            conditions.append("total_price >= ?")
-            params.append(requirements['budget_min'])
-
-        if requirements.get('budget_max') is not None:
-            conditions.append("total_price <= ?")
-            params.append(requirements['budget_max'])
-
-        if requirements.get('area_min') is not None:
-            conditions.append("area >= ?")
-            params.append(requirements['area_min'])
-
-        if requirements.get('area_max') is not None:
-            conditions.append("area <= ?")
-            params.append(requirements['area_max'])
-
-        if requirements.get('layout'):
-            conditions.append("layout LIKE ?")
-            params.append(f"%{requirements['layout']}%")
-
-        if requirements.get('floor_pref'):
-            floor_pref = requirements['floor_pref']
-            if floor_pref == '低层':
-                conditions.append("floor < ?")
-                params.append(6)
-            elif floor_pref == '中层':
-                conditions.append("(floor >= ? AND floor <= ?)")
-                params.extend([6, 12])
-            elif floor_pref == '高层':
-                conditions.append("floor > ?")
-                params.append(12)
-
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        where_clause, params = compile_requirements(requirements, cursor=cursor)
 
         query = f"SELECT COUNT(*) as total FROM beijing_house_info WHERE {where_clause}"
 
@@ -205,9 +286,10 @@ def count_matched_houses(requirements: dict) -> int:
         return 0
 
 
-def query_house_data_by_area(area_name: str, limit: int = 20) -> Tuple[List[Dict], List[str]]:
+def query_house_data_by_area(area_name: str, limit: int = 20, seed: Optional[int] = None,
+                             offset: int = 0) -> Tuple[List[Dict], List[str]]:
     """
-    根据区域名称查询房产数据
+    根据区域名称查询房产数据（随机返回，seed/offset含义同query_houses_by_requirements）
     返回: (数据列表, 表头字段名)
     """
     connection = get_db_connection()
@@ -246,22 +328,15 @@ def query_house_data_by_area(area_name: str, limit: int = 20) -> Tuple[List[Dict
 
         print(f"🔍 提取的字段列表: {column_names}")
 
-        # 根据你的数据库结构，我们使用联合查询来搜索多个字段
-        query = f"""
-        SELECT * FROM beijing_house_info 
-        WHERE 
-            region LIKE '%{area_name}%' 
-            OR business_area LIKE '%{area_name}%' 
-            OR community LIKE '%{area_name}%'
-            OR location LIKE '%{area_name}%'
-        ORDER BY RANDOM()
-        LIMIT {limit}
-        """
-
-        print(f"📝 执行查询: {query[:100]}...")  # 只打印前100个字符
-
-        cursor.execute(query)
-        results = cursor.fetchall()
+        # 区域名称匹配区域、商圈、小区、位置任一字段
+        snapshot = get_house_snapshot()
+        if snapshot is not None:
+            mask = _snapshot_requirements_mask(snapshot, {'district': area_name})
+            results = snapshot.fetch_rows(snapshot.sample(mask, limit, seed, offset))
+        else:
+            where_clause, params = location_condition(cursor, area_name, REQUIREMENT_DISTRICT_COLUMNS)
+            print(f"📝 执行查询: 区域关键词 {area_name}")
+            results, _ = _sample_matching_rows(cursor, where_clause, params, limit, seed, offset)
 
         print(f"✅ 查询结果: 找到 {len(results)} 条数据")
         if results:
@@ -596,8 +671,242 @@ def get_area_average_price(region):
         return None
 
 
+# 建设年代分段（顺序即返回顺序，未知年代排在最后）
+BUILD_PERIODS = ['1990年以前', '1990-1999年', '2000-2009年', '2010-2019年', '2020年以后', '未知年代']
+# 总价分段（万元），NULL与SQL的CASE一致落入最后一段
+PRICE_RANGES = ['200万以下', '200-400万', '400-600万', '600-800万', '800-1000万',
+                '1000-1500万', '1500-2000万', '2000万以上']
+PRICE_RANGE_BOUNDS = [200, 400, 600, 800, 1000, 1500, 2000]
+
+
+def _unknown_as_category(snapshot, column: str):
+    """文本列的NULL归为"未知"（同SQL的IFNULL(column, '未知')），结果按快照缓存"""
+    return snapshot.memo(f'area_stats_{column}',
+                         lambda: snapshot.derive(column, lambda value: '未知' if value is None else value))
+
+
+def _build_period_codes(snapshot) -> np.ndarray:
+    year = snapshot.numeric['build_year']
+    return np.select(
+        [year < 1990, (year >= 1990) & (year <= 1999), (year >= 2000) & (year <= 2009),
+         (year >= 2010) & (year <= 2019), year >= 2020],
+        [0, 1, 2, 3, 4],
+        default=5
+    ).astype(np.int32)
+
+
+def _price_range_codes(snapshot) -> np.ndarray:
+    price = snapshot.numeric['total_price']
+    codes = np.searchsorted(PRICE_RANGE_BOUNDS, price, side='right').astype(np.int32)
+    codes[np.isnan(price)] = len(PRICE_RANGES) - 1
+    return codes
+
+
+def _sorted_by_count(groups: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+    groups = sorted(groups, key=lambda group: -group['count'])
+    return groups[:limit] if limit else groups
+
+
+def _area_statistics_from_snapshot(snapshot, area_name: str) -> Optional[Dict]:
+    """
+    基于内存快照一次性计算区域统计的六部分（结构和取值与SQL版本一致）
+    基础统计匹配区域/商圈/小区，各分布匹配区域/商圈（与原SQL条件一致）
+    :return: 基础统计为空时返回None（由调用方转查全国数据）
+    """
+    area_mask = snapshot.contains('region', area_name) | snapshot.contains('business_area', area_name)
+    basic_mask = area_mask | snapshot.contains('community', area_name)
+
+    total = snapshot.count(basic_mask)
+    if total == 0:
+        return None
+    total_price = snapshot.stats('total_price', basic_mask)
+    community_codes = snapshot.categorical['community'][0][basic_mask]
+    basic_stats = {
+        'total_listings': total,
+        'avg_total_price': sql_round(total_price['avg'], 2),
+        'avg_unit_price': sql_round(snapshot.stats('price_per_sqm', basic_mask)['avg'], 2),
+        'min_price': total_price['min'],
+        'max_price': total_price['max'],
+        'avg_size': sql_round(snapshot.stats('area', basic_mask)['avg'], 2),
+        'distinct_communities': int(len(np.unique(community_codes[community_codes >= 0]))),
+    }
+
+    # 户型分布
+    layout_groups = snapshot.group_by(_unknown_as_category(snapshot, 'layout'), mask=area_mask,
+                                      values=('total_price', 'price_per_sqm', 'area'))
+    layout_distribution = [
+        {
+            'layout': group['key'],
+            'count': group['count'],
+            'avg_price': sql_round(group['avg_total_price'], 2),
+            'avg_unit_price': sql_round(group['avg_price_per_sqm'], 2),
+            'avg_size': sql_round(group['avg_area'], 2),
+        }
+        for group in _sorted_by_count(layout_groups, 10)
+    ]
+
+    # 建设年代分布
+    year_codes = snapshot.memo('area_stats_build_period', lambda: _build_period_codes(snapshot))
+    year_groups = snapshot.group_by((year_codes, BUILD_PERIODS), mask=area_mask,
+                                    values=('total_price', 'price_per_sqm'))
+    year_groups.sort(key=lambda group: BUILD_PERIODS.index(group['key']))
+    year_distribution = [
+        {
+            'build_period': group['key'],
+            'count': group['count'],
+            'avg_total_price': sql_round(group['avg_total_price'], 2),
+            'avg_unit_price': sql_round(group['avg_price_per_sqm'], 2),
+        }
+        for group in year_groups
+    ]
+
+    # 价格段分布（按各段最低总价排序，全为NULL的分段排在最前，与SQL一致）
+    price = snapshot.numeric['total_price']
+    price_codes = snapshot.memo('area_stats_price_range', lambda: _price_range_codes(snapshot))
+    area_total = snapshot.count(area_mask)
+    area_prices = price[area_mask]
+    area_price_codes = price_codes[area_mask]
+    valid = ~np.isnan(area_prices)
+    minimums = np.full(len(PRICE_RANGES), np.inf)
+    np.minimum.at(minimums, area_price_codes[valid], area_prices[valid])
+    price_groups = snapshot.group_by((price_codes, PRICE_RANGES), mask=area_mask)
+    price_groups.sort(key=lambda group: (np.isfinite(minimums[PRICE_RANGES.index(group['key'])]),
+                                         minimums[PRICE_RANGES.index(group['key'])]))
+    price_distribution = [
+        {
+            'price_range': group['key'],
+            'count': group['count'],
+            'percentage': sql_round(group['count'] * 100.0 / area_total, 2),
+        }
+        for group in price_groups
+    ]
+
+    # 电梯、朝向分布
+    def distribution(column: str, limit: Optional[int] = None) -> List[Dict]:
+        groups = snapshot.group_by(_unknown_as_category(snapshot, column), mask=area_mask,
+                                   values=('total_price',))
+        return [
+            {column: group['key'], 'count': group['count'],
+             'avg_total_price': sql_round(group['avg_total_price'], 2)}
+            for group in _sorted_by_count(groups, limit)
+        ]
+
+    return {
+        'basic_stats': basic_stats,
+        'layout_distribution': layout_distribution,
+        'year_distribution': year_distribution,
+        'price_distribution': price_distribution,
+        'elevator_stats': distribution('has_elevator'),
+        'orientation_stats': distribution('orientation', 8),
+    }
+
+
+# 批量预计算的区域统计（见tools.area_stats_job）
+AREA_STATS_TABLE = 'area_stats'
+
+
+def precompute_area_statistics(areas: Optional[List[str]] = None) -> Dict:
+    """
+    批量计算区域统计并写入area_stats表（数据读取一次，各区域在内存快照上向量化计算）
+    结果与get_area_statistics的北京数据结构相同，并记录计算时的数据版本，数据变化后自动视为过期
+
+    Args:
+        areas: 需要计算的区域名称（可选），默认全部行政区和商圈，并清除表中其余旧记录
+
+    Returns:
+        {'areas': 写入数量, 'skipped': 无数据的区域数量, 'data_version': 数据版本, 'duration_ms': 耗时}
+    """
+    started = time.perf_counter()
+    snapshot = get_house_snapshot() or load_house_snapshot(get_data_version(HOUSE_TABLE))
+    if snapshot is None:
+        raise RuntimeError("无法加载房源数据")
+
+    if areas is None:
+        targets = {}
+        for area_type in ('business_area', 'region'):
+            # 行政区与商圈同名时按行政区记录
+            for name in snapshot.categorical[area_type][1]:
+                if name:
+                    targets[name] = area_type
+    else:
+        targets = {name: 'custom' for name in areas if name}
+
+    rows = []
+    skipped = 0
+    for name, area_type in targets.items():
+        statistics = _area_statistics_from_snapshot(snapshot, name)
+        if statistics is None:
+            skipped += 1
+            continue
+        rows.append((name, area_type, json.dumps(statistics, ensure_ascii=False), snapshot.version))
+
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("数据库连接失败")
+    try:
+        cursor = connection.cursor()
+        if areas is None:
+            cursor.execute(f"DELETE FROM {AREA_STATS_TABLE}")
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {AREA_STATS_TABLE} (area_name, area_type, payload, data_version, updated_at) "
+            f"VALUES (?, ?, ?, ?, datetime('now'))",
+            rows
+        )
+        connection.commit()
+        cursor.close()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return {
+        'areas': len(rows),
+        'skipped': skipped,
+        'data_version': snapshot.version,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _load_precomputed_area_statistics(area_name: str) -> Optional[Dict]:
+    """读取预计算的区域统计；没有记录、表不存在或数据版本已变化时返回None"""
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT payload, data_version FROM {AREA_STATS_TABLE} WHERE area_name = ?",
+            (area_name,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    except Exception:
+        # 尚未执行迁移v3
+        return None
+    finally:
+        connection.close()
+
+    if row is None or row['data_version'] != get_data_version(HOUSE_TABLE):
+        return None
+    # 与快照/SQL路径的结果字段一致（计算时间见area_stats.updated_at，不放入结果）
+    return json.loads(row['payload'])
+
+
 def get_area_statistics(area_name: str, city: str = None) -> Dict:
-    """获取区域统计信息，支持全国城市数据查询
+    """
+    获取区域统计信息（带缓存，按区域、城市和数据版本缓存，见services.area_stats）
+    字段见compute_area_statistics，另加本次调用的查询时间query_time（缓存的结果不含该字段）；
+    各项统计的列表/字典在调用方之间共享，只读，不要修改
+    """
+    statistics = get_cached_area_statistics(area_name, city, compute_area_statistics)
+    if not statistics.get('data_available'):
+        return statistics
+    return dict(statistics, query_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def compute_area_statistics(area_name: str, city: str = None) -> Dict:
+    """获取区域统计信息，支持全国城市数据查询（不经过缓存）
     
     Args:
         area_name: 区域名称（如：海淀、朝阳等）
@@ -613,6 +922,33 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
         - orientation_stats: 朝向分布
         - data_source: 数据来源标识
     """
+    statistics = _load_precomputed_area_statistics(str(area_name)) if area_name else None
+    if statistics is not None:
+        return {
+            'data_available': True,
+            'data_source': 'beijing',
+            'area_name': area_name,
+            'city': city or '北京',
+            **statistics
+        }
+
+    snapshot = get_house_snapshot()
+    if snapshot is not None and area_name:
+        try:
+            statistics = _area_statistics_from_snapshot(snapshot, str(area_name))
+            if statistics is not None:
+                print(f"✅ 快照统计完成，数据来源: beijing")
+                return {
+                    'data_available': True,
+                    'data_source': 'beijing',
+                    'area_name': area_name,
+                    'city': city or '北京',
+                    **statistics
+                }
+            # 北京数据为空时继续走下面的流程查询全国数据
+        except Exception as e:
+            print(f"⚠️ 快照统计失败，改为查询数据库: {e}")
+
     connection = get_db_connection()
     if not connection:
         return {
@@ -626,6 +962,10 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
         # 判断数据来源：优先查询北京数据，如果没有则查询全国数据
         data_source = 'beijing'
 
+        # 基础统计匹配区域、商圈、小区；各分布只匹配区域、商圈
+        basic_where, basic_params = location_condition(cursor, area_name, ('region', 'business_area', 'community'))
+        area_where, area_params = location_condition(cursor, area_name, ('region', 'business_area'))
+
         # 1. 基础统计
         stats_query = f"""
         SELECT 
@@ -637,14 +977,11 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             ROUND(AVG(area), 2) as avg_size,
             COUNT(DISTINCT community) as distinct_communities
         FROM beijing_house_info 
-        WHERE 
-            region LIKE '%{area_name}%' 
-            OR business_area LIKE '%{area_name}%'
-            OR community LIKE '%{area_name}%'
+        WHERE {basic_where}
         """
 
         print(f"📊 执行基础统计查询...")
-        cursor.execute(stats_query)
+        cursor.execute(stats_query, basic_params)
         stats = cursor.fetchone()
         print(f"📊 基础统计结果: {stats}")
 
@@ -680,14 +1017,13 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             ROUND(AVG(price_per_sqm), 2) as avg_unit_price,
             ROUND(AVG(area), 2) as avg_size
         FROM beijing_house_info 
-        WHERE 
-            (region LIKE '%{area_name}%' OR business_area LIKE '%{area_name}%')
+        WHERE {area_where}
         GROUP BY IFNULL(layout, '未知')
         ORDER BY count DESC
         LIMIT 10
         """
 
-        cursor.execute(layout_query)
+        cursor.execute(layout_query, area_params)
         layout_distribution = cursor.fetchall()
 
         # 3. 建设年代分布
@@ -706,9 +1042,7 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             ROUND(AVG(total_price), 2) as avg_total_price,
             ROUND(AVG(price_per_sqm), 2) as avg_unit_price
         FROM beijing_house_info 
-        WHERE 
-            region LIKE '%{area_name}%' 
-            OR business_area LIKE '%{area_name}%'
+        WHERE {area_where}
         GROUP BY build_period
         ORDER BY 
             CASE 
@@ -721,7 +1055,7 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             END
         """
 
-        cursor.execute(build_year_query)
+        cursor.execute(build_year_query, area_params)
         year_distribution = cursor.fetchall()
 
         # 4. 价格段分布
@@ -739,14 +1073,14 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             END as price_range,
             COUNT(*) as count,
             ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM beijing_house_info 
-                  WHERE region LIKE '%{area_name}%' OR business_area LIKE '%{area_name}%'), 2) as percentage
+                  WHERE {area_where}), 2) as percentage
         FROM beijing_house_info 
-        WHERE region LIKE '%{area_name}%' OR business_area LIKE '%{area_name}%'
+        WHERE {area_where}
         GROUP BY price_range
         ORDER BY MIN(total_price)
         """
 
-        cursor.execute(price_dist_query)
+        cursor.execute(price_dist_query, area_params * 2)
         price_distribution = cursor.fetchall()
 
         # 5. 电梯情况统计
@@ -756,12 +1090,12 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             COUNT(*) as count,
             ROUND(AVG(total_price), 2) as avg_total_price
         FROM beijing_house_info 
-        WHERE region LIKE '%{area_name}%' OR business_area LIKE '%{area_name}%'
+        WHERE {area_where}
         GROUP BY IFNULL(has_elevator, '未知')
         ORDER BY count DESC
         """
 
-        cursor.execute(elevator_query)
+        cursor.execute(elevator_query, area_params)
         elevator_stats = cursor.fetchall()
 
         # 6. 朝向分布
@@ -771,13 +1105,13 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             COUNT(*) as count,
             ROUND(AVG(total_price), 2) as avg_total_price
         FROM beijing_house_info 
-        WHERE region LIKE '%{area_name}%' OR business_area LIKE '%{area_name}%'
+        WHERE {area_where}
         GROUP BY IFNULL(orientation, '未知')
         ORDER BY count DESC
         LIMIT 8
         """
 
-        cursor.execute(orientation_query)
+        cursor.execute(orientation_query, area_params)
         orientation_stats = cursor.fetchall()
 
         cursor.close()
@@ -793,8 +1127,7 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
             'year_distribution': year_distribution,
             'price_distribution': price_distribution,
             'elevator_stats': elevator_stats,
-            'orientation_stats': orientation_stats,
-            'query_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'orientation_stats': orientation_stats
         }
 
         print(f"✅ 统计查询完成，数据来源: {data_source}")
@@ -815,15 +1148,44 @@ def get_area_statistics(area_name: str, city: str = None) -> Dict:
         }
 
 
+def _national_area_condition(area_name: str, city: str = None) -> Tuple[str, list]:
+    """
+    全国区域条件：名称解析可用时把区域解析为区县（城市+区县等值，多个城市的同名区县一并统计）或城市，
+    不可用时退回 LIKE '%x%'
+    """
+    resolver = load_name_resolver()
+    if resolver is None:
+        conditions, params = [], []
+        if city:
+            conditions.append("city_name LIKE ?")
+            params.append(f"%{city}%")
+        conditions.append("(district_name LIKE ? OR city_name LIKE ?)")
+        params.extend([f"%{area_name}%"] * 2)
+        return " AND ".join(conditions), params
+
+    parent = resolver.resolve_city(city) if city else None
+    if city and parent is None:
+        return "0", []
+    conditions, params = [], []
+    for district in resolver.resolve_all(area_name, 'district', parent):
+        conditions.append("(city_name = ? AND district_name = ?)")
+        params.extend([resolver.get(district['city_id'])['name'], district['name']])
+    cities = [place for place in resolver.resolve_all(area_name, 'city')
+              if parent is None or place['id'] == parent['id']]
+    if cities:
+        condition, city_params = city_condition(resolver, "city_name", "current_price", cities)
+        conditions.append(condition)
+        params.extend(city_params)
+    if not conditions:
+        return "0", []
+    return "(" + " OR ".join(conditions) + ")", params
+
+
 def _get_national_area_statistics(cursor, area_name: str, city: str = None) -> Dict:
     """查询全国数据库的区域统计信息（current_price表）"""
     try:
         # 构建查询条件
-        where_conditions = []
-        if city:
-            where_conditions.append(f"city_name LIKE '%{city}%'")
-        where_conditions.append(f"(district_name LIKE '%{area_name}%' OR city_name LIKE '%{area_name}%')")
-        where_clause = " AND ".join(where_conditions)
+        where_clause, params = _national_area_condition(area_name, city)
         
         # 基础统计
         stats_query = f"""
@@ -838,10 +1200,10 @@ def _get_national_area_statistics(cursor, area_name: str, city: str = None) -> D
         WHERE {where_clause}
         """
         
-        cursor.execute(stats_query)
+        cursor.execute(stats_query, params)
         stats = cursor.fetchone()
         
-        if not stats or stats.get('total_listings', 0) == 0:
+        if not stats or not stats.get('total_listings'):
             return {'data_available': False}
         
         # 价格分布
@@ -857,7 +1219,7 @@ def _get_national_area_statistics(cursor, area_name: str, city: str = None) -> D
         LIMIT 20
         """
         
-        cursor.execute(price_dist_query)
+        cursor.execute(price_dist_query, params)
         price_distribution = cursor.fetchall()
         
         return {
@@ -873,8 +1235,7 @@ def _get_national_area_statistics(cursor, area_name: str, city: str = None) -> D
                 'total_cities': int(stats['total_cities'] or 0),
                 'total_districts': int(stats['total_districts'] or 0)
             },
-            'price_distribution': price_distribution,
-            'query_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'price_distribution': price_distribution
         }
         
     except Exception as e:
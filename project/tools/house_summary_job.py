@@ -0,0 +1,77 @@
+"""
+房源汇总表校验与重建
+house_summary由触发器增量维护（迁移v7），这里提供与全表重新计算结果的对比和全量重建：
+
+    cd project
+    python -m tools.house_summary_job verify     # 校验汇总表，不一致时退出码为1
+    python -m tools.house_summary_job rebuild    # 按全表重新生成汇总
+"""
+import sys
+import os
+
+# 支持在project目录下以脚本方式运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+from typing import Dict, List, Optional
+
+from utils.database import get_db_connection
+from utils.house_summary import has_house_summary, rebuild_house_summary, verify_house_summary
+
+
+def run_verify() -> Optional[List[Dict]]:
+    """校验汇总表，返回不一致的条目；汇总表不可用时返回None"""
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        if not has_house_summary(cursor):
+            print("[ERROR] 汇总表或触发器不存在，请先执行数据库迁移（python -m utils.migrations）")
+            return None
+        started = time.perf_counter()
+        mismatches = verify_house_summary(cursor)
+        cursor.close()
+    finally:
+        connection.close()
+
+    duration = round((time.perf_counter() - started) * 1000, 1)
+    if not mismatches:
+        print(f"[SUCCESS] 汇总表与全表计算结果一致，用时 {duration}ms")
+    else:
+        print(f"[ERROR] 汇总表有 {len(mismatches)} 处不一致（用时 {duration}ms）:")
+        for item in mismatches:
+            print(f"  {item['dimension']}/{item['value']} {item['field']}: "
+                  f"汇总 {item['summary']}，全表 {item['expected']}")
+    return mismatches
+
+
+def run_rebuild() -> Optional[int]:
+    """按全表重新生成汇总，返回汇总行数"""
+    connection = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        if not has_house_summary(cursor):
+            print("[ERROR] 汇总表或触发器不存在，请先执行数据库迁移（python -m utils.migrations）")
+            return None
+        started = time.perf_counter()
+        rows = rebuild_house_summary(cursor)
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+    print(f"[SUCCESS] 汇总表已重建: {rows} 个取值，用时 {round((time.perf_counter() - started) * 1000, 1)}ms")
+    return rows
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args == ['verify']:
+        sys.exit(0 if run_verify() == [] else 1)
+    elif args == ['rebuild']:
+        sys.exit(0 if run_rebuild() is not None else 1)
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -1,13 +1,15 @@
 """
 工具函数模块
 """
-from .database import get_db_connection, init_db_pool, close_db_pool
+from .database import get_db_connection, init_db_pool, close_db_pool, get_data_version, get_data_modified_time
 from .auth import require_auth
 
 __all__ = [
     'get_db_connection',
     'init_db_pool', 
     'close_db_pool',
+    'get_data_version',
+    'get_data_modified_time',
     'require_auth'
 ]
 
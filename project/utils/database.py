@@ -1,70 +1,479 @@
 """
 数据库连接池管理模块
 提供数据库连接的创建、复用和管理
-支持SQLite和MySQL数据库
+基于SQLite实现线程安全连接池，并支持绑定Flask请求上下文
 """
 import sqlite3
 import os
+import queue
+import threading
+import time
 import traceback
+from datetime import datetime, timezone
+
+from config import CONFIG
+from utils.sql_trace import tracer, TracedCursor
 
 # 数据库配置
 _CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 _PROJECT_DIR = os.path.dirname(_CURRENT_DIR)
+_ROOT_DIR = os.path.dirname(_PROJECT_DIR)
+
+
+def _resolve_db_path(path: str) -> str:
+    """解析数据库路径：相对路径以仓库根目录为基准（与.env.example保持一致）"""
+    if not path:
+        return os.path.join(_PROJECT_DIR, 'house_data.sqlite')
+    if os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(_ROOT_DIR, path))
+
 
 # 使用SQLite本地数据库
 DB_TYPE = 'sqlite'
 DB_CONFIG = {
-    'database': os.path.join(_PROJECT_DIR, 'house_data.sqlite')
+    'database': _resolve_db_path(CONFIG['database']['path']),
+    'pool_size': CONFIG['database']['pool_size'],
+    'pool_timeout': CONFIG['database']['pool_timeout'],
+    'busy_timeout_ms': CONFIG['database']['busy_timeout_ms'],
+    'journal_mode': CONFIG['database']['journal_mode'],
+    'mmap_size': CONFIG['database']['mmap_size'],
+    'cache_size_kb': CONFIG['database']['cache_size_kb'],
 }
 
 
-def init_db_pool():
+class Row(sqlite3.Row):
+    """
+    兼容字典访问习惯的行对象
+    在sqlite3.Row（支持下标/列名访问）基础上补充get()，
+    兼容原MySQL DictCursor时期遗留的 row.get('field') 写法
+    """
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except (IndexError, KeyError):
+            return default
+
+
+class PooledConnection:
+    """
+    连接池中借出的连接代理
+    - close() 将连接归还连接池而非真正关闭
+    - 支持 with 语法：正常退出提交，异常退出回滚，最后归还连接
+    - 未归还即被回收的连接会被连接池记为泄漏并自动收回
+    """
+
+    __slots__ = ('_pool', '_conn', '_released', '_request_bound', '__weakref__')
+
+    def __init__(self, pool: 'SQLiteConnectionPool', conn: sqlite3.Connection, request_bound: bool = False):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+        self._request_bound = request_bound
+
+    def __getattr__(self, name):
+        if name in PooledConnection.__slots__:
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if tracer.enabled:
+            return TracedCursor(cursor, tracer, self._conn)
+        return cursor
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def close(self):
+        """归还连接（请求绑定的连接由请求结束时统一归还）"""
+        if self._request_bound:
+            return
+        self._release()
+
+    def _release(self, leaked: bool = False):
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._conn, leaked=leaked)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self._released:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        self.close()
+        return False
+
+    def __del__(self):
+        # 异常路径中未调用close()的连接：回收并计入泄漏统计
+        if not getattr(self, '_released', True):
+            try:
+                self._release(leaked=True)
+            except Exception:
+                pass
+
+
+class SQLiteConnectionPool:
+    """
+    SQLite连接池
+    - 连接按需创建，上限为pool_size，空闲连接以LIFO方式复用（保持页缓存热度）
+    - 每个连接统一设置WAL、mmap、cache_size、temp_store和busy_timeout
+    - 记录借出次数、等待时间、超时与泄漏等统计信息
+    """
+
+    def __init__(self, database: str, pool_size: int = 8, timeout: float = 10.0,
+                 busy_timeout_ms: int = 5000, journal_mode: str = 'WAL',
+                 mmap_size: int = 268435456, cache_size_kb: int = 65536):
+        self.database = database
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.journal_mode = journal_mode
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+
+        self._idle = queue.LifoQueue(maxsize=self.pool_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            'connections_created': 0,
+            'checkouts': 0,
+            'releases': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+            'timeouts': 0,
+            'leaks_detected': 0,
+            'rollbacks_on_release': 0,
+        }
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建新连接并应用性能相关的PRAGMA"""
+        connection = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False
+        )
+        connection.row_factory = Row
+        cursor = connection.cursor()
+        if self.journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        # cache_size为负数时单位为KiB
+        cursor.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+        if tracer.enabled:
+            connection.set_trace_callback(tracer.trace_callback)
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        借出一个原始连接
+        空闲队列为空且未达上限时新建连接，否则最多等待timeout秒
+        """
+        if self._closed:
+            raise RuntimeError("连接池已关闭")
+
+        start = time.perf_counter()
+        connection = None
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            create = False
+            with self._lock:
+                if self._created < self.pool_size:
+                    self._created += 1
+                    create = True
+            if create:
+                try:
+                    connection = self._create_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                with self._lock:
+                    self._stats['connections_created'] += 1
+            else:
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise TimeoutError(f"等待数据库连接超时（{self.timeout}s）")
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total_ms'] += wait_ms
+            if wait_ms > self._stats['wait_time_max_ms']:
+                self._stats['wait_time_max_ms'] = wait_ms
+        return connection
+
+    def release(self, connection: sqlite3.Connection, leaked: bool = False):
+        """归还连接，未提交的事务会被回滚"""
+        rolled_back = False
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+                rolled_back = True
+        except sqlite3.Error:
+            # 连接已损坏，丢弃并允许重建
+            self._discard(connection)
+            return
+
+        with self._lock:
+            self._stats['releases'] += 1
+            if leaked:
+                self._stats['leaks_detected'] += 1
+            if rolled_back:
+                self._stats['rollbacks_on_release'] += 1
+
+        if self._closed:
+            self._discard(connection)
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            self._discard(connection)
+
+    def _discard(self, connection: sqlite3.Connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created = max(0, self._created - 1)
+
+    def close_all(self):
+        """关闭所有空闲连接，后续借出请求将被拒绝"""
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def stats(self) -> dict:
+        """连接池统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            created = self._created
+        idle = self._idle.qsize()
+        checkouts = stats['checkouts']
+        stats.update({
+            'pool_size': self.pool_size,
+            'open_connections': created,
+            'idle_connections': idle,
+            'in_use_connections': max(0, created - idle),
+            'wait_time_avg_ms': round(stats['wait_time_total_ms'] / checkouts, 4) if checkouts else 0.0,
+            'wait_time_total_ms': round(stats['wait_time_total_ms'], 3),
+            'wait_time_max_ms': round(stats['wait_time_max_ms'], 3),
+        })
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> SQLiteConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SQLiteConnectionPool(
+                    DB_CONFIG['database'],
+                    pool_size=DB_CONFIG['pool_size'],
+                    timeout=DB_CONFIG['pool_timeout'],
+                    busy_timeout_ms=DB_CONFIG['busy_timeout_ms'],
+                    journal_mode=DB_CONFIG['journal_mode'],
+                    mmap_size=DB_CONFIG['mmap_size'],
+                    cache_size_kb=DB_CONFIG['cache_size_kb'],
+                )
+    return _pool
+
+
+def init_db_pool(app=None):
     """
     初始化数据库连接池
-    SQLite不需要连接池，此函数保留用于兼容性
+    传入Flask应用时注册请求结束回调，自动归还请求内借出的连接
     """
     db_path = DB_CONFIG['database']
     if os.path.exists(db_path):
         print(f"[SUCCESS] SQLite database found: {db_path}")
     else:
         print(f"[WARNING] SQLite database not found: {db_path}")
-    return
+
+    pool = _get_pool()
+    print(f"[INFO] SQLite connection pool ready (size={pool.pool_size}, journal_mode={pool.journal_mode})")
+
+    if app is not None:
+        app.teardown_appcontext(_release_request_connection)
 
 
 def get_db_connection():
     """
     获取数据库连接
-    
-    Returns:
-        connection: sqlite3连接对象
-    """
-    return _get_direct_connection()
 
+    在Flask请求上下文中返回与本次请求绑定的连接（同一请求内复用，
+    close()为空操作，请求结束时统一归还）；在后台线程或脚本中
+    返回独立借出的连接，调用close()即归还连接池。
 
-def _get_direct_connection():
-    """
-    直接创建SQLite数据库连接
-    
     Returns:
-        connection: sqlite3连接对象或None
+        connection: 连接代理对象，失败时返回None
     """
+    if not os.path.exists(DB_CONFIG['database']):
+        print(f"[ERROR] Database file not found: {DB_CONFIG['database']}")
+        return None
+
     try:
-        db_path = DB_CONFIG['database']
-        if not os.path.exists(db_path):
-            print(f"[ERROR] Database file not found: {db_path}")
-            return None
-        
-        connection = sqlite3.connect(db_path)
-        connection.row_factory = sqlite3.Row
-        return connection
+        if _has_app_context():
+            from flask import g
+            connection = g.get('_db_connection')
+            if connection is None:
+                connection = PooledConnection(_get_pool(), _get_pool().acquire(), request_bound=True)
+                g._db_connection = connection
+            return connection
+
+        return PooledConnection(_get_pool(), _get_pool().acquire())
     except Exception as e:
         print(f"[ERROR] Database connection failed: {e}")
         return None
 
 
+def _has_app_context() -> bool:
+    try:
+        from flask import has_app_context
+    except ImportError:
+        return False
+    return has_app_context()
+
+
+def _release_request_connection(exception=None):
+    """请求结束时归还绑定的连接；仍有未提交事务视为泄漏"""
+    from flask import g
+    connection = g.pop('_db_connection', None)
+    if connection is None:
+        return
+    leaked = False
+    try:
+        leaked = connection.in_transaction
+    except sqlite3.Error:
+        traceback.print_exc()
+    connection._release(leaked=leaked)
+
+
+_version_lock = threading.Lock()
+_version_state = {'token': None, 'versions': None, 'updated': None, 'mtime': None}
+
+
+def _file_token(path: str) -> str:
+    """数据库文件（含WAL文件）的inode、修改时间和大小，任何写入都会改变该值"""
+    parts = []
+    for file_path in (path, path + '-wal'):
+        try:
+            st = os.stat(file_path)
+            parts.append(f"{st.st_ino}.{st.st_mtime_ns}.{st.st_size}")
+        except OSError:
+            parts.append('-')
+    return '/'.join(parts)
+
+
+def _read_table_versions():
+    """读取data_versions表，返回(版本号, 更新时间)；表不存在（迁移未执行）时返回(None, None)"""
+    connection = get_db_connection()
+    if not connection:
+        return None, None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT table_name, version, updated_at FROM data_versions")
+        rows = cursor.fetchall()
+        cursor.close()
+        return {row[0]: row[1] for row in rows}, {row[0]: row[2] for row in rows}
+    except sqlite3.Error:
+        return None, None
+    finally:
+        connection.close()
+
+
+def _refresh_version_state(db_path: str) -> dict:
+    token = _file_token(db_path)
+    state = _version_state
+    if token != state['token']:
+        versions, updated = _read_table_versions()
+        with _version_lock:
+            state['token'] = token
+            state['versions'] = versions
+            state['updated'] = updated
+            state['mtime'] = max(os.path.getmtime(path) for path in (db_path, db_path + '-wal')
+                                 if os.path.exists(path))
+    return state
+
+
+def get_data_version(*tables: str):
+    """
+    获取数据版本号，数据变化时版本号随之改变，供内存快照、缓存等判断是否失效
+
+    文件未变化时只做一次stat；文件变化后读取data_versions表中由触发器维护的
+    各表版本号，因此写入其他表（如报告、反馈）不会使指定表的版本失效。
+    data_versions表不存在时退化为文件级版本号。
+
+    Args:
+        tables: 关注的表名，为空时返回整个数据库的版本
+    Returns:
+        版本号字符串，数据库文件不存在时返回None
+    """
+    db_path = DB_CONFIG['database']
+    if not os.path.exists(db_path):
+        return None
+
+    state = _refresh_version_state(db_path)
+    token = state['token']
+    versions = state['versions']
+
+    if versions is None or not tables:
+        return token
+    inode = token.split('.', 1)[0]
+    return inode + ':' + ','.join(f"{table}={versions.get(table, token)}" for table in tables)
+
+
+def get_data_modified_time(*tables: str):
+    """
+    获取数据最后修改时间（datetime，UTC）
+    取data_versions中各表的更新时间，不可用时使用数据库文件的修改时间
+    """
+    db_path = DB_CONFIG['database']
+    if not os.path.exists(db_path):
+        return None
+
+    state = _refresh_version_state(db_path)
+    updated = state['updated'] or {}
+    stamps = [updated.get(table) for table in tables] if tables else list(updated.values())
+    if stamps and all(stamps):
+        # datetime('now')为UTC时间
+        return datetime.strptime(max(stamps), '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(state['mtime'], tz=timezone.utc)
+
+
+def get_pool_stats() -> dict:
+    """获取连接池统计信息"""
+    return _get_pool().stats()
+
+
 def close_db_pool():
     """
     关闭数据库连接池
-    SQLite不需要连接池管理，此函数保留用于兼容性
     """
-    print("[INFO] SQLite connections are closed automatically")
+    if _pool is not None:
+        _pool.close_all()
+    print("[INFO] SQLite connection pool closed")
@@ -0,0 +1,97 @@
+"""
+房源类型化派生字段
+爬虫数据中的户型、楼层、单价、年代为文本（如 "3室1厅1卫"、"高层(共28层)"、"69742元/㎡"），
+迁移v6把它们解析为beijing_house_info上的生成列（VIRTUAL，写入时由索引保存计算结果），
+户型/楼层筛选与分组可以直接走索引，不再逐行做字符串匹配。原文本字段保持不变。
+"""
+import re
+from typing import Optional
+
+HOUSE_TABLE = 'beijing_house_info'
+
+# 楼层分类：数值楼层按 1-6 / 7-15 / 16+ 划分（floor为TEXT字段，入库的数值楼层多为文本 '5'、'12'，
+# 同样按数值归类），文本楼层（低层/中层/高层(共N层)）按描述归类，其余有楼层信息但无法归类的记为未知
+FLOOR_LEVELS = ('低楼层', '中楼层', '高楼层', '未知楼层')
+
+# (字段, 类型, 计算表达式)
+HOUSE_TYPED_COLUMNS = [
+    ('rooms', 'INTEGER', """CASE
+        WHEN layout GLOB '[0-9]室*' THEN CAST(substr(layout, 1, 1) AS INTEGER)
+        WHEN layout GLOB '[0-9][0-9]室*' THEN CAST(substr(layout, 1, 2) AS INTEGER)
+    END"""),
+    ('halls', 'INTEGER', """CASE
+        WHEN layout GLOB '*室[0-9]厅*' OR layout GLOB '*室[0-9][0-9]厅*'
+        THEN CAST(substr(layout, instr(layout, '室') + 1) AS INTEGER)
+    END"""),
+    ('baths', 'INTEGER', """CASE
+        WHEN layout GLOB '*[室厅][0-9]卫*' OR layout GLOB '*[室厅][0-9][0-9]卫*'
+        THEN CAST(substr(layout, max(instr(layout, '室'), instr(layout, '厅')) + 1) AS INTEGER)
+    END"""),
+    ('floor_level_category', 'TEXT', """CASE
+        WHEN floor IS NULL THEN NULL
+        WHEN typeof(floor) IN ('integer', 'real') THEN CASE
+            WHEN floor BETWEEN 1 AND 6 THEN '低楼层'
+            WHEN floor BETWEEN 7 AND 15 THEN '中楼层'
+            WHEN floor >= 16 THEN '高楼层'
+            ELSE '未知楼层'
+        END
+        WHEN floor GLOB '[0-9]*' THEN CASE
+            WHEN CAST(floor AS INTEGER) BETWEEN 1 AND 6 THEN '低楼层'
+            WHEN CAST(floor AS INTEGER) BETWEEN 7 AND 15 THEN '中楼层'
+            WHEN CAST(floor AS INTEGER) >= 16 THEN '高楼层'
+            ELSE '未知楼层'
+        END
+        WHEN floor GLOB '低*' OR floor GLOB '底*' THEN '低楼层'
+        WHEN floor GLOB '中*' THEN '中楼层'
+        WHEN floor GLOB '高*' OR floor GLOB '顶*' THEN '高楼层'
+        ELSE '未知楼层'
+    END"""),
+    ('total_floors', 'INTEGER', """CASE
+        WHEN floor GLOB '*共[0-9]*层*' THEN CAST(substr(floor, instr(floor, '共') + 1) AS INTEGER)
+    END"""),
+    ('unit_price_int', 'INTEGER', """CASE
+        WHEN typeof(price_per_sqm) IN ('integer', 'real') THEN CAST(price_per_sqm AS INTEGER)
+        WHEN price_per_sqm GLOB '[0-9]*' THEN CAST(price_per_sqm AS INTEGER)
+    END"""),
+    ('build_year_int', 'INTEGER', """CASE
+        WHEN typeof(build_year) IN ('integer', 'real') THEN CAST(build_year AS INTEGER)
+        WHEN build_year GLOB '[12][0-9][0-9][0-9]*' THEN CAST(substr(build_year, 1, 4) AS INTEGER)
+    END"""),
+]
+
+# 派生字段依赖的原始字段
+HOUSE_TYPED_SOURCE_COLUMNS = ('layout', 'floor', 'price_per_sqm', 'build_year')
+
+# 派生字段上的索引：户型筛选/户型分析（覆盖）、楼层分析（覆盖）、楼层/单价/年代范围筛选
+HOUSE_TYPED_INDEXES = [
+    ('idx_bhi_rooms_price', HOUSE_TABLE, ('rooms', 'total_price', 'price_per_sqm')),
+    ('idx_bhi_floor_level_unit_price', HOUSE_TABLE, ('floor_level_category', 'price_per_sqm')),
+    ('idx_bhi_total_floors', HOUSE_TABLE, ('total_floors',)),
+    ('idx_bhi_unit_price_int', HOUSE_TABLE, ('unit_price_int',)),
+    ('idx_bhi_build_year_int', HOUSE_TABLE, ('build_year_int',)),
+]
+
+# 需求中的楼层偏好 -> 楼层分类
+FLOOR_PREFERENCES = {'低层': '低楼层', '中层': '中楼层', '高层': '高楼层'}
+
+_LAYOUT_ROOMS = re.compile(r'^\s*(\d{1,2})\s*室\s*$')
+_typed_columns_ready = False
+
+
+def layout_rooms(layout: Optional[str]) -> Optional[int]:
+    """户型筛选条件只指定了居室数（如 "2室"）时返回居室数，可改用rooms字段精确匹配；否则返回None"""
+    if not layout:
+        return None
+    match = _LAYOUT_ROOMS.match(layout)
+    return int(match.group(1)) if match else None
+
+
+def has_typed_house_columns(cursor) -> bool:
+    """派生字段是否可用（迁移v6已执行；SQLite低于3.31不支持生成列时查询继续使用原字段）"""
+    global _typed_columns_ready
+    if not _typed_columns_ready:
+        # 生成列不出现在 table_info 中，需要用 table_xinfo
+        cursor.execute(f"PRAGMA table_xinfo({HOUSE_TABLE})")
+        existing = {row[1] for row in cursor.fetchall()}
+        _typed_columns_ready = all(name in existing for name, _, _ in HOUSE_TYPED_COLUMNS)
+    return _typed_columns_ready
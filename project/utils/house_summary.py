@@ -0,0 +1,271 @@
+"""
+房源汇总表（增量维护）
+北京概览、区域排名/房价、楼层/户型/朝向/电梯分析原先每次请求都对beijing_house_info做全表GROUP BY。
+house_summary 按维度保存每个取值的房源数，以及单价、总价的 计数/和/平方和/最小值/最大值，
+由beijing_house_info上的触发器在增删改时增量更新（迁移v7），接口读取汇总行即可，代价与房源数无关：
+- 计数、和、平方和按差值更新；删除（或修改）的房源恰好是最小/最大值时，重新查询该取值的最小/最大值
+- 单价/总价只统计数值类型（与内存快照一致），取值为NULL的房源不计入该维度
+校验与重建见 tools.house_summary_job：
+
+    cd project
+    python -m tools.house_summary_job verify     # 与全表重新计算的结果对比
+    python -m tools.house_summary_job rebuild    # 按全表重新生成汇总
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+from utils.house_columns import HOUSE_TABLE, has_typed_house_columns
+
+SUMMARY_TABLE = 'house_summary'
+# 汇总的度量：(前缀, 原字段)
+SUMMARY_MEASURES = (('price', 'price_per_sqm'), ('total', 'total_price'))
+SUMMARY_AGGREGATES = ('count', 'sum', 'sumsq', 'min', 'max')
+# 触发器依赖的原字段（修改这些字段时更新汇总）
+SUMMARY_SOURCE_COLUMNS = ('region', 'layout', 'floor', 'orientation', 'has_elevator',
+                          'price_per_sqm', 'total_price')
+SUMMARY_TRIGGERS = {event: f'trg_{HOUSE_TABLE}_{event.lower()}_summary' for event in ('INSERT', 'DELETE', 'UPDATE')}
+
+
+def summary_dimensions(typed: bool) -> List[Tuple[str, str]]:
+    """
+    各维度的取值表达式，{t}为行引用（触发器中为NEW/OLD，全表计算时为表名）
+    户型/楼层归类与analysis_layout、analysis_floor一致：派生字段可用（迁移v6）时按派生字段，
+    否则按原字段；楼层取值为FLOOR_LEVELS中的名称
+    """
+    if typed:
+        layout = """CASE
+            WHEN {t}.layout IS NULL THEN NULL
+            WHEN {t}.rooms IN (1, 2, 3) THEN {t}.rooms || '室'
+            WHEN {t}.rooms BETWEEN 4 AND 6 THEN '4室+'
+            ELSE '未知'
+        END"""
+        floor = "{t}.floor_level_category"
+    else:
+        layout = """CASE
+            WHEN {t}.layout IS NULL THEN NULL
+            WHEN {t}.layout LIKE '1室%' THEN '1室'
+            WHEN {t}.layout LIKE '2室%' THEN '2室'
+            WHEN {t}.layout LIKE '3室%' THEN '3室'
+            WHEN {t}.layout LIKE '4室%' OR {t}.layout LIKE '5室%' OR {t}.layout LIKE '6室%' THEN '4室+'
+            ELSE '未知'
+        END"""
+        floor = """CASE
+            WHEN {t}.floor IS NULL THEN NULL
+            WHEN {t}.floor BETWEEN 1 AND 6 THEN '低楼层'
+            WHEN {t}.floor BETWEEN 7 AND 15 THEN '中楼层'
+            WHEN {t}.floor >= 16 THEN '高楼层'
+            ELSE '未知楼层'
+        END"""
+    return [
+        ('all', "''"),
+        ('region', "{t}.region"),
+        ('layout', layout),
+        ('floor', floor),
+        ('orientation', "{t}.orientation"),
+        ('elevator', "IFNULL({t}.has_elevator, '未知')"),
+    ]
+
+
+def _numeric(row: str, column: str) -> str:
+    """只保留数值类型（NULL、文本记为NULL）"""
+    return f"(CASE WHEN typeof({row}.{column}) IN ('integer', 'real') THEN {row}.{column} END)"
+
+
+def summary_columns() -> List[str]:
+    return ['row_count'] + [f"{prefix}_{aggregate}" for prefix, _ in SUMMARY_MEASURES
+                            for aggregate in SUMMARY_AGGREGATES]
+
+
+def create_summary_table(cursor):
+    measures = "".join(
+        f"""
+            {prefix}_count INTEGER NOT NULL DEFAULT 0,
+            {prefix}_sum REAL NOT NULL DEFAULT 0,
+            {prefix}_sumsq REAL NOT NULL DEFAULT 0,
+            {prefix}_min REAL,
+            {prefix}_max REAL,"""
+        for prefix, _ in SUMMARY_MEASURES
+    )
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,{measures}
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """)
+
+
+# ==================== 触发器 ====================
+
+def _add_statement(dimension: str, expression: str) -> str:
+    """NEW行计入汇总（取值不存在时插入新行）"""
+    measures = ", ".join(f"{_numeric('NEW', column)} AS {prefix}" for prefix, column in SUMMARY_MEASURES)
+    values = ", ".join(
+        f"{prefix} IS NOT NULL, IFNULL({prefix}, 0), IFNULL({prefix} * {prefix}, 0), {prefix}, {prefix}"
+        for prefix, _ in SUMMARY_MEASURES
+    )
+    updates = ",".join(
+        f"""
+                {prefix}_count = {prefix}_count + excluded.{prefix}_count,
+                {prefix}_sum = {prefix}_sum + excluded.{prefix}_sum,
+                {prefix}_sumsq = {prefix}_sumsq + excluded.{prefix}_sumsq,
+                {prefix}_min = CASE WHEN {prefix}_min IS NULL OR excluded.{prefix}_min < {prefix}_min
+                               THEN excluded.{prefix}_min ELSE {prefix}_min END,
+                {prefix}_max = CASE WHEN {prefix}_max IS NULL OR excluded.{prefix}_max > {prefix}_max
+                               THEN excluded.{prefix}_max ELSE {prefix}_max END"""
+        for prefix, _ in SUMMARY_MEASURES
+    )
+    return f"""
+            INSERT INTO {SUMMARY_TABLE} (dimension, value, {', '.join(summary_columns())})
+            SELECT '{dimension}', value, 1, {values}
+            FROM (SELECT {expression.format(t='NEW')} AS value, {measures})
+            WHERE value IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET
+                row_count = row_count + 1,{updates};"""
+
+
+def _remove_statements(dimension: str, expression: str) -> str:
+    """OLD行移出汇总：被移出的是最小/最大值时按剩余房源重新查询，房源数为0的取值删除"""
+    value = expression.format(t='OLD')
+    condition = f"{expression.format(t=HOUSE_TABLE)} = {value}"
+
+    def remaining(aggregate: str, column: str) -> str:
+        # AFTER触发器中该房源已删除（修改时已是新值，随后由_add_statement重新计入，不影响最小/最大值）
+        return f"(SELECT {aggregate}({_numeric(HOUSE_TABLE, column)}) FROM {HOUSE_TABLE} WHERE {condition})"
+
+    updates = ",".join(
+        f"""
+                {prefix}_count = {prefix}_count - ({_numeric('OLD', column)} IS NOT NULL),
+                {prefix}_sum = {prefix}_sum - IFNULL({_numeric('OLD', column)}, 0),
+                {prefix}_sumsq = {prefix}_sumsq - IFNULL({_numeric('OLD', column)} * {_numeric('OLD', column)}, 0),
+                {prefix}_min = CASE WHEN {_numeric('OLD', column)} <= {prefix}_min
+                               THEN {remaining('MIN', column)} ELSE {prefix}_min END,
+                {prefix}_max = CASE WHEN {_numeric('OLD', column)} >= {prefix}_max
+                               THEN {remaining('MAX', column)} ELSE {prefix}_max END"""
+        for prefix, column in SUMMARY_MEASURES
+    )
+    return f"""
+            UPDATE {SUMMARY_TABLE} SET
+                row_count = row_count - 1,{updates}
+            WHERE dimension = '{dimension}' AND value = {value};
+            DELETE FROM {SUMMARY_TABLE}
+            WHERE dimension = '{dimension}' AND value = {value} AND row_count <= 0;"""
+
+
+def install_summary_triggers(cursor, typed: bool):
+    """安装（或按当前字段重新安装）维护汇总表的触发器"""
+    dimensions = summary_dimensions(typed)
+    add = "".join(_add_statement(dimension, expression) for dimension, expression in dimensions)
+    remove = "".join(_remove_statements(dimension, expression) for dimension, expression in dimensions)
+    bodies = {
+        'INSERT': f"AFTER INSERT ON {HOUSE_TABLE}",
+        'DELETE': f"AFTER DELETE ON {HOUSE_TABLE}",
+        'UPDATE': f"AFTER UPDATE OF {', '.join(SUMMARY_SOURCE_COLUMNS)} ON {HOUSE_TABLE}",
+    }
+    statements = {'INSERT': add, 'DELETE': remove, 'UPDATE': remove + add}
+    for event, name in SUMMARY_TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"""
+            CREATE TRIGGER {name}
+            {bodies[event]}
+            BEGIN{statements[event]}
+            END
+        """)
+
+
+# ==================== 全表计算 / 校验 ====================
+
+def _recompute_query(typed: bool) -> str:
+    """按全表计算各维度汇总的查询（结果字段同house_summary）"""
+    selects = []
+    measures = ", ".join(f"{_numeric(HOUSE_TABLE, column)} AS {prefix}" for prefix, column in SUMMARY_MEASURES)
+    aggregates = ", ".join(
+        f"COUNT({prefix}), IFNULL(SUM({prefix}), 0), IFNULL(SUM({prefix} * {prefix}), 0), MIN({prefix}), MAX({prefix})"
+        for prefix, _ in SUMMARY_MEASURES
+    )
+    for dimension, expression in summary_dimensions(typed):
+        selects.append(f"""
+            SELECT '{dimension}' AS dimension, value, COUNT(*), {aggregates}
+            FROM (SELECT {expression.format(t=HOUSE_TABLE)} AS value, {measures} FROM {HOUSE_TABLE})
+            WHERE value IS NOT NULL
+            GROUP BY value""")
+    return " UNION ALL ".join(selects)
+
+
+def rebuild_house_summary(cursor) -> int:
+    """按全表重新生成汇总，返回汇总行数"""
+    cursor.execute(f"DELETE FROM {SUMMARY_TABLE}")
+    cursor.execute(f"""
+        INSERT INTO {SUMMARY_TABLE} (dimension, value, {', '.join(summary_columns())})
+        {_recompute_query(has_typed_house_columns(cursor))}
+    """)
+    cursor.execute(f"SELECT COUNT(*) FROM {SUMMARY_TABLE}")
+    return cursor.fetchone()[0]
+
+
+def _same(left, right) -> bool:
+    if left is None or right is None:
+        return left is None and right is None
+    # 和与平方和按增量累加，与一次性求和的浮点误差在相对1e-9以内
+    return math.isclose(float(left), float(right), rel_tol=1e-9, abs_tol=1e-6)
+
+
+def verify_house_summary(cursor) -> List[Dict]:
+    """
+    对比汇总表与全表重新计算的结果
+    :return: 不一致的条目 [{dimension, value, field, summary, expected}]，一致时为空列表
+    """
+    columns = summary_columns()
+    cursor.execute(f"SELECT dimension, value, {', '.join(columns)} FROM {SUMMARY_TABLE}")
+    stored = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+    cursor.execute(_recompute_query(has_typed_house_columns(cursor)))
+    expected = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+
+    mismatches = []
+    empty = (None,) * len(columns)
+    for key in sorted(set(stored) | set(expected)):
+        left, right = stored.get(key, empty), expected.get(key, empty)
+        for field, a, b in zip(columns, left, right):
+            if not _same(a, b):
+                mismatches.append({'dimension': key[0], 'value': key[1], 'field': field,
+                                   'summary': a, 'expected': b})
+    return mismatches
+
+
+# ==================== 读取 ====================
+
+def has_house_summary(cursor) -> bool:
+    """汇总表及其触发器是否存在（触发器缺失时汇总不再可信）"""
+    names = [SUMMARY_TABLE] + list(SUMMARY_TRIGGERS.values())
+    cursor.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join('?' * len(names))})", names
+    )
+    return cursor.fetchone()[0] == len(names)
+
+
+def load_house_summary(cursor) -> Optional[Dict[str, List[Dict]]]:
+    """
+    读取全部汇总：{维度: [{key, count, avg_price_per_sqm, avg_total_price, ...}]}
+    字段与HouseSnapshot.group_by的结果一致，可共用格式化逻辑；汇总不可用时返回None
+    """
+    if not has_house_summary(cursor):
+        return None
+    columns = summary_columns()
+    cursor.execute(f"SELECT dimension, value, {', '.join(columns)} FROM {SUMMARY_TABLE}")
+    summary: Dict[str, List[Dict]] = {}
+    for row in cursor.fetchall():
+        values = dict(zip(columns, row[2:]))
+        group = {'key': row[1], 'count': values['row_count']}
+        for prefix, column in SUMMARY_MEASURES:
+            count = values[f'{prefix}_count']
+            group[f'avg_{column}'] = values[f'{prefix}_sum'] / count if count else None
+            group[f'min_{column}'] = values[f'{prefix}_min']
+            group[f'max_{column}'] = values[f'{prefix}_max']
+            if count:
+                mean = values[f'{prefix}_sum'] / count
+                group[f'std_{column}'] = math.sqrt(max(values[f'{prefix}_sumsq'] / count - mean * mean, 0.0))
+            else:
+                group[f'std_{column}'] = None
+        summary.setdefault(row[0], []).append(group)
+    return summary
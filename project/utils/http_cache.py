@@ -0,0 +1,83 @@
+"""
+HTTP条件请求（ETag / Last-Modified / 304）
+为只读分析接口的蓝图注册请求钩子：
+- ETag由依赖表的数据版本 + 请求路径 + 规范化后的查询参数生成（强校验）
+- 请求携带的 If-None-Match / If-Modified-Since 与当前数据一致时直接返回304，不再调用服务函数
+- 成功响应附带 ETag、Last-Modified 和 Cache-Control
+"""
+import hashlib
+from typing import Optional, Sequence
+
+from flask import Blueprint, Response, g, request
+
+from config import CONFIG
+from utils.database import get_data_version, get_data_modified_time
+
+
+def _compute_etag(tables: Sequence[str]) -> Optional[str]:
+    version = get_data_version(*tables)
+    if version is None:
+        return None
+    args = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    digest = hashlib.sha1(f"{version}|{request.path}|{args}".encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def _cache_control() -> str:
+    return f"public, max-age={CONFIG['http_cache']['max_age']}, must-revalidate"
+
+
+def _is_success_body(response: Response) -> bool:
+    """响应体中的业务状态码为200才允许客户端缓存"""
+    if response.status_code != 200 or response.mimetype != 'application/json' or response.direct_passthrough:
+        return False
+    head = response.get_data()[:32]
+    return b'"code":200' in head or b'"code": 200' in head
+
+
+def register_conditional_get(blueprint: Blueprint, tables: Sequence[str]):
+    """
+    为蓝图的GET接口启用条件请求
+    :param blueprint: 只读数据接口所在的蓝图
+    :param tables: 接口数据依赖的表，数据版本变化时ETag随之变化
+    """
+    tables = tuple(tables)
+
+    @blueprint.before_request
+    def _check_conditional_get():
+        if request.method not in ('GET', 'HEAD') or not CONFIG['http_cache']['enabled']:
+            return None
+
+        etag = _compute_etag(tables)
+        if etag is None:
+            return None
+        last_modified = get_data_modified_time(*tables)
+        g._http_cache = (etag, last_modified)
+
+        # If-None-Match优先；没有时再比较If-Modified-Since
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and last_modified is not None \
+                and last_modified.replace(microsecond=0) <= since
+
+        if not_modified:
+            response = Response(status=304)
+            _set_validators(response, etag, last_modified)
+            return response
+        return None
+
+    @blueprint.after_request
+    def _add_validators(response: Response):
+        validators = g.pop('_http_cache', None)
+        if validators is not None and _is_success_body(response):
+            _set_validators(response, *validators)
+        return response
+
+
+def _set_validators(response: Response, etag: str, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = _cache_control()
@@ -0,0 +1,537 @@
+"""
+数据库结构迁移模块
+按版本号顺序执行迁移，已执行的版本记录在schema_version表中
+迁移函数返回False表示条件尚不满足（如依赖的表还不存在、SQLite版本过低）：已完成的部分照常提交，
+但不记录版本，下次执行迁移时重试，因此迁移函数须可重复执行（IF NOT EXISTS等）
+可在服务启动时自动执行，也可通过命令行手动执行：
+
+    cd project
+    python -m utils.migrations            # 执行未应用的迁移
+    python -m utils.migrations status     # 查看迁移状态
+    python -m utils.migrations plan       # 输出典型查询的执行计划
+"""
+import sys
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 支持在project目录下以脚本方式运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import get_db_connection
+from utils.house_columns import (
+    HOUSE_TYPED_COLUMNS, HOUSE_TYPED_INDEXES, HOUSE_TYPED_SOURCE_COLUMNS, has_typed_house_columns
+)
+from utils.house_summary import (
+    SUMMARY_SOURCE_COLUMNS, create_summary_table, install_summary_triggers, rebuild_house_summary
+)
+
+
+# ==================== 辅助函数 ====================
+
+def _table_exists(cursor, table: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+        (table,)
+    )
+    return cursor.fetchone() is not None
+
+
+def _table_columns(cursor, table: str) -> List[str]:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _index_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def _create_index(cursor, name: str, table: str, columns: Tuple[str, ...]) -> bool:
+    """
+    创建索引；表或字段不存在时跳过并给出提示
+    :return: 是否创建（或已存在）
+    """
+    if not _table_exists(cursor, table):
+        print(f"  ⚠️ 跳过索引 {name}: 表 {table} 不存在（建表后再次执行迁移时创建）")
+        return False
+
+    existing = _table_columns(cursor, table)
+    missing = [col for col in columns if col not in existing]
+    if missing:
+        print(f"  ⚠️ 跳过索引 {name}: 表 {table} 缺少字段 {', '.join(missing)}")
+        return False
+
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    print(f"  ✅ 索引 {name} ON {table}({', '.join(columns)})")
+    return True
+
+
+# ==================== 迁移定义 ====================
+
+# 列表页、排行与报告查询使用的组合/覆盖索引
+LIST_QUERY_INDEXES = [
+    # 北京房源：按区域筛选价格/面积区间、按区域聚合单价、按商圈/小区定位
+    ('idx_bhi_region_price_area', 'beijing_house_info', ('region', 'total_price', 'area')),
+    ('idx_bhi_region_unit_price', 'beijing_house_info', ('region', 'price_per_sqm')),
+    ('idx_bhi_business_area', 'beijing_house_info', ('business_area',)),
+    ('idx_bhi_community', 'beijing_house_info', ('community',)),
+    # 全国房价：按省份/城市筛选、城市均价与区县排行
+    ('idx_cp_province_city', 'current_price', ('province_name', 'city_name')),
+    ('idx_cp_city_district', 'current_price', ('city_name', 'district_name')),
+    ('idx_cp_city_avg_price', 'current_price', ('city_avg_price',)),
+    ('idx_cp_district_avg_price', 'current_price', ('district_avg_price',)),
+    ('idx_cp_district_ratio', 'current_price', ('district_ratio',)),
+    # 趋势与预测：按城市取时间序列
+    ('idx_trend_city_year_month', 'trend', ('city_name', 'year', 'month')),
+    ('idx_predict1_city_year_month', 'predict1', ('city', 'year', 'month')),
+    # 报告：用户报告列表、按类型/城市筛选的报告列表
+    ('idx_reports_user_created', 'reports', ('user_id', 'created_at')),
+    ('idx_reports_type_city_created', 'reports', ('type', 'city', 'created_at')),
+    ('idx_reports_created', 'reports', ('created_at',)),
+]
+
+
+def _create_indexes(cursor, indexes: List[Tuple[str, str, Tuple[str, ...]]]) -> bool:
+    """
+    创建尚不存在的索引，并只对新建了索引的表更新统计信息，便于查询规划器选择新索引
+    :return: 是否全部建立（有表或字段不存在时为False）
+    """
+    tables = []
+    complete = True
+    for name, table, columns in indexes:
+        if _index_exists(cursor, name):
+            continue
+        if _create_index(cursor, name, table, columns):
+            if table not in tables:
+                tables.append(table)
+        else:
+            complete = False
+    for table in tables:
+        cursor.execute(f"ANALYZE {table}")
+    return complete
+
+
+def _migration_001_list_query_indexes(cursor) -> bool:
+    """创建列表/排行/报告查询使用的组合与覆盖索引（reports等表导入后才存在时，下次执行迁移时补建）"""
+    return _create_indexes(cursor, LIST_QUERY_INDEXES)
+
+
+# 需要跟踪数据版本的业务表（内存快照、缓存等据此判断数据是否变化）
+VERSIONED_TABLES = ('beijing_house_info', 'current_price', 'trend', 'predict1')
+
+
+def _install_version_triggers(cursor, table: str) -> bool:
+    """为表安装增删改触发器，每次变更时递增data_versions中的版本号"""
+    if not _table_exists(cursor, table):
+        print(f"  ⚠️ 跳过数据版本跟踪: 表 {table} 不存在")
+        return False
+
+    cursor.execute(
+        "INSERT OR IGNORE INTO data_versions (table_name, version, updated_at) VALUES (?, 1, datetime('now'))",
+        (table,)
+    )
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_versions SET version = version + 1, updated_at = datetime('now')
+                WHERE table_name = '{table}';
+            END
+        """)
+    print(f"  ✅ 数据版本跟踪 {table}")
+    return True
+
+
+def _migration_002_data_versions(cursor) -> bool:
+    """
+    创建data_versions表，并为业务表安装数据版本触发器
+    有业务表尚不存在时不记录版本，建表后再次执行迁移时为其安装触发器
+    （没有触发器的表只能按数据库文件的变化判断版本，任何表的写入都会使其缓存失效）
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    installed = [_install_version_triggers(cursor, table) for table in VERSIONED_TABLES]
+    return all(installed)
+
+
+def _migration_003_area_stats(cursor):
+    """创建area_stats表，保存批量预计算的区域统计（见tools.area_stats_job）"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS area_stats (
+            area_name TEXT PRIMARY KEY,
+            area_type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            data_version TEXT NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+    print("  ✅ 区域统计预计算表 area_stats")
+
+
+# 位置全文索引（trigram分词，支持中文任意子串匹配）
+LOCATION_FTS_TABLE = 'house_location_fts'
+LOCATION_VOCAB_TABLE = 'house_location_vocab'
+LOCATION_COLUMNS = ('region', 'business_area', 'community', 'location')
+
+
+def _location_fts_values(prefix: str) -> str:
+    """
+    索引内容：各字段前后加分隔符"|"，NULL记为空
+    trigram只能匹配3个字及以上的子串，加上分隔符后1~2个字的字段值（如"朝阳"）也能产生"|朝阳"等词条
+    """
+    return ', '.join(f"'|' || IFNULL({prefix}{column}, '') || '|'" for column in LOCATION_COLUMNS)
+
+
+def _migration_004_location_fts(cursor) -> bool:
+    """
+    创建房源位置全文索引（FTS5 trigram）及同步触发器，替代四个字段的 LIKE '%x%' 扫描
+    表或字段不存在、SQLite不支持trigram时不记录版本，建表或升级SQLite后再次执行迁移时创建
+    """
+    table = 'beijing_house_info'
+    if not _table_exists(cursor, table):
+        print(f"  ⚠️ 跳过位置全文索引: 表 {table} 不存在")
+        return False
+    missing = [column for column in LOCATION_COLUMNS if column not in _table_columns(cursor, table)]
+    if missing:
+        print(f"  ⚠️ 跳过位置全文索引: 表 {table} 缺少字段 {', '.join(missing)}")
+        return False
+
+    columns = ', '.join(LOCATION_COLUMNS)
+    try:
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {LOCATION_FTS_TABLE}
+            USING fts5({columns}, tokenize='trigram')
+        """)
+    except Exception as e:
+        # SQLite版本过低（trigram需要3.34+）或未编译FTS5，查询继续使用LIKE
+        print(f"  ⚠️ 跳过位置全文索引: 当前SQLite不支持FTS5 trigram ({e})")
+        return False
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {LOCATION_VOCAB_TABLE}
+        USING fts5vocab({LOCATION_FTS_TABLE}, 'col')
+    """)
+
+    cursor.execute(f"DELETE FROM {LOCATION_FTS_TABLE}")
+    cursor.execute(f"""
+        INSERT INTO {LOCATION_FTS_TABLE} (rowid, {columns})
+        SELECT rowid, {_location_fts_values('')} FROM {table}
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_insert_location_fts
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {LOCATION_FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {_location_fts_values('new.')});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_delete_location_fts
+        AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM {LOCATION_FTS_TABLE} WHERE rowid = old.rowid;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_update_location_fts
+        AFTER UPDATE OF {columns} ON {table}
+        BEGIN
+            DELETE FROM {LOCATION_FTS_TABLE} WHERE rowid = old.rowid;
+            INSERT INTO {LOCATION_FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {_location_fts_values('new.')});
+        END
+    """)
+    print(f"  ✅ 位置全文索引 {LOCATION_FTS_TABLE}({columns})")
+
+
+# 房源列表按价格/面积/单价排序的游标分页：(排序字段, house_id) 组合索引，
+# 翻页条件 (字段, house_id) > (?, ?) 直接在索引上定位，代价与页码无关
+HOUSE_SORT_INDEXES = [
+    ('idx_bhi_total_price_house_id', 'beijing_house_info', ('total_price', 'house_id')),
+    ('idx_bhi_price_per_sqm_house_id', 'beijing_house_info', ('price_per_sqm', 'house_id')),
+    ('idx_bhi_area_house_id', 'beijing_house_info', ('area', 'house_id')),
+]
+
+
+def _migration_005_house_sort_indexes(cursor) -> bool:
+    """创建房源列表排序与游标分页使用的索引（房源表导入后才存在时，下次执行迁移时补建）"""
+    return _create_indexes(cursor, HOUSE_SORT_INDEXES)
+
+
+def _migration_006_typed_house_columns(cursor) -> bool:
+    """
+    为房源添加类型化派生字段（户型室/厅/卫、楼层分类、总楼层、整数单价、建成年份）及索引
+    使用VIRTUAL生成列：新写入的数据自动计算，入库脚本无需修改
+    表或字段不存在、SQLite不支持生成列时不记录版本，下次执行迁移时重试
+    """
+    table = 'beijing_house_info'
+    if not _table_exists(cursor, table):
+        print(f"  ⚠️ 跳过派生字段: 表 {table} 不存在")
+        return False
+    missing = [column for column in HOUSE_TYPED_SOURCE_COLUMNS if column not in _table_columns(cursor, table)]
+    if missing:
+        print(f"  ⚠️ 跳过派生字段: 表 {table} 缺少字段 {', '.join(missing)}")
+        return False
+    if sqlite3.sqlite_version_info < (3, 31, 0):
+        print(f"  ⚠️ 跳过派生字段: SQLite {sqlite3.sqlite_version} 不支持生成列（需要3.31+）")
+        return False
+
+    cursor.execute(f"PRAGMA table_xinfo({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, column_type, expression in HOUSE_TYPED_COLUMNS:
+        if name in existing:
+            continue
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type} "
+                       f"GENERATED ALWAYS AS ({expression}) VIRTUAL")
+        print(f"  ✅ 派生字段 {table}.{name}")
+
+    # 索引建立在生成列上，_create_index按table_info检查字段会漏掉生成列，这里直接创建
+    for name, index_table, columns in HOUSE_TYPED_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {index_table} ({', '.join(columns)})")
+        print(f"  ✅ 索引 {name} ON {index_table}({', '.join(columns)})")
+    cursor.execute(f"ANALYZE {table}")
+
+
+def _migration_007_house_summary(cursor) -> bool:
+    """
+    创建房源汇总表house_summary（区域/户型/楼层/朝向/电梯各取值的房源数及单价、总价的计数/和/平方和/最值），
+    由触发器增量维护，北京概览与特征分析接口直接读取（见utils.house_summary）
+    表或字段不存在、SQLite不支持UPSERT时不记录版本，下次执行迁移时重试
+    """
+    table = 'beijing_house_info'
+    if not _table_exists(cursor, table):
+        print(f"  ⚠️ 跳过房源汇总表: 表 {table} 不存在")
+        return False
+    missing = [column for column in SUMMARY_SOURCE_COLUMNS if column not in _table_columns(cursor, table)]
+    if missing:
+        print(f"  ⚠️ 跳过房源汇总表: 表 {table} 缺少字段 {', '.join(missing)}")
+        return False
+    if sqlite3.sqlite_version_info < (3, 24, 0):
+        print(f"  ⚠️ 跳过房源汇总表: SQLite {sqlite3.sqlite_version} 不支持UPSERT（需要3.24+）")
+        return False
+
+    create_summary_table(cursor)
+    install_summary_triggers(cursor, has_typed_house_columns(cursor))
+    rows = rebuild_house_summary(cursor)
+    print(f"  ✅ 房源汇总表 house_summary（{rows} 个取值）及同步触发器")
+
+
+def _migration_008_city_summary(cursor):
+    """
+    创建城市汇总表city_summary（current_price按城市去重，每个城市一行），
+    带current_price的数据版本，全国概览与排行接口读取（见services.national_rankings）
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS city_summary (
+            city_name TEXT PRIMARY KEY,
+            province_name TEXT,
+            city_avg_price REAL,
+            city_avg_total_price REAL,
+            price_rent_ratio REAL,
+            listing_count INTEGER,
+            avg_district_ratio REAL,
+            district_count INTEGER NOT NULL DEFAULT 0,
+            data_version TEXT NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+    print("  ✅ 城市汇总表 city_summary（服务启动或current_price数据变化后自动刷新）")
+
+
+# (版本号, 描述, 执行函数)
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, '列表/排行/报告查询的组合与覆盖索引', _migration_001_list_query_indexes),
+    (2, '业务表数据版本跟踪（data_versions + 触发器）', _migration_002_data_versions),
+    (3, '区域统计预计算表（area_stats）', _migration_003_area_stats),
+    (4, '房源位置全文索引（FTS5 trigram + 同步触发器）', _migration_004_location_fts),
+    (5, '房源列表排序/游标分页索引', _migration_005_house_sort_indexes),
+    (6, '房源类型化派生字段（户型/楼层/单价/年代）及索引', _migration_006_typed_house_columns),
+    (7, '房源汇总表（区域/户型/楼层/朝向/电梯，触发器增量维护）', _migration_007_house_summary),
+    (8, '全国城市汇总表（city_summary）', _migration_008_city_summary),
+]
+
+
+# ==================== 执行计划对比 ====================
+
+# 典型查询（与服务层查询形态一致），用于对比迁移前后的执行计划
+PLAN_QUERIES = [
+    ('房源列表（区域+总价+面积）', 'beijing_house_info',
+     "SELECT COUNT(*) FROM beijing_house_info WHERE region = ? AND total_price BETWEEN ? AND ? AND area >= ?",
+     ('朝阳', 300, 800, 60)),
+    ('房源列表游标分页（按总价）', 'beijing_house_info',
+     "SELECT house_id FROM beijing_house_info WHERE total_price IS NOT NULL AND (total_price, house_id) > (?, ?) "
+     "ORDER BY total_price, house_id LIMIT 21",
+     (500, '')),
+    ('户型筛选（居室数+总价）', 'beijing_house_info',
+     "SELECT COUNT(*) FROM beijing_house_info WHERE rooms = ? AND total_price BETWEEN ? AND ?",
+     (2, 300, 800)),
+    ('楼层分类统计', 'beijing_house_info',
+     "SELECT floor_level_category, AVG(price_per_sqm), COUNT(*) FROM beijing_house_info "
+     "WHERE floor_level_category IS NOT NULL GROUP BY floor_level_category",
+     ()),
+    ('区域单价排名', 'beijing_house_info',
+     "SELECT region, AVG(price_per_sqm), COUNT(*) FROM beijing_house_info GROUP BY region",
+     ()),
+    ('省份城市房价', 'current_price',
+     "SELECT * FROM current_price WHERE province_name = ? ORDER BY city_name",
+     ('广东',)),
+    ('城市价格趋势', 'trend',
+     "SELECT year, month, month_avg_price FROM trend WHERE city_name = ? ORDER BY year, month",
+     ('北京',)),
+    ('用户报告列表', 'reports',
+     "SELECT id, title FROM reports WHERE user_id = ? ORDER BY created_at DESC LIMIT 10",
+     ('1',)),
+    ('报告列表（类型+城市）', 'reports',
+     "SELECT id, title FROM reports WHERE type = ? AND city = ? ORDER BY created_at DESC LIMIT 10",
+     ('市场分析', '北京')),
+]
+
+
+def explain_plans(cursor) -> Dict[str, List[str]]:
+    """获取典型查询的EXPLAIN QUERY PLAN结果"""
+    plans = {}
+    for title, table, sql, params in PLAN_QUERIES:
+        if not _table_exists(cursor, table):
+            continue
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plans[title] = [row[3] for row in cursor.fetchall()]
+        except Exception as e:
+            plans[title] = [f"无法生成执行计划: {e}"]
+    return plans
+
+
+def print_plan_report(before: Dict[str, List[str]], after: Dict[str, List[str]]):
+    """打印迁移前后的执行计划对比"""
+    print("\n📋 执行计划对比（迁移前 → 迁移后）")
+    for title in after:
+        print(f"  [{title}]")
+        print(f"    前: {' | '.join(before.get(title, ['-']))}")
+        print(f"    后: {' | '.join(after[title])}")
+
+
+# ==================== 迁移执行 ====================
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT DEFAULT (datetime('now')),
+            duration_ms REAL
+        )
+    """)
+
+
+def get_applied_versions(cursor) -> List[int]:
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_version ORDER BY version")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def run_migrations(target_version: Optional[int] = None, show_plans: bool = True) -> List[int]:
+    """
+    执行所有未应用的迁移
+    :param target_version: 最高执行到的版本（可选，默认全部）
+    :param show_plans: 有迁移执行时是否打印执行计划对比
+    :return: 本次执行（并记录）的版本号列表
+    """
+    connection = get_db_connection()
+    if not connection:
+        print("[ERROR] 数据库迁移失败: 无法获取数据库连接")
+        return []
+    try:
+        return apply_migrations(connection, target_version, show_plans)
+    finally:
+        connection.close()
+
+
+def apply_migrations(connection, target_version: Optional[int] = None, show_plans: bool = True) -> List[int]:
+    """在指定连接上执行未应用的迁移（参数同run_migrations）"""
+    applied_now = []
+    cursor = connection.cursor()
+    applied = set(get_applied_versions(cursor))
+    connection.commit()
+
+    pending = [m for m in MIGRATIONS
+               if m[0] not in applied and (target_version is None or m[0] <= target_version)]
+    if not pending:
+        print(f"[INFO] 数据库结构已是最新版本 (v{max(applied) if applied else 0})")
+        return []
+
+    plans_before = explain_plans(cursor) if show_plans else {}
+
+    for version, description, apply in pending:
+        print(f"[INFO] 执行迁移 v{version}: {description}")
+        start = time.perf_counter()
+        try:
+            cursor.execute("BEGIN")
+            if apply(cursor) is False:
+                connection.commit()
+                print(f"[INFO] 迁移 v{version} 条件尚不满足，暂不记录版本，下次执行迁移时重试")
+                continue
+            duration_ms = (time.perf_counter() - start) * 1000
+            cursor.execute(
+                "INSERT INTO schema_version (version, description, duration_ms) VALUES (?, ?, ?)",
+                (version, description, round(duration_ms, 2))
+            )
+            connection.commit()
+            applied_now.append(version)
+            print(f"[SUCCESS] 迁移 v{version} 完成，用时 {duration_ms:.1f}ms")
+        except Exception as e:
+            connection.rollback()
+            print(f"[ERROR] 迁移 v{version} 失败，已回滚: {e}")
+            break
+
+    if show_plans and applied_now:
+        print_plan_report(plans_before, explain_plans(cursor))
+
+    cursor.close()
+    return applied_now
+
+
+def migration_status() -> List[Dict]:
+    """返回每个迁移的版本、描述和应用时间"""
+    connection = get_db_connection()
+    if not connection:
+        return []
+    try:
+        cursor = connection.cursor()
+        _ensure_version_table(cursor)
+        connection.commit()
+        cursor.execute("SELECT version, applied_at FROM schema_version")
+        applied = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.close()
+        return [
+            {'version': version, 'description': description, 'applied_at': applied.get(version)}
+            for version, description, _ in MIGRATIONS
+        ]
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+
+    if command == 'status':
+        for item in migration_status():
+            state = item['applied_at'] or '未执行'
+            print(f"v{item['version']:<4} {state:<20} {item['description']}")
+    elif command == 'plan':
+        conn = get_db_connection()
+        if conn:
+            plans = explain_plans(conn.cursor())
+            for title, plan in plans.items():
+                print(f"[{title}] {' | '.join(plan)}")
+            conn.close()
+    elif command == 'migrate':
+        run_migrations()
+    else:
+        print(f"未知命令: {command}（可用: migrate / status / plan）")
+        sys.exit(1)
@@ -0,0 +1,40 @@
+"""
+JSON响应序列化
+路由统一通过这里把服务层返回的字典序列化为响应体，安装了orjson时优先使用orjson
+"""
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+
+
+def dumps(data) -> bytes:
+    """序列化为UTF-8编码的JSON（中文不转义）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson不支持的类型（如超出64位的整数）交给标准库处理
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(body, status: int = 200) -> Response:
+    """
+    构造JSON响应
+    :param body: 已序列化的bytes，或需要序列化的字典/列表
+    :param status: HTTP状态码
+    """
+    if not isinstance(body, (bytes, bytearray)):
+        body = dumps(body)
+    return Response(body, status=status, mimetype=JSON_MIMETYPE)
+
+
+def serializer_name() -> str:
+    return 'orjson' if orjson is not None else 'json'
@@ -0,0 +1,329 @@
+"""
+SQL追踪与慢查询日志模块
+在连接池的连接上记录每条语句的耗时、返回行数和发起的服务函数，
+超过阈值的语句写入滚动日志，并自动采集EXPLAIN QUERY PLAN（标记全表扫描）
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+
+from config import CONFIG
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_UTILS_DIR = os.path.join(_PROJECT_DIR, 'utils')
+
+# 归一化SQL：折叠空白、字面量替换为占位符，使同一形态的语句聚合到一起
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_WHITESPACE = re.compile(r"\s+")
+
+# 聚合条目上限，避免异常语句形态撑爆内存
+_MAX_ENTRIES = 500
+# 同一语句形态重新采集执行计划的间隔（秒）
+_PLAN_REFRESH_SECONDS = 600
+
+
+def normalize_sql(sql: str) -> str:
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _find_origin() -> str:
+    """沿调用栈找到第一个项目内、utils之外的函数，作为语句的发起方"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_DIR) and not filename.startswith(_UTILS_DIR):
+            module = os.path.splitext(os.path.relpath(filename, _PROJECT_DIR))[0].replace(os.sep, '.')
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _is_full_scan(plan: List[str]) -> bool:
+    for detail in plan:
+        if detail.startswith('SCAN ') and 'USING' not in detail \
+                and not detail.startswith('SCAN CONSTANT ROW') and '(subquery' not in detail:
+            return True
+    return False
+
+
+class SQLTracer:
+    """SQL语句追踪器：聚合统计 + 慢查询日志 + 执行计划采集"""
+
+    def __init__(self, enabled: bool = True, slow_ms: float = 100.0, log_path: Optional[str] = None,
+                 log_max_bytes: int = 5 * 1024 * 1024, log_backups: int = 3):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._entries: Dict[tuple, Dict] = {}
+        self._plans: Dict[str, tuple] = {}
+        self._started_at = datetime.now().isoformat()
+        self._total_statements = 0
+        self._total_ms = 0.0
+        self._dropped = 0
+
+        self._logger = logging.getLogger('sql.slow')
+        self._logger.propagate = False
+        if log_path and not self._logger.handlers:
+            try:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                handler = RotatingFileHandler(log_path, maxBytes=log_max_bytes,
+                                              backupCount=log_backups, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                self._logger.addHandler(handler)
+                self._logger.setLevel(logging.WARNING)
+            except OSError as e:
+                print(f"[WARNING] 慢查询日志不可用: {e}")
+
+    # ---------- 连接钩子 ----------
+
+    def trace_callback(self, statement: str):
+        """sqlite3 set_trace_callback回调：记录最近一条展开参数后的语句"""
+        if getattr(self._local, 'capture', False):
+            self._local.expanded = statement
+            self._local.capture = False
+
+    def begin_statement(self):
+        self._local.capture = True
+        self._local.expanded = None
+
+    def expanded_statement(self) -> Optional[str]:
+        return getattr(self._local, 'expanded', None)
+
+    # ---------- 记录 ----------
+
+    def record(self, sql: str, origin: str, elapsed_ms: float, rows: int,
+               expanded: Optional[str] = None, connection=None):
+        normalized = normalize_sql(sql)
+        key = (normalized, origin)
+        slow = elapsed_ms >= self.slow_ms
+
+        with self._lock:
+            self._total_statements += 1
+            self._total_ms += elapsed_ms
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= _MAX_ENTRIES:
+                    self._dropped += 1
+                    return
+                entry = self._entries[key] = {
+                    'sql': normalized,
+                    'origin': origin,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'rows': 0,
+                    'slow_count': 0,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['rows'] += rows
+            if elapsed_ms > entry['max_ms']:
+                entry['max_ms'] = elapsed_ms
+            if slow:
+                entry['slow_count'] += 1
+
+        if slow:
+            plan = self._explain(normalized, sql, expanded, connection)
+            self._log_slow(normalized, origin, elapsed_ms, rows, expanded or sql, plan)
+
+    def _explain(self, normalized: str, sql: str, expanded: Optional[str], connection) -> Optional[List[str]]:
+        """采集执行计划（同一形态按间隔缓存），仅对查询语句生效"""
+        cached = self._plans.get(normalized)
+        if cached and time.time() - cached[0] < _PLAN_REFRESH_SECONDS:
+            return cached[1]
+        if connection is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        try:
+            cursor = connection.execute(f"EXPLAIN QUERY PLAN {expanded or sql}")
+            plan = [row[3] for row in cursor.fetchall()]
+            cursor.close()
+        except Exception:
+            return None
+        self._plans[normalized] = (time.time(), plan)
+        return plan
+
+    def _log_slow(self, normalized: str, origin: str, elapsed_ms: float, rows: int,
+                  statement: str, plan: Optional[List[str]]):
+        full_scan = _is_full_scan(plan) if plan else None
+        if plan is not None:
+            with self._lock:
+                for entry_key, entry in self._entries.items():
+                    if entry_key[0] == normalized:
+                        entry['plan'] = plan
+                        entry['full_scan'] = full_scan
+        self._logger.warning(json.dumps({
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'elapsed_ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'origin': origin,
+            'sql': _WHITESPACE.sub(' ', statement).strip(),
+            'plan': plan,
+            'full_scan': full_scan,
+        }, ensure_ascii=False))
+
+    # ---------- 统计输出 ----------
+
+    def top(self, limit: int = 20, order_by: str = 'total_ms') -> List[Dict]:
+        """按指定指标返回前N个语句形态"""
+        if order_by not in ('total_ms', 'max_ms', 'count', 'rows', 'slow_count', 'avg_ms'):
+            order_by = 'total_ms'
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        for entry in entries:
+            entry['avg_ms'] = round(entry['total_ms'] / entry['count'], 3) if entry['count'] else 0.0
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+        entries.sort(key=lambda e: e[order_by], reverse=True)
+        return entries[:limit]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'slow_threshold_ms': self.slow_ms,
+                'slow_log': self.log_path,
+                'since': self._started_at,
+                'statements': self._total_statements,
+                'total_ms': round(self._total_ms, 3),
+                'distinct_statements': len(self._entries),
+                'dropped_statements': self._dropped,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+            self._total_statements = 0
+            self._total_ms = 0.0
+            self._dropped = 0
+            self._started_at = datetime.now().isoformat()
+
+
+class TracedCursor:
+    """
+    计时游标代理
+    语句耗时 = execute耗时 + 结果读取耗时，在读取完毕、执行下一条语句或关闭游标时记录
+    """
+
+    __slots__ = ('_cursor', '_tracer', '_connection', '_pending')
+
+    def __init__(self, cursor, tracer: SQLTracer, connection):
+        self._cursor = cursor
+        self._tracer = tracer
+        self._connection = connection
+        self._pending = None
+
+    def __getattr__(self, name):
+        if name in TracedCursor.__slots__:
+            raise AttributeError(name)
+        return getattr(self._cursor, name)
+
+    def _finish(self, explain: bool = True):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        sql, origin, elapsed, rows, expanded = pending
+        self._tracer.record(sql, origin, elapsed * 1000, rows, expanded,
+                            self._connection if explain else None)
+
+    def _run(self, method, sql, params):
+        self._finish()
+        origin = _find_origin()
+        self._tracer.begin_statement()
+        start = time.perf_counter()
+        method(sql, params)
+        elapsed = time.perf_counter() - start
+        self._pending = [sql, origin, elapsed, 0, self._tracer.expanded_statement()]
+        return self
+
+    def execute(self, sql, params=()):
+        return self._run(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        self._run(self._cursor.executemany, sql, seq_of_params)
+        if self._pending is not None:
+            self._pending[3] = max(self._cursor.rowcount, 0)
+            self._finish()
+        return self
+
+    def executescript(self, script):
+        self._finish()
+        return self._cursor.executescript(script)
+
+    def _timed_fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._timed_fetch(self._cursor.fetchone)
+        if self._pending is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed_fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            self._finish()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __del__(self):
+        # 析构时连接可能已归还给其他线程，只记录耗时不再执行EXPLAIN
+        try:
+            self._finish(explain=False)
+        except Exception:
+            pass
+
+
+def _build_tracer() -> SQLTracer:
+    trace_config = CONFIG['sql_trace']
+    log_path = trace_config['slow_log']
+    if log_path and not os.path.isabs(log_path):
+        log_path = os.path.join(_PROJECT_DIR, log_path)
+    return SQLTracer(
+        enabled=trace_config['enabled'],
+        slow_ms=trace_config['slow_ms'],
+        log_path=log_path,
+        log_max_bytes=trace_config['log_max_bytes'],
+        log_backups=trace_config['log_backups'],
+    )
+
+
+# 全局追踪器实例
+tracer = _build_tracer()